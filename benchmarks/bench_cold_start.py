@@ -0,0 +1,94 @@
+"""
+Холодный старт каталога: разбор JSON с построением индексов против бинарного снимка.
+
+Каждый замер - отдельный процесс Python (импорт модулей + загрузка каталога).
+Запуск из корня проекта:
+    python benchmarks/bench_cold_start.py [число_ЖК]
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import bench_geo
+import bench_semantic
+
+LOAD = """
+import time
+start = time.perf_counter()
+from catalog import CatalogStore
+store = CatalogStore()
+snapshot = store.load()
+assert snapshot.columns.geo is snapshot.geo_index
+print(time.perf_counter() - start, snapshot.from_binary)
+"""
+
+
+def make_catalog(size: int) -> dict:
+    """Каталог из bench_semantic с координатами и инфраструктурой из bench_geo"""
+    db = bench_semantic.make_catalog(size)
+    located = bench_geo.make_catalog(size, size * 10)
+    for obj, geo in zip(db.values(), located.values()):
+        obj["координаты"] = geo["координаты"]
+        obj["ближайшие_объекты"] += geo["ближайшие_объекты"]
+    return db
+
+
+def cold_start(env: dict) -> tuple:
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", LOAD],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.split()
+    return time.perf_counter() - start, float(output[0]), output[1] == "True"
+
+
+def main() -> None:
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    with tempfile.TemporaryDirectory() as tmp:
+        catalog = Path(tmp) / "database.json"
+        catalog.write_text(json.dumps(make_catalog(size), ensure_ascii=False), "utf-8")
+        env = {
+            **os.environ,
+            "CATALOG_PATH": str(catalog),
+            "CATALOG_SNAPSHOT_PATH": str(catalog.with_suffix(".snapshot")),
+        }
+        print(f"Каталог: {size} ЖК, {catalog.stat().st_size / 2**20:.1f} МБ JSON")
+
+        total, load, binary = cold_start(env)
+        print(f"JSON + индексы: процесс {total:.2f} сек, загрузка {load:.2f} сек")
+
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "catalog_snapshot.py", "--catalog", str(catalog)],
+            cwd=ROOT,
+            env=env,
+            check=True,
+            capture_output=True,
+        )
+        snapshot = catalog.with_suffix(".snapshot")
+        print(
+            f"Сборка снимка: {time.perf_counter() - start:.2f} сек, "
+            f"{snapshot.stat().st_size / 2**20:.1f} МБ"
+        )
+
+        total, load, binary = cold_start(env)
+        print(
+            f"Бинарный снимок: процесс {total:.2f} сек, загрузка {load:.2f} сек"
+            f"{'' if binary else ' (снимок не использован!)'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
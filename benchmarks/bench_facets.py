@@ -0,0 +1,81 @@
+"""
+Векторный фильтр каталога по срокам, этажности и окружению против цикла Python.
+
+Запуск из корня проекта:
+    python benchmarks/bench_facets.py [число_объектов]
+"""
+
+import sys
+import time
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_semantic import make_catalog
+from catalog_columns import CatalogColumns, deadline_key, parse_deadline, parse_distance
+
+QUERIES = [
+    "что сдается до конца 2025 с парком в 500 м",
+    "не выше 10 этажей, школа в шаговой доступности",
+    "дом после 2026 года рядом с метро в 300 м",
+]
+
+
+def loop_filter(db: dict, conditions: dict) -> list:
+    """Тот же фильтр обходом словарей - как без колоночного представления"""
+    found = []
+    for name, obj in db.items():
+        year, quarter = parse_deadline(obj["срок_сдачи"])
+        deadline = deadline_key(year, quarter) if year else -1
+        if "deadline_before" in conditions and not (
+            0 <= deadline <= conditions["deadline_before"]
+        ):
+            continue
+        if "deadline_after" in conditions and deadline <= conditions["deadline_after"]:
+            continue
+        if obj["этажность"] < conditions.get("min_floors", 0):
+            continue
+        if obj["этажность"] > conditions.get("max_floors", 10**6):
+            continue
+        if all(
+            any(
+                place["тип"].lower() == place_type
+                and (
+                    max_distance is None
+                    or parse_distance(place["расстояние"]) <= max_distance
+                )
+                for place in obj["ближайшие_объекты"]
+            )
+            for place_type, max_distance in conditions.get("nearby", [])
+        ):
+            found.append((deadline, name))
+    return [name for _, name in sorted(found, key=lambda item: item[0])]
+
+
+def main() -> None:
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    db = make_catalog(size)
+
+    start = time.perf_counter()
+    columns = CatalogColumns(db)
+    print(f"Каталог: {size} объектов, колонки: {time.perf_counter() - start:.2f} сек")
+
+    for query in QUERIES:
+        conditions = columns.parse_query(query)
+        vectorized = min(
+            timeit.repeat(lambda: columns.filter(**conditions), number=20, repeat=3)
+        )
+        loop = min(
+            timeit.repeat(lambda: loop_filter(db, conditions), number=2, repeat=3)
+        )
+        same = columns.filter(**conditions) == loop_filter(db, conditions)
+        print(
+            f"«{query}»: найдено {len(columns.filter(**conditions))}, "
+            f"NumPy {vectorized / 20 * 1e3:.2f} мс, цикл {loop / 2 * 1e3:.1f} мс, "
+            f"совпадает: {same}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Пространственный индекс против полного перебора на каталоге размером с город.
+
+Запуск из корня проекта:
+    python benchmarks/bench_geo.py [число_ЖК] [число_объектов_инфраструктуры]
+"""
+
+import random
+import sys
+import time
+import timeit
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from geo_index import GeoIndex
+
+# Примерный охват большого города (градусы)
+CENTER = (55.75, 37.62)
+SPREAD = (0.25, 0.4)
+TYPES = ["школа", "парк", "торговый центр", "поликлиника", "метро", "детский сад"]
+
+
+def random_point(rnd: random.Random) -> list:
+    return [
+        round(CENTER[0] + rnd.uniform(-SPREAD[0], SPREAD[0]), 6),
+        round(CENTER[1] + rnd.uniform(-SPREAD[1], SPREAD[1]), 6),
+    ]
+
+
+def make_catalog(complexes: int, places: int, seed: int = 1) -> dict:
+    """ЖК с координатами; инфраструктура города распределена по их спискам"""
+    rnd = random.Random(seed)
+    db = {
+        f"ЖК Объект {i}": {
+            "описание": "Жилой комплекс",
+            "этажность": 10,
+            "срок_сдачи": "4 кв. 2026",
+            "координаты": random_point(rnd),
+            "ближайшие_объекты": [],
+        }
+        for i in range(complexes)
+    }
+    objects = list(db.values())
+    for i in range(places):
+        kind = rnd.choice(TYPES)
+        rnd.choice(objects)["ближайшие_объекты"].append(
+            {
+                "название": f"{kind.capitalize()} №{i}",
+                "тип": kind,
+                "расстояние": "",
+                "координаты": random_point(rnd),
+            }
+        )
+    return db
+
+
+def brute_force(index: GeoIndex, point, radius: float, place_type: str) -> list:
+    code = index.type_codes[place_type]
+    distances = np.hypot(*(index.place_xy - point).T)
+    found = np.flatnonzero((distances <= radius) & (index.place_type == code))
+    return sorted(found.tolist(), key=lambda i: distances[i])
+
+
+def main() -> None:
+    complexes = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    places = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+    db = make_catalog(complexes, places)
+
+    start = time.perf_counter()
+    index = GeoIndex(db)
+    print(
+        f"ЖК: {complexes}, объектов: {places}, индекс с предрасчетом: "
+        f"{time.perf_counter() - start:.2f} сек"
+    )
+
+    names = list(db)[:200]
+    points = [index.complex_point(name) for name in names]
+    grid = min(
+        timeit.repeat(
+            lambda: [index._select(p, 700, "школа") for p in points], number=1, repeat=3
+        )
+    )
+    full = min(
+        timeit.repeat(
+            lambda: [brute_force(index, p, 700, "школа") for p in points],
+            number=1,
+            repeat=3,
+        )
+    )
+    same = all(
+        index._select(p, 700, "школа")[0].tolist()
+        == brute_force(index, p, 700, "школа")
+        for p in points
+    )
+    print(
+        f"«школы в 700 м»: сетка {grid / len(points) * 1e3:.3f} мс, "
+        f"перебор {full / len(points) * 1e3:.3f} мс на ЖК, совпадает: {same}"
+    )
+
+    knn = min(
+        timeit.repeat(
+            lambda: [index.nearest_to(n, 5) for n in names], number=1, repeat=3
+        )
+    )
+    print(f"5 ближайших объектов: {knn / len(names) * 1e3:.3f} мс на ЖК")
+
+    start = time.perf_counter()
+    found = int(np.count_nonzero(index.distance_to_type("школа") <= 700))
+    print(
+        f"ЖК со школой в 700 м по всему каталогу: {found} "
+        f"за {(time.perf_counter() - start) * 1e3:.3f} мс (предрасчет)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Задержки клиента YandexGPT против локальной заглушки: без и с хеджированием.
+
+Сначала запустите заглушку с долей медленных и ошибочных ответов:
+    python benchmarks/fake_yandexgpt.py --slow-rate 0.05 --slow-latency 3 --error-rate 0.1
+
+Затем:
+    python benchmarks/bench_llm_client.py [число_запросов]
+"""
+
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault(
+    "YANDEX_GPT_URL", "http://127.0.0.1:8765/foundationModels/v1/completion"
+)
+os.environ.setdefault("YANDEX_API_KEY", "fake")
+os.environ.setdefault("YANDEX_FOLDER_ID", "fake")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from llm_integration import YandexGPTClient, is_error_response
+from llm_scheduler import LLMScheduler
+
+CONCURRENCY = 10
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+async def run(label: str, client: YandexGPTClient, total: int) -> None:
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def one(i: int) -> None:
+        nonlocal errors
+        messages = [{"role": "user", "text": f"Вопрос {i}"}]
+        async with semaphore:
+            start = time.perf_counter()
+            text = await client.complete(messages)
+            latencies.append(time.perf_counter() - start)
+            errors += is_error_response(text)
+
+    await asyncio.gather(*(one(i) for i in range(total)))
+    await client.aclose()
+    print(
+        f"{label:<28} p50 {percentile(latencies, 0.5):.2f}  "
+        f"p95 {percentile(latencies, 0.95):.2f}  p99 {percentile(latencies, 0.99):.2f} сек, "
+        f"ошибок {errors}/{total}, {client.stats()}"
+    )
+
+
+async def main() -> None:
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    scheduler = LLMScheduler(rps=1000, burst=1000, max_queue=total)
+    await run("одна попытка", YandexGPTClient(retries=0, scheduler=scheduler), total)
+    await run("повторы", YandexGPTClient(retries=2, scheduler=scheduler), total)
+    await run(
+        "повторы + хеджирование",
+        YandexGPTClient(retries=2, hedge=True, scheduler=scheduler),
+        total,
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
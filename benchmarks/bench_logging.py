@@ -0,0 +1,136 @@
+"""
+Стоимость логирования в обработчике сообщений: прежняя схема против очереди.
+
+Сравнивается время вызова логгера в потоке обработчика:
+  - дамп запроса к модели f-строкой с json.dumps при уровне INFO
+    (строка строилась и выбрасывалась) и отложенный дамп с выборкой;
+  - запись в файл напрямую (FileHandler) и через очередь с фоновым потоком.
+    Как и в боте, записи идут пачками (несколько строк на обновление), а
+    между пачками обработчик ждет сеть - в это время фоновый поток
+    дописывает очередь. Учитывается только время вызовов логгера.
+
+Запуск из корня проекта:
+    python benchmarks/bench_logging.py [число_записей]
+"""
+
+import json
+import logging
+import queue
+import sys
+import tempfile
+import time
+from logging.handlers import QueueListener, RotatingFileHandler
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from log_setup import (
+    DeferredQueueHandler,
+    JsonLinesFormatter,
+    LazyJson,
+    payload_sampled,
+)
+
+FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+def make_payload() -> dict:
+    """Запрос к модели примерно того размера, что формирует бот"""
+    text = "ЖК «Солнечный»: срок сдачи 4 кв. 2025, 17 этажей, школа 300 м. " * 12
+    return {
+        "modelUri": "gpt://folder/yandexgpt-lite",
+        "completionOptions": {"stream": False, "temperature": 0.6, "maxTokens": 1500},
+        "messages": [{"role": "system", "text": text}]
+        + [{"role": "user", "text": text[:200]} for _ in range(10)],
+    }
+
+
+# Строк лога на одно обновление и пауза на ответ сети между обновлениями
+BURST = 8
+NETWORK_WAIT = 0.002
+
+
+def per_call(func, count: int) -> float:
+    """Среднее время вызова в микросекундах"""
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def per_call_in_bursts(func, count: int) -> float:
+    """Среднее время вызова, если между пачками вызовов поток ждет сеть"""
+    busy = 0.0
+    for _ in range(count // BURST):
+        start = time.perf_counter()
+        for _ in range(BURST):
+            func()
+        busy += time.perf_counter() - start
+        time.sleep(NETWORK_WAIT)
+    return busy / (count // BURST * BURST) * 1e6
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    payload = make_payload()
+    workdir = Path(tempfile.mkdtemp())
+
+    # Дамп запроса при уровне INFO
+    quiet = logging.getLogger("bench.quiet")
+    quiet.setLevel(logging.INFO)
+    quiet.propagate = False
+    eager = per_call(
+        lambda: quiet.debug(
+            f"Отправляемый запрос:\n{json.dumps(payload, indent=2, ensure_ascii=False)}"
+        ),
+        count // 10,
+    )
+
+    def deferred():
+        if payload_sampled(quiet):
+            quiet.debug("Отправляемый запрос:\n%s", LazyJson(payload))
+
+    print(
+        f"Дамп запроса при INFO: f-строка {eager:.1f} мкс, "
+        f"отложенный {per_call(deferred, count):.2f} мкс"
+    )
+
+    # Запись строки в файл из обработчика
+    direct = logging.getLogger("bench.direct")
+    direct.propagate = False
+    direct.setLevel(logging.INFO)
+    file_handler = logging.FileHandler(workdir / "direct.log")
+    file_handler.setFormatter(logging.Formatter(FORMAT))
+    direct.addHandler(file_handler)
+
+    queued = logging.getLogger("bench.queued")
+    queued.propagate = False
+    queued.setLevel(logging.INFO)
+    log_queue = queue.SimpleQueue()
+    queued.addHandler(DeferredQueueHandler(log_queue))
+    rotating = RotatingFileHandler(
+        workdir / "queued.log", maxBytes=10 * 1024 * 1024, backupCount=2
+    )
+    rotating.setFormatter(JsonLinesFormatter())
+    listener = QueueListener(log_queue, rotating)
+    listener.start()
+
+    message = "Получено сообщение от %s: %s"
+    text = "Покажи ЖК со сроком сдачи до 2026 года рядом с парком"
+    sync = per_call_in_bursts(lambda: direct.info(message, 42, text), count)
+    deferred_write = per_call_in_bursts(
+        lambda: queued.info(message, 42, text, extra={"user_id": 42}), count
+    )
+    start = time.perf_counter()
+    listener.stop()
+    drain = time.perf_counter() - start
+    lines = sum(1 for _ in open(workdir / "queued.log", encoding="utf-8"))
+    print(
+        f"Запись INFO: FileHandler {sync:.1f} мкс, очередь {deferred_write:.1f} мкс "
+        f"(фоновый поток дописал {lines} строк JSON за {drain * 1e3:.0f} мс "
+        f"после остановки)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Накладные расходы декоратора профилирования на вызов обработчика.
+
+Сравнивается вызов пустого асинхронного обработчика без обертки, с
+выключенным профилировщиком и во время сеанса cProfile.
+
+Запуск из корня проекта:
+    python benchmarks/bench_profiler.py [число_вызовов]
+"""
+
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from profiler import Profiler
+
+
+async def handler(update, context):
+    return update
+
+
+async def per_call(func, count: int) -> float:
+    """Среднее время вызова в наносекундах"""
+    start = time.perf_counter()
+    for i in range(count):
+        await func(i, None)
+    return (time.perf_counter() - start) / count * 1e9
+
+
+async def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    profiler = Profiler(tempfile.mkdtemp())
+    wrapped = profiler.profiled(handler)
+
+    plain = await per_call(handler, count)
+    disabled = await per_call(wrapped, count)
+    profiler.start(updates=count + 1)
+    enabled = await per_call(wrapped, count // 10)
+    path = profiler.stop(notify=False)
+    print(
+        f"Вызов обработчика: без обертки {plain:.0f} нс, профилирование выключено "
+        f"{disabled:.0f} нс (+{disabled - plain:.0f} нс), во время cProfile "
+        f"{enabled:.0f} нс; профиль: {path}"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
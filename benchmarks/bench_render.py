@@ -0,0 +1,86 @@
+"""
+Микробенчмарк форматирования контекста: utils против RenderCache.
+
+Запуск из корня проекта:
+    python benchmarks/bench_render.py [число_объектов]
+"""
+
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from name_resolver import NameResolver
+from render_cache import RenderCache
+from utils import compare_complexes, format_context
+
+
+def make_catalog(size: int) -> dict:
+    """Синтетический каталог заданного размера"""
+    return {
+        f"ЖК Тестовый {i}": {
+            "описание": f"Жилой комплекс номер {i} с подземным паркингом и двором без машин.",
+            "этажность": 5 + i % 30,
+            "срок_сдачи": f"{i % 4 + 1} кв. {2024 + i % 4}",
+            "особенности": ["паркинг", "детская площадка", "фитнес", "консьерж"],
+            "ближайшие_объекты": [
+                {"название": f"Школа №{i}", "тип": "школа", "расстояние": "400 м"},
+                {"название": f"Парк {i}", "тип": "парк", "расстояние": "300 м"},
+                {"название": f"ТЦ {i}", "тип": "торговый центр", "расстояние": "1 км"},
+            ],
+        }
+        for i in range(size)
+    }
+
+
+def bench(label: str, func, number: int = 20000) -> float:
+    seconds = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print(f"  {label:<40} {seconds * 1e6:8.2f} мкс")
+    return seconds
+
+
+def main() -> None:
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    db = make_catalog(size)
+    names = list(db)
+    record = {"название": names[0], **db[names[0]]}
+    auto_search = {"special_type": "auto_search", "objects": names[:5]}
+    compare = {"special_type": "compare", "objects": names[:3]}
+
+    resolver = NameResolver(db.keys())
+    build = min(timeit.repeat(lambda: RenderCache(db, resolver), number=1, repeat=3))
+    cache = RenderCache(db, resolver)
+    print(f"Каталог: {size} объектов, подготовка RenderCache: {build * 1e3:.1f} мс")
+
+    cases = [
+        (
+            "объект",
+            lambda: format_context(record, db),
+            lambda: cache.format_context(record),
+        ),
+        (
+            "автопоиск (5 объектов)",
+            lambda: format_context(auto_search, db),
+            lambda: cache.format_context(auto_search),
+        ),
+        (
+            "сравнение (3 объекта)",
+            lambda: format_context(compare, db),
+            lambda: cache.format_context(compare),
+        ),
+        (
+            "ответ со сравнением",
+            lambda: compare_complexes(names[:3], db, resolver),
+            lambda: cache.compare(names[:3]),
+        ),
+    ]
+    for label, plain, cached in cases:
+        print(f"{label}:")
+        before = bench("utils (сборка строки)", plain)
+        after = bench("RenderCache (готовый текст)", cached)
+        print(f"  ускорение: x{before / after:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Векторный отбор объектов для промпта против полной сводки каталога.
+
+Запуск из корня проекта:
+    python benchmarks/bench_semantic.py [число_объектов]
+"""
+
+import random
+import sys
+import time
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from name_resolver import NameResolver
+from prompt_builder import estimate_tokens
+from render_cache import RenderCache
+from semantic_index import SEMANTIC_TOP_K, SemanticIndex
+from utils import generate_all_objects_summary
+
+FEATURES = [
+    "подземный паркинг",
+    "бассейн",
+    "фитнес-центр",
+    "детский сад во дворе",
+    "панорамные окна",
+    "закрытая территория",
+    "консьерж",
+    "вид на реку",
+    "двор без машин",
+    "кладовые",
+]
+NEARBY_TYPES = ["школа", "парк", "торговый центр", "поликлиника", "метро", "сквер"]
+CLASSES = ["эконом", "комфорт", "бизнес", "премиум"]
+
+QUERIES = [
+    ("хочу квартиру с бассейном и видом на реку", ["бассейн", "вид на реку"]),
+    ("нужен дом рядом с метро и поликлиникой", ["метро", "поликлиника"]),
+    ("что есть бизнес-класса с консьержем", ["бизнес", "консьерж"]),
+]
+
+
+def make_catalog(size: int, seed: int = 1) -> dict:
+    rnd = random.Random(seed)
+    db = {}
+    for i in range(size):
+        db[f"ЖК Объект {i}"] = {
+            "описание": f"Жилой комплекс {rnd.choice(CLASSES)}-класса, корпус {i}.",
+            "этажность": rnd.randint(5, 35),
+            "срок_сдачи": f"{rnd.randint(1, 4)} кв. {rnd.randint(2024, 2028)}",
+            "особенности": rnd.sample(FEATURES, 3),
+            "ближайшие_объекты": [
+                {
+                    "название": f"{kind.capitalize()} №{rnd.randint(1, 500)}",
+                    "тип": kind,
+                    "расстояние": f"{rnd.randint(1, 20) * 100} м",
+                }
+                for kind in rnd.sample(NEARBY_TYPES, 2)
+            ],
+        }
+    return db
+
+
+def matches_all(obj: dict, name: str, words: list) -> bool:
+    text = " ".join(
+        [name, obj["описание"], *obj["особенности"]]
+        + [n["тип"] for n in obj["ближайшие_объекты"]]
+    ).lower()
+    return all(word in text for word in words)
+
+
+def main() -> None:
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    k = SEMANTIC_TOP_K or 5
+    db = make_catalog(size)
+
+    start = time.perf_counter()
+    index = SemanticIndex(db)
+    print(f"Каталог: {size} объектов, индекс: {time.perf_counter() - start:.2f} сек")
+    cache = RenderCache(db, NameResolver(db.keys()))
+
+    full_tokens = estimate_tokens(generate_all_objects_summary(db))
+    for query, words in QUERIES:
+        seconds = min(
+            timeit.repeat(lambda: index.search(query, k), number=50, repeat=3)
+        )
+        names = [name for name, _ in index.search(query, k)]
+        precision = sum(matches_all(db[name], name, words) for name in names) / len(
+            names
+        )
+        tokens = estimate_tokens(cache.relevant_summary(names))
+        print(
+            f"«{query}»: поиск {seconds / 50 * 1e3:.2f} мс, "
+            f"точность top-{k}: {precision:.0%}, "
+            f"сводка ~{tokens} токенов вместо ~{full_tokens}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Нагрузочный тест многопроцессного режима: пропускная способность при 1 и N обработчиках.
+
+Поднимает заглушки Telegram Bot API (в этом процессе) и YandexGPT, запускает
+shard_router.py и шлет обновления от множества чатов. Время - до получения
+заглушкой Telegram ответов на все сообщения. Проверяется и порядок: заглушка
+YandexGPT повторяет вопрос, и ответы в каждом чате должны идти в порядке вопросов.
+
+Запуск из корня проекта:
+    python benchmarks/bench_sharded.py [число_обновлений] [число_обработчиков]
+"""
+
+import asyncio
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import aiohttp
+from aiohttp import web
+
+ROOT = Path(__file__).resolve().parent.parent
+TG_PORT = 8181
+LLM_PORT = 8766
+FRONT_PORT = 8190
+CHATS = 200
+CONCURRENCY = 64
+# Открытый вопрос (уходит в модель) с номером для проверки порядка
+QUESTION = "посоветуйте квартиру в ЖК Солнечный, вопрос №{}"
+NUMBER_RE = re.compile(r"№(\d+)")
+
+
+class FakeTelegram:
+    """Заглушка Bot API: считает sendMessage и запоминает порядок по чатам"""
+
+    def __init__(self):
+        self.replies = defaultdict(list)
+        self.count = 0
+        self.app = web.Application()
+        self.app.router.add_post("/bot{token}/{method}", self.handle)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        data = dict(await request.post()) if request.can_read_body else {}
+        if method == "getMe":
+            result = {
+                "id": 1,
+                "is_bot": True,
+                "first_name": "bench",
+                "username": "bench_bot",
+            }
+        elif method == "sendMessage":
+            chat_id = int(data.get("chat_id", 0))
+            self.replies[chat_id].append(data.get("text", ""))
+            self.count += 1
+            result = {
+                "message_id": self.count,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": data.get("text", ""),
+            }
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+
+def update(update_id: int, chat_id: int, text: str) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Bench"},
+            "text": text,
+        },
+    }
+
+
+async def wait_ready(session, url: str, timeout: float = 180) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(url) as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"{url} не готов")
+
+
+async def run(workers: int, total: int, telegram: FakeTelegram, tmp: Path) -> float:
+    telegram.replies.clear()
+    telegram.count = 0
+    env = {
+        **os.environ,
+        "TELEGRAM_TOKEN": "123:bench",
+        "TELEGRAM_API_URL": f"http://127.0.0.1:{TG_PORT}/bot",
+        "YANDEX_GPT_URL": f"http://127.0.0.1:{LLM_PORT}/foundationModels/v1/completion",
+        "YANDEX_API_KEY": "bench",
+        "YANDEX_FOLDER_ID": "bench",
+        "WEBHOOK_HOST": "127.0.0.1",
+        "WEBHOOK_PORT": str(FRONT_PORT),
+        "WEBHOOK_URL": "",
+        "SHARD_BASE_PORT": str(FRONT_PORT + 10),
+        "CATALOG_WATCH_INTERVAL": "0",
+        "SESSION_DB_PATH": str(tmp / f"sessions{workers}.db"),
+        "LLM_RPS": "10000",
+    }
+    front = subprocess.Popen(
+        [sys.executable, "shard_router.py", "--workers", str(workers)],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        async with aiohttp.ClientSession() as session:
+            await wait_ready(session, f"http://127.0.0.1:{FRONT_PORT}/readyz")
+            url = f"http://127.0.0.1:{FRONT_PORT}/telegram"
+            # Сообщения одного чата идут по порядку, чаты - параллельно
+            per_chat = defaultdict(list)
+            for i in range(total):
+                chat_id = 1000 + i % CHATS
+                per_chat[chat_id].append(update(i + 1, chat_id, QUESTION.format(i)))
+            semaphore = asyncio.Semaphore(CONCURRENCY)
+
+            async def send_chat(updates: list) -> None:
+                for item in updates:
+                    async with semaphore:
+                        async with session.post(url, json=item) as response:
+                            assert response.status == 200, response.status
+
+            start = time.perf_counter()
+            await asyncio.gather(*(send_chat(u) for u in per_chat.values()))
+            while telegram.count < total:
+                if time.perf_counter() - start > 300:
+                    break
+                await asyncio.sleep(0.05)
+            elapsed = time.perf_counter() - start
+    finally:
+        front.terminate()
+        front.wait(timeout=120)
+
+    numbers = {
+        chat_id: [int(n) for n in NUMBER_RE.findall(" ".join(replies))]
+        for chat_id, replies in telegram.replies.items()
+    }
+    ordered = all(found == sorted(found) for found in numbers.values())
+    checked = sum(len(found) for found in numbers.values())
+    print(
+        f"обработчиков: {workers}: {telegram.count}/{total} ответов за {elapsed:.2f} сек, "
+        f"{telegram.count / elapsed:.0f} обновлений/сек, "
+        f"порядок в чатах соблюден: {ordered} (проверено {checked} ответов)"
+    )
+    return telegram.count / elapsed
+
+
+async def main() -> None:
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else max(os.cpu_count() or 1, 2)
+    print(f"Ядер: {os.cpu_count()}, обновлений: {total}, чатов: {CHATS}")
+
+    telegram = FakeTelegram()
+    runner = web.AppRunner(telegram.app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", TG_PORT).start()
+    llm = subprocess.Popen(
+        [
+            sys.executable,
+            "benchmarks/fake_yandexgpt.py",
+            "--port",
+            str(LLM_PORT),
+            "--latency",
+            "0.05",
+            "--echo",
+        ],
+        cwd=ROOT,
+    )
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            single = await run(1, total, telegram, Path(tmp))
+            sharded = await run(workers, total, telegram, Path(tmp))
+        print(f"ускорение: x{sharded / single:.1f}")
+    finally:
+        llm.terminate()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
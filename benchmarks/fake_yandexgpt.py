@@ -0,0 +1,126 @@
+"""
+Локальная заглушка YandexGPT completion API для проверки клиента.
+
+Запуск:
+    python benchmarks/fake_yandexgpt.py --port 8765 --latency 0.3 --slow-rate 0.05 \
+        --slow-latency 5 --error-rate 0.1 --throttle-rate 0.05
+
+Бот направляется на заглушку переменной окружения:
+    YANDEX_GPT_URL=http://127.0.0.1:8765/foundationModels/v1/completion
+
+GET /stats возвращает число запросов и ответов по кодам.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+from collections import Counter
+
+from aiohttp import web
+
+ANSWER = "В ЖК Солнечный 25 этажей. Сдача дома запланирована на 3 квартал 2025 года."
+
+
+def completion(text: str, final: bool = True) -> dict:
+    return {
+        "result": {
+            "alternatives": [
+                {
+                    "message": {"role": "assistant", "text": text},
+                    "status": (
+                        "ALTERNATIVE_STATUS_FINAL"
+                        if final
+                        else "ALTERNATIVE_STATUS_PARTIAL"
+                    ),
+                }
+            ],
+            "usage": {
+                "inputTextTokens": "100",
+                "completionTokens": "20",
+                "totalTokens": "120",
+            },
+            "modelVersion": "fake",
+        }
+    }
+
+
+def make_app(args) -> web.Application:
+    counters = Counter()
+
+    async def handle_completion(request: web.Request) -> web.StreamResponse:
+        counters["requests"] += 1
+        payload = await request.json()
+        roll = random.random()
+        if roll < args.throttle_rate:
+            counters["429"] += 1
+            return web.json_response(
+                {"message": "too many requests"},
+                status=429,
+                headers={"Retry-After": "0"},
+            )
+        if roll < args.throttle_rate + args.error_rate:
+            counters["503"] += 1
+            return web.json_response({"message": "unavailable"}, status=503)
+
+        slow = random.random() < args.slow_rate
+        latency = args.slow_latency if slow else random.expovariate(1 / args.latency)
+        counters["slow" if slow else "fast"] += 1
+
+        answer = ANSWER
+        if args.echo:
+            questions = [m["text"] for m in payload["messages"] if m["role"] == "user"]
+            answer = f"{ANSWER} Вы спросили: {questions[-1] if questions else ''}"
+
+        if not payload.get("completionOptions", {}).get("stream"):
+            await asyncio.sleep(latency)
+            counters["200"] += 1
+            return web.json_response(completion(answer))
+
+        response = web.StreamResponse()
+        await response.prepare(request)
+        words = answer.split()
+        for i in range(1, len(words) + 1):
+            await asyncio.sleep(latency / len(words))
+            chunk = completion(" ".join(words[:i]), final=i == len(words))
+            await response.write(json.dumps(chunk, ensure_ascii=False).encode() + b"\n")
+        counters["200"] += 1
+        await response.write_eof()
+        return response
+
+    async def handle_stats(request: web.Request) -> web.Response:
+        return web.json_response(dict(counters))
+
+    app = web.Application()
+    app.router.add_post("/foundationModels/v1/completion", handle_completion)
+    app.router.add_get("/stats", handle_stats)
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--latency", type=float, default=0.3, help="средняя задержка, сек"
+    )
+    parser.add_argument(
+        "--slow-rate", type=float, default=0.0, help="доля медленных ответов"
+    )
+    parser.add_argument(
+        "--slow-latency", type=float, default=5.0, help="задержка медленного ответа"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="доля ответов 503"
+    )
+    parser.add_argument(
+        "--throttle-rate", type=float, default=0.0, help="доля ответов 429"
+    )
+    parser.add_argument(
+        "--echo", action="store_true", help="повторять в ответе последний вопрос"
+    )
+    args = parser.parse_args()
+    web.run_app(make_app(args), host="127.0.0.1", port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
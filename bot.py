@@ -8,47 +8,65 @@ from telegram.ext import (
     CommandHandler,
 )
 import os
+import asyncio
 import logging
 import json
 from dotenv import load_dotenv
 from collections import defaultdict
 from pathlib import Path
-import sys
+import re
+import time
 from telegram import ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram import BotCommand, BotCommandScopeDefault, MenuButtonCommands
+from telegram.error import BadRequest, RetryAfter
 import random
+import argparse
+from functools import partial
 
 # Кастомные модули
-from llm_integration import generate_yandexgpt_response
+from llm_integration import (
+    generate_yandexgpt_response_async,
+    generate_yandexgpt_stream,
+    close_llm_client,
+    is_error_response,
+    MAX_TOKENS,
+    StreamInterrupted,
+    llm_scheduler,
+    llm_singleflight,
+    yandexgpt_client,
+)
+from llm_scheduler import (
+    PRIORITY_CONTACT,
+    PRIORITY_NEW_USER,
+    PRIORITY_NORMAL,
+    PRIORITY_BACKGROUND,
+)
 from utils import *
+from catalog import catalog_store, CatalogError
+from response_cache import response_cache, is_cacheable_turn
+from prompt_builder import PromptBuilder, count_prompt_tokens
+from conversation_memory import remember_turn, refine_summary
 from contact_manager import contact_manager
+from webhook_server import run_webhook
+from chat_dispatch import configure_builder
+from session_store import session_store
+from fast_path import fast_path
+from semantic_index import SEMANTIC_TOP_K
+from log_setup import setup_logging, lazy
+from metrics import metrics
+from profiler import (
+    profiler,
+    MODES as PROFILE_MODES,
+    DEFAULT_MODE as PROFILE_DEFAULT_MODE,
+)
 
 # Загрузка переменных окружения
 load_dotenv()
 
-# Настройка логирования
+# Настройка логирования: запись через очередь в фоновом потоке,
+# файл в формате JSON Lines с ротацией (см. log_setup)
+setup_logging()
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
-
-# Создаем обработчик для консоли
-console_handler = logging.StreamHandler(sys.stdout)
-console_handler.setLevel(logging.DEBUG)
-console_formatter = logging.Formatter(
-    "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
-console_handler.setFormatter(console_formatter)
-
-# Создаем обработчик для файла
-file_handler = logging.FileHandler("bot.log", mode="w")
-file_handler.setLevel(logging.DEBUG)
-file_formatter = logging.Formatter(
-    "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
-file_handler.setFormatter(file_formatter)
-
-# Добавляем обработчики к логгеру
-logger.addHandler(console_handler)
-logger.addHandler(file_handler)
 
 # Проверка наличия токена
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
@@ -56,9 +74,24 @@ if not TELEGRAM_TOKEN:
     logger.error("Переменная окружения TELEGRAM_TOKEN не установлена!")
     exit(1)
 
-# Глобальная база данных
-database = None
-all_objects_summary = None
+# Режим получения обновлений: polling (по умолчанию) или webhook
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+# Адрес Bot API (например, локального сервера Bot API или тестовой заглушки)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")
+# Telegram ID администраторов через запятую (служебные команды, например /stats)
+ADMIN_IDS = {int(x) for x in os.getenv("ADMIN_IDS", "").split(",") if x.strip()}
+# Сколько обновлений профилирует /profile без аргументов
+PROFILE_DEFAULT_UPDATES = 20
+
+# Потоковая выдача ответов LLM с постепенным редактированием сообщения
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "0") == "1"
+# Минимальный интервал между правками одного сообщения (лимиты Telegram)
+STREAM_EDIT_INTERVAL = float(os.getenv("STREAM_EDIT_INTERVAL", "1.0"))
+SENTENCE_END = re.compile(r"[.!?…](\s|$)|\n")
+# Приписка к ответу, поток которого оборвался на середине
+STREAM_INTERRUPTED_NOTICE = (
+    "⚠️ Ответ прервался из-за ошибки сервиса. Повторите, пожалуйста, вопрос."
+)
 
 SYSTEM_PROMPT = """
 Ты - эксперт по недвижимости с доступом к базе данных. Твои правила:
@@ -94,29 +127,63 @@ SYSTEM_PROMPT = """
 11. НЕ ПРЕДПОЛАГАЙ ответы пользователя. Задавай вопросы и жди реального ответа.
 """
 
+# Указания модели после вопроса пользователя
+FINAL_INSTRUCTIONS = [
+    "ВАЖНО: Отвечай только на последний запрос пользователя. Не пытайся предугадывать его ответы.",
+    "ЗАКЛЮЧЕНИЕ: Твой ответ должен заканчиваться на этом. Не добавляй ничего после.",
+]
+
+# Сборщик промпта с учетом бюджета токенов модели
+prompt_builder = PromptBuilder(max_output_tokens=MAX_TOKENS)
+
+
+def llm_priority(user_data: dict) -> int:
+    """Приоритет запроса к YandexGPT: клиенты с контактами и новички - раньше"""
+    if user_data.get("collecting_contacts") or user_data.get("contact_saved"):
+        return PRIORITY_CONTACT
+    if not user_data.get("history"):
+        return PRIORITY_NEW_USER
+    return PRIORITY_NORMAL
+
+
+def catalog_overview(snapshot, user_text: str) -> tuple:
+    """
+    Заголовок и сводка каталога для промпта.
+
+    Небольшой каталог передается целиком, иначе - только SEMANTIC_TOP_K
+    объектов, ближайших к запросу по векторному индексу.
+    """
+    if SEMANTIC_TOP_K <= 0 or len(snapshot.data) <= SEMANTIC_TOP_K:
+        return "ВСЯ БАЗА ОБЪЕКТОВ (кратко):", snapshot.summary
+
+    matches = snapshot.semantic_index.search(user_text, SEMANTIC_TOP_K)
+    logger.debug(f"Релевантные объекты: {matches}")
+    return (
+        f"ПОДХОДЯЩИЕ ОБЪЕКТЫ ИЗ БАЗЫ (кратко, всего в базе: {len(snapshot.data)}):",
+        snapshot.render_cache.relevant_summary([name for name, _ in matches]),
+    )
+
 
 def load_database():
-    """Загрузка базы данных из JSON-файла"""
-    global database
+    """Загрузка базы данных из JSON-файла (или его актуального бинарного снимка)"""
     try:
-        # Определяем путь к файлу базы данных
-        current_dir = Path(__file__).resolve().parent
-        db_path = current_dir / "data" / "database.json"
-
+        db_path = catalog_store.path
         logger.info(f"Попытка загрузки базы данных из: {db_path}")
 
         if not db_path.exists():
             logger.error(f"Файл базы данных не найден: {db_path}")
             return None
 
-        with open(db_path, "r", encoding="utf-8") as f:
-            database = json.load(f)
-            logger.info(f"База данных загружена. Объектов: {len(database)}")
-            return database
+        # Снимок каталога вместе с индексами и сводкой
+        snapshot = catalog_store.load()
+        return snapshot.data
 
     except json.JSONDecodeError as e:
         logger.exception("Ошибка декодирования JSON в базе данных")
         return None
+    except CatalogError as e:
+        logger.error(f"База данных не прошла проверку: {e}")
+        return None
     except Exception as e:
         logger.exception(f"Критическая ошибка загрузки базы данных: {e}")
         return None
@@ -126,6 +193,8 @@ def load_database():
 load_database()
 
 
+@profiler.profiled
+@metrics.timed("start")
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Обработчик команды /start"""
     user = update.message.from_user
@@ -177,11 +246,18 @@ async def handle_first_message(
     context.user_data["expecting_name"] = True
 
 
+@profiler.profiled
+@metrics.timed("handle_message")
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     try:
         user_id = update.message.from_user.id
         user_text = update.message.text
-        logger.info(f"Получено сообщение от {user_id}: {user_text}")
+        logger.info(
+            "Получено сообщение от %s: %s",
+            user_id,
+            user_text,
+            extra={"user_id": user_id},
+        )
 
         # Проверка на команды, которые должны сбрасывать состояние
         reset_commands = ["/start", "/menu", "главное меню", "начать сначала"]
@@ -256,7 +332,9 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                     return
 
                 # Получаем результат сравнения
-                comparison_result = compare_complexes(complexes, database)
+                comparison_result = catalog_store.current.render_cache.compare(
+                    complexes
+                )
 
                 # Отправляем результат
                 await update.message.reply_text(comparison_result)
@@ -298,9 +376,13 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                 )
                 logger.info(f"Контекст диалога: {dialog_context}")
 
-                # Сохраняем контакт
-                if contact_manager.save_contact(
-                    user_id=user_id, name=name, phone=phone, context=dialog_context
+                # Сохраняем контакт (INSERT с fsync - вне цикла событий)
+                if await asyncio.to_thread(
+                    contact_manager.save_contact,
+                    user_id=user_id,
+                    name=name,
+                    phone=phone,
+                    context=dialog_context,
                 ):
                     logger.info("Контакт успешно сохранен в системе")
 
@@ -346,7 +428,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
         # Обработка команд главного меню
         if user_text == "Показать все ЖК":
-            all_objects = list(database.keys())
+            all_objects = list(catalog_store.current.data.keys())
             response = "🏠 Доступные жилые комплексы:\n" + "\n".join(
                 [f"• {name}" for name in all_objects]
             )
@@ -383,85 +465,105 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         user_name = context.user_data.get("user_name", "клиент")
         personalized_prompt = SYSTEM_PROMPT.format(user_name=user_name)
 
+        # Текущий снимок каталога - один на всю обработку сообщения
+        snapshot = catalog_store.current
+
         # Универсальный поиск объектов в базе данных
-        object_data = find_object_in_db(user_text, database)
+        with metrics.timer("find_object"):
+            object_data = find_object_in_db(user_text, snapshot)
+        if not object_data and context.user_data.get("object_context_version") not in (
+            None,
+            snapshot.version,
+        ):
+            # Каталог обновился - перестраиваем прежний контекст по новой версии
+            object_data = resolve_object_reference(
+                context.user_data.get("object_ref"), snapshot
+            )
+            if not object_data:
+                context.user_data["object_context"] = ""
         if object_data:
-            context.user_data["object_context"] = format_context(object_data, database)
+            context.user_data["object_context"] = snapshot.render_cache.format_context(
+                object_data
+            )
+            context.user_data["object_ref"] = object_reference(object_data)
             logger.info(f"Обновлен контекст объекта")
+        context.user_data["object_context_version"] = snapshot.version
 
-        # Формируем сообщения для GPT
-        messages = [{"role": "system", "text": personalized_prompt}]
+        # Фактические вопросы (срок сдачи, этажность, что рядом, список ЖК)
+        # отвечаем прямо из каталога, без YandexGPT
+        with metrics.timer("fast_path"):
+            fast_answer = fast_path.answer(
+                user_text, snapshot, object_data or context.user_data.get("object_ref")
+            )
+        if fast_answer:
+            remember_dialog_turn(context, user_text, fast_answer)
+            with metrics.timer("reply"):
+                await update.message.reply_text(fast_answer)
+            logger.debug("Быстрые ответы: %s", lazy(fast_path.stats))
+            return
 
-        # 0. Флаг сохраненного контакта
+        # Формируем сообщения для GPT в пределах бюджета токенов
+        notes = []
         if context.user_data.get("contact_saved"):
-            messages.append(
-                {
-                    "role": "system",
-                    "text": "ВАЖНО: Контактные данные клиента уже сохранены! Не предлагать снова.",
-                }
+            notes.append(
+                "ВАЖНО: Контактные данные клиента уже сохранены! Не предлагать снова."
             )
-
-        # 1. Основные системные инструкции
-        messages.append({"role": "system", "text": SYSTEM_PROMPT})
-
-        # 2. Контекст объекта (если есть)
-        if context.user_data["object_context"]:
-            messages.append(
-                {
-                    "role": "system",
-                    "text": f"ТЕКУЩИЙ КОНТЕКСТ ОБЪЕКТА:\n{context.user_data['object_context']}",
-                }
+        with metrics.timer("prompt"):
+            catalog_title, catalog_summary = catalog_overview(snapshot, user_text)
+            messages = prompt_builder.build(
+                system_prompt=personalized_prompt,
+                user_text=user_text,
+                object_context=context.user_data["object_context"],
+                conversation_summary=context.user_data.get("summary", ""),
+                catalog_summary=catalog_summary,
+                catalog_title=catalog_title,
+                history=context.user_data["history"],
+                notes=notes,
+                final_instructions=FINAL_INSTRUCTIONS,
             )
 
-        # 3. Добавляем краткую сводку по всем объектам
-        global all_objects_summary
-        if not all_objects_summary:
-            all_objects_summary = generate_all_objects_summary(database)
-        messages.append(
-            {
-                "role": "system",
-                "text": f"ВСЯ БАЗА ОБЪЕКТОВ (кратко):\n{all_objects_summary}",
-            }
-        )
-
-        # 4. Добавляем историю диалога
-        for msg in context.user_data["history"]:
-            # Фильтруем только сообщения пользователя
-            if msg["role"] == "user":
-                messages.append({"role": "user", "text": msg["text"]})
-            # Для ассистента добавляем с пометкой
-            elif msg["role"] == "assistant":
-                messages.append(
-                    {"role": "assistant", "text": f"[Ассистент]: {msg['text']}"}
-                )
-
-        # 5. Добавляем текущий запрос пользователя
-        messages.append({"role": "user", "text": user_text})
-
-        # 6. Важные указания для модели
-        messages.append(
-            {
-                "role": "system",
-                "text": "ВАЖНО: Отвечай только на последний запрос пользователя. Не пытайся предугадывать его ответы.",
-            }
-        )
-        messages.append(
-            {
-                "role": "system",
-                "text": "ЗАКЛЮЧЕНИЕ: Твой ответ должен заканчиваться на этом. Не добавляй ничего после.",
-            }
-        )
-
         # Логирование для отладки
-        logger.info(f"Сформировано {len(messages)} сообщений для GPT")
-        logger.debug(f"Первые 3 сообщения:")
-        for i, msg in enumerate(messages[:3]):
-            logger.debug(f"  {i}. {msg['role']}: {msg['text'][:100]}...")
+        logger.info(
+            "Сформировано %d сообщений для GPT (~%s токенов)",
+            len(messages),
+            lazy(count_prompt_tokens, messages),
+        )
+        logger.debug("Первые 3 сообщения:\n%s", lazy(preview_messages, messages))
+
+        # Проверяем кэш ответов (только для безымянных вопросов без предыстории)
+        cache_key = None
+        response_text = None
+        if is_cacheable_turn(context.user_data):
+            cache_key = response_cache.make_key(
+                user_text,
+                context.user_data["object_context"],
+                snapshot.content_hash,
+            )
+            response_text = response_cache.get(cache_key)
+            logger.debug("Кэш ответов: %s", lazy(response_cache.stats))
 
         # Получаем ответ от YandexGPT
-        logger.info("Вызов generate_yandexgpt_response")
-        response_text = generate_yandexgpt_response(messages)
-        logger.info(f"Ответ от YandexGPT: {response_text}")
+        streamed = False
+        priority = llm_priority(context.user_data)
+        if response_text is not None:
+            logger.info("Ответ взят из кэша")
+        else:
+            if STREAM_RESPONSES:
+                logger.info("Вызов generate_yandexgpt_stream")
+                with metrics.timer("llm_stream_reply"):
+                    response_text = await reply_with_stream(update, messages, priority)
+                streamed = True
+            else:
+                logger.info("Вызов generate_yandexgpt_response_async")
+                with metrics.timer("llm"):
+                    response_text = await generate_yandexgpt_response_async(
+                        messages, priority
+                    )
+                logger.debug("Планировщик LLM: %s", lazy(llm_scheduler.stats))
+
+            if cache_key and not is_error_response(response_text):
+                response_cache.set(cache_key, response_text)
+        logger.info("Ответ от YandexGPT: %s", response_text)
 
         # Проверяем, содержит ли ответ запрос контактов
         if any(
@@ -476,29 +578,21 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             context.user_data["collecting_contacts"] = True
             logger.info("Установлен флаг collecting_contacts")
 
-        # Добавляем ответ бота в историю
-        context.user_data["history"].append(
-            {"role": "assistant", "text": response_text}
-        )
-
-        # Добавляем запрос пользователя в историю
-        context.user_data["history"].append({"role": "user", "text": user_text})
+        # Добавляем ход в историю; старые сообщения сворачиваются в сводку.
+        # Текст ошибки в историю не попадает, иначе модель будет его повторять
+        if not is_error_response(response_text):
+            remember_dialog_turn(context, user_text, response_text)
 
-        # Ограничиваем размер истории (последние 10 сообщений)
-        MAX_HISTORY_LENGTH = 10
-        context.user_data["history"] = context.user_data["history"][
-            -MAX_HISTORY_LENGTH:
-        ]
-        logger.debug(
-            f"История сокращена до {len(context.user_data['history'])} сообщений"
-        )
-
-        # Форматируем ответ для Telegram
-        clean_response = clean_telegram_text(response_text)
+        # В потоковом режиме ответ уже отправлен
+        if not streamed:
+            # Форматируем ответ для Telegram
+            with metrics.timer("clean_text"):
+                clean_response = clean_telegram_text(response_text)
 
-        # Отправляем ответ пользователю
-        await update.message.reply_text(clean_response)
-        logger.info("Сообщение отправлено пользователю")
+            # Отправляем ответ пользователю
+            with metrics.timer("reply"):
+                await update.message.reply_text(clean_response)
+            logger.info("Сообщение отправлено пользователю")
 
     except Exception as e:
         logger.exception("Критическая ошибка в обработчике сообщений")
@@ -508,6 +602,117 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             logger.error(f"Ошибка при отправке сообщения об ошибке: {send_error}")
 
 
+def preview_messages(messages: list, count: int = 3) -> str:
+    """Начало промпта для отладочного лога"""
+    return "\n".join(
+        f"  {i}. {msg['role']}: {msg['text'][:100]}..."
+        for i, msg in enumerate(messages[:count])
+    )
+
+
+def remember_dialog_turn(
+    context: ContextTypes.DEFAULT_TYPE, user_text: str, response_text: str
+) -> None:
+    """Добавляет ход в историю; старые сообщения сворачиваются в сводку"""
+    fold = remember_turn(context.user_data, user_text, response_text)
+    if fold:
+        # Сводку уточняет модель в фоне, не задерживая ответ
+        context.application.create_task(
+            refine_summary(
+                context.user_data,
+                fold,
+                partial(
+                    generate_yandexgpt_response_async, priority=PRIORITY_BACKGROUND
+                ),
+            )
+        )
+    logger.debug("В истории %d сообщений", len(context.user_data["history"]))
+
+
+async def edit_stream_message(message, text: str) -> float:
+    """
+    Редактирует сообщение с частичным ответом.
+
+    Возвращает паузу в секундах, которую Telegram попросил выдержать
+    перед следующей правкой (0, если ограничений нет).
+    """
+    try:
+        await message.edit_text(text)
+    except RetryAfter as e:
+        logger.warning(f"Лимит правок Telegram, пауза {e.retry_after} сек")
+        return float(e.retry_after)
+    except BadRequest as e:
+        # Текст не изменился - это не ошибка
+        if "not modified" not in str(e).lower():
+            raise
+    return 0.0
+
+
+async def reply_with_stream(
+    update: Update, messages: list, priority: int = PRIORITY_NORMAL
+) -> str:
+    """
+    Отправляет ответ YandexGPT по мере генерации.
+
+    Первое сообщение уходит, как только готово первое предложение, затем
+    оно дополняется правками не чаще STREAM_EDIT_INTERVAL. Итоговый текст
+    проходит через clean_telegram_text. Возвращает полный текст ответа.
+
+    Если поток оборвался посреди ответа, показанная часть остается, к ней
+    добавляется STREAM_INTERRUPTED_NOTICE, а возвращается текст ошибки -
+    такой ответ не кэшируется и не попадает в историю.
+    """
+    sent_message = None
+    shown_text = ""
+    next_edit_at = 0.0
+    response_text = ""
+    error_text = None
+
+    try:
+        async for response_text in generate_yandexgpt_stream(messages, priority):
+            draft = response_text.replace("**", "").replace("__", "").strip()
+            if not draft:
+                continue
+
+            if sent_message is None:
+                # Ждем окончания первого предложения
+                if not SENTENCE_END.search(draft):
+                    continue
+                sent_message = await update.message.reply_text(draft)
+                shown_text = draft
+                next_edit_at = time.monotonic() + STREAM_EDIT_INTERVAL
+                logger.info("Отправлен первый фрагмент ответа")
+                continue
+
+            now = time.monotonic()
+            if now >= next_edit_at and draft != shown_text:
+                pause = await edit_stream_message(sent_message, draft)
+                if not pause:
+                    shown_text = draft
+                next_edit_at = now + max(pause, STREAM_EDIT_INTERVAL)
+    except StreamInterrupted as e:
+        logger.warning("Поток ответа оборвался: %s", e.error_text)
+        error_text = e.error_text
+
+    # Финальная версия ответа
+    final_text = clean_telegram_text(response_text)
+    if error_text is not None:
+        final_text = f"{final_text}\n\n{STREAM_INTERRUPTED_NOTICE}".strip()
+    if sent_message is None:
+        await update.message.reply_text(final_text)
+    elif final_text != shown_text:
+        delay = next_edit_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        pause = await edit_stream_message(sent_message, final_text)
+        if pause:
+            await asyncio.sleep(pause)
+            await edit_stream_message(sent_message, final_text)
+    logger.info("Сообщение отправлено пользователю (поток)")
+
+    return response_text if error_text is None else error_text
+
+
 def extract_contact_info(text: str) -> tuple:
     """Извлекает имя и телефон из текста с улучшенной логикой"""
     # Удаляем лишние символы
@@ -630,6 +835,89 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     await update.message.reply_text(help_text)
 
 
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Команда /stats: задержки этапов, ошибки LLM и кэши (только администраторам)"""
+    logger.info(f"Администратор {update.effective_user.id} запросил статистику")
+    # Ограничение длины сообщения Telegram
+    await update.message.reply_text(metrics.summary()[:4000])
+
+
+def parse_profile_args(args: list) -> tuple:
+    """Аргументы /profile: [N | Ts] [cprofile | sampling] -> (N, T, режим)"""
+    updates, seconds, mode = 0, 0.0, PROFILE_DEFAULT_MODE
+    for arg in args:
+        arg = arg.lower()
+        if arg in PROFILE_MODES:
+            mode = arg
+        elif arg.endswith("s") and arg[:-1].replace(".", "", 1).isdigit():
+            seconds = float(arg[:-1])
+        elif arg.isdigit():
+            updates = int(arg)
+        else:
+            raise ValueError(arg)
+    if not updates and not seconds:
+        updates = PROFILE_DEFAULT_UPDATES
+    return updates, seconds, mode
+
+
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Команда /profile (только администраторам): профилирование следующих
+    N обновлений или T секунд, /profile stop - завершить досрочно.
+    """
+    if context.args and context.args[0].lower() == "stop":
+        if profiler.stop() is None:
+            await update.message.reply_text("Профилирование не запущено.")
+        return
+    if profiler.active:
+        await update.message.reply_text(
+            "Профилирование уже идет. Завершить: /profile stop"
+        )
+        return
+    try:
+        updates, seconds, mode = parse_profile_args(context.args or [])
+    except ValueError:
+        await update.message.reply_text(
+            "Формат: /profile [N | Ts] [cprofile | sampling], например /profile 50 "
+            "или /profile 30s sampling; /profile stop - завершить"
+        )
+        return
+
+    message = update.message
+
+    async def send_profile(path: Path) -> None:
+        try:
+            with open(path, "rb") as f:
+                await message.reply_document(f, caption=f"Профиль: {path.name}")
+        except Exception as e:
+            logger.warning(f"Профиль не отправлен в Telegram: {e}")
+            await message.reply_text(f"Профиль сохранен: {path}")
+
+    profiler.start(updates, seconds, mode, on_done=send_profile)
+    logger.info(f"Администратор {update.effective_user.id} включил профилирование")
+    limits = []
+    if updates:
+        limits.append(f"{updates} обновлений")
+    if seconds:
+        limits.append(f"{seconds:g} сек")
+    await update.message.reply_text(
+        f"Профилирование ({mode}) включено: {' или '.join(limits)}. "
+        "Файл профиля придет сюда."
+    )
+
+
+def register_metrics(application: Application) -> None:
+    """Подключает к метрикам показатели компонентов (опрашиваются при выдаче)"""
+    metrics.register_collector("response_cache", response_cache.stats)
+    metrics.register_collector("fast_path", fast_path.stats)
+    metrics.register_collector("llm_scheduler", llm_scheduler.stats)
+    metrics.register_collector("llm_client", yandexgpt_client.stats)
+    metrics.register_collector("llm_singleflight", llm_singleflight.stats)
+    metrics.register_collector("sessions", session_store.stats)
+    if hasattr(application, "dispatch_stats"):
+        metrics.register_collector("dispatch", application.dispatch_stats)
+
+
 async def setup_commands(application: Application) -> None:
     """Устанавливает команды меню для бота"""
     commands = [
@@ -641,6 +929,33 @@ async def setup_commands(application: Application) -> None:
     await application.bot.set_chat_menu_button(menu_button=MenuButtonCommands())
 
 
+async def on_startup(application: Application) -> None:
+    """Действия после инициализации приложения"""
+    await setup_commands(application)
+    # Горячая перезагрузка каталога
+    catalog_store.start_watching()
+    # Фоновая запись состояний диалогов и дискового кэша ответов
+    session_store.start()
+    response_cache.start()
+    # /metrics на отдельном порту (если задан METRICS_PORT)
+    await metrics.start_server()
+    # Профилирование с запуска (PROFILE_UPDATES / PROFILE_SECONDS)
+    profiler.start_from_env()
+
+
+async def on_shutdown(application: Application) -> None:
+    """Освобождение ресурсов при остановке"""
+    # Незавершенный сеанс профилирования сохраняем в файл
+    profiler.stop(notify=False)
+    await catalog_store.stop_watching()
+    # Сохраняем состояния диалогов и новые ответы кэша
+    await session_store.stop()
+    await response_cache.stop()
+    # Закрываем пул соединений YandexGPT
+    await close_llm_client()
+    await metrics.stop_server()
+
+
 async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Показывает главное меню с кнопками"""
     menu_keyboard = [
@@ -655,23 +970,56 @@ async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
 def main() -> None:
     """Запуск бота."""
-    logger.info("Запуск бота...")
+    parser = argparse.ArgumentParser(description="RealEstateManagerBot")
+    parser.add_argument(
+        "--mode",
+        choices=["polling", "webhook"],
+        default=BOT_MODE,
+        help="способ получения обновлений (по умолчанию BOT_MODE или polling)",
+    )
+    args = parser.parse_args()
+    logger.info(f"Запуск бота в режиме {args.mode}...")
 
     # Создаем Application и передаем токен
     try:
         # Создаем Application с использованием Builder
         builder = Application.builder().token(TELEGRAM_TOKEN)
+        if TELEGRAM_API_URL:
+            builder = builder.base_url(TELEGRAM_API_URL)
 
         # Добавляем post_init обработчик
-        builder = builder.post_init(setup_commands)
+        builder = builder.post_init(on_startup)
+
+        # Освобождаем ресурсы при остановке
+        builder = builder.post_shutdown(on_shutdown)
+
+        # Разные чаты обрабатываются параллельно, один чат - по порядку
+        builder = configure_builder(builder)
+
+        # Состояния диалогов переживают перезапуск, простаивающие - вне памяти
+        builder = builder.context_types(session_store.context_types())
 
         application = builder.build()
 
+        # Сессия читается с диска в потоке до обработчиков
+        session_store.install(application)
+        register_metrics(application)
+
         # Добавляем обработчики
         application.add_handler(CommandHandler("start", start))
         application.add_handler(CommandHandler("help", help_command))
         application.add_handler(CommandHandler("menu", show_main_menu))
         application.add_handler(CommandHandler("reset", reset_bot))
+        application.add_handler(
+            CommandHandler(
+                "stats", stats_command, filters=filters.User(user_id=ADMIN_IDS)
+            )
+        )
+        application.add_handler(
+            CommandHandler(
+                "profile", profile_command, filters=filters.User(user_id=ADMIN_IDS)
+            )
+        )
         application.add_handler(
             MessageHandler(filters.Regex(r"^Начать общение$"), handle_first_message)
         )
@@ -681,7 +1029,10 @@ def main() -> None:
 
         # Запускаем бота
         logger.info("Бот запущен...")
-        application.run_polling()
+        if args.mode == "webhook":
+            run_webhook(application, is_ready=lambda: catalog_store.current is not None)
+        else:
+            application.run_polling()
     except Exception as e:
         logger.exception("Критическая ошибка при запуске бота")
 
@@ -0,0 +1,306 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from types import MappingProxyType
+
+from search_index import SearchIndex
+from name_resolver import NameResolver
+from render_cache import RenderCache
+from semantic_index import SemanticIndex, build_semantic_index
+from catalog_columns import CatalogColumns
+from geo_index import GeoIndex, parse_coordinates
+from catalog_snapshot import load_snapshot, source_hash
+from utils import generate_all_objects_summary
+
+logger = logging.getLogger(__name__)
+
+# Путь к каталогу и период проверки изменений (0 - без отслеживания)
+CATALOG_PATH = Path(
+    os.getenv(
+        "CATALOG_PATH", Path(__file__).resolve().parent / "data" / "database.json"
+    )
+)
+CATALOG_WATCH_INTERVAL = float(os.getenv("CATALOG_WATCH_INTERVAL", "5"))
+
+
+def snapshot_path_for(path: Path) -> Path:
+    """Путь бинарного снимка рядом с JSON-каталогом"""
+    return Path(path).with_suffix(".snapshot")
+
+
+# Бинарный снимок каталога с индексами (собирается python catalog_snapshot.py)
+CATALOG_SNAPSHOT_PATH = Path(
+    os.getenv("CATALOG_SNAPSHOT_PATH", snapshot_path_for(CATALOG_PATH))
+)
+
+REQUIRED_FIELDS = {"описание": str, "этажность": int, "срок_сдачи": str}
+NEARBY_FIELDS = ("название", "тип", "расстояние")
+
+
+class CatalogError(Exception):
+    """Каталог не прошел проверку"""
+
+
+def validate_catalog(data) -> None:
+    """Проверяет структуру каталога; при ошибке выбрасывает CatalogError"""
+    if not isinstance(data, dict) or not data:
+        raise CatalogError("Каталог должен быть непустым объектом JSON")
+
+    for name, obj in data.items():
+        if not isinstance(obj, dict):
+            raise CatalogError(f"{name}: описание объекта должно быть объектом")
+        for field, field_type in REQUIRED_FIELDS.items():
+            if not isinstance(obj.get(field), field_type):
+                raise CatalogError(f"{name}: поле «{field}» отсутствует или неверно")
+        for nearby in obj.get("ближайшие_объекты", []):
+            if not isinstance(nearby, dict) or any(
+                not isinstance(nearby.get(field), str) for field in NEARBY_FIELDS
+            ):
+                raise CatalogError(f"{name}: неверная запись в «ближайшие_объекты»")
+            if "координаты" in nearby and not parse_coordinates(nearby["координаты"]):
+                raise CatalogError(
+                    f"{name}: неверные координаты «{nearby['название']}»"
+                )
+        if "координаты" in obj and not parse_coordinates(obj["координаты"]):
+            raise CatalogError(f"{name}: «координаты» должны быть [широта, долгота]")
+        if not isinstance(obj.get("особенности", []), list):
+            raise CatalogError(f"{name}: поле «особенности» должно быть списком")
+
+
+# Построители производных данных: имя -> функция(snapshot) -> артефакт
+_derived_builders = {}
+
+
+def register_derived(name: str, builder) -> None:
+    """
+    Регистрирует производный артефакт каталога.
+
+    builder(snapshot) вызывается для каждого нового снимка каталога, результат
+    доступен как snapshot.derived[name]. Построитель только возвращает
+    артефакт и не меняет глобального состояния: пока снимок не подменен,
+    запросы работают со старым снимком и его индексами.
+    """
+    _derived_builders[name] = builder
+
+
+def derived_names() -> list:
+    """Имена производных артефактов в порядке построения"""
+    return list(_derived_builders)
+
+
+register_derived(
+    "summary", lambda snapshot: generate_all_objects_summary(snapshot.data)
+)
+register_derived("search_index", lambda snapshot: SearchIndex(snapshot.data))
+register_derived("name_resolver", lambda snapshot: NameResolver(snapshot.data.keys()))
+register_derived(
+    "render_cache",
+    lambda snapshot: RenderCache(snapshot.data, snapshot.name_resolver),
+)
+register_derived("semantic_index", lambda snapshot: build_semantic_index(snapshot.data))
+register_derived("geo_index", lambda snapshot: GeoIndex(snapshot.data))
+register_derived(
+    "columns", lambda snapshot: CatalogColumns(snapshot.data, snapshot.geo_index)
+)
+
+
+class CatalogSnapshot:
+    """
+    Неизменяемый снимок каталога вместе с производными данными.
+
+    Обработчик берет ссылку на текущий снимок один раз и работает с ней до
+    конца, поэтому замена каталога посреди запроса ничего не ломает.
+
+    Готовые производные данные (из бинарного снимка) передаются в derived -
+    тогда они не строятся заново.
+    """
+
+    def __init__(
+        self,
+        data: dict,
+        content_hash: str,
+        version: int,
+        source=None,
+        derived: dict = None,
+    ):
+        self.data = data
+        self.content_hash = content_hash
+        self.version = version
+        self.source = source
+        self.loaded_at = time.time()
+        self.from_binary = derived is not None
+        if derived is not None:
+            self.derived = MappingProxyType(dict(derived))
+            return
+        derived = {}
+        self.derived = MappingProxyType(derived)
+        for name, builder in _derived_builders.items():
+            derived[name] = builder(self)
+
+    @property
+    def summary(self) -> str:
+        return self.derived["summary"]
+
+    @property
+    def search_index(self):
+        return self.derived["search_index"]
+
+    @property
+    def name_resolver(self):
+        return self.derived["name_resolver"]
+
+    @property
+    def render_cache(self) -> RenderCache:
+        return self.derived["render_cache"]
+
+    @property
+    def semantic_index(self) -> SemanticIndex:
+        return self.derived["semantic_index"]
+
+    @property
+    def geo_index(self) -> GeoIndex:
+        return self.derived["geo_index"]
+
+    @property
+    def columns(self) -> CatalogColumns:
+        return self.derived["columns"]
+
+
+def file_signature(path: Path) -> tuple:
+    """Признак изменения файла: время модификации и размер"""
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+class CatalogStore:
+    """
+    Текущий каталог с горячей перезагрузкой.
+
+    Фоновая задача следит за временем изменения файла, разбирает и проверяет
+    новый каталог в отдельном потоке и атомарно подменяет снимок.
+    Некорректный файл не заменяет рабочий каталог.
+
+    Если рядом лежит бинарный снимок, собранный из того же JSON (совпадает
+    хэш), каталог и индексы берутся из него без разбора и построения.
+    """
+
+    def __init__(
+        self, path: Path = CATALOG_PATH, snapshot_path: Path = CATALOG_SNAPSHOT_PATH
+    ):
+        self.path = Path(path)
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else None
+        self.current = None
+        self._version = 0
+        self._signature = None
+        self._watch_task = None
+        self._listeners = []
+
+    def add_listener(self, callback) -> None:
+        """callback(snapshot) вызывается после каждой замены каталога"""
+        self._listeners.append(callback)
+
+    def _build_snapshot(self) -> tuple:
+        signature = file_signature(self.path)
+        with open(self.path, "rb") as f:
+            raw = f.read()
+        raw_hash = source_hash(raw)
+
+        if self.snapshot_path is not None:
+            compiled = load_snapshot(self.snapshot_path, raw_hash, _derived_builders)
+            if compiled is not None:
+                data, derived = compiled
+                snapshot = CatalogSnapshot(
+                    data,
+                    content_hash=raw_hash[:12],
+                    version=self._version + 1,
+                    source=self.snapshot_path,
+                    derived=derived,
+                )
+                return snapshot, signature
+
+        data = json.loads(raw.decode("utf-8"))
+        validate_catalog(data)
+        snapshot = CatalogSnapshot(
+            data,
+            content_hash=raw_hash[:12],
+            version=self._version + 1,
+            source=self.path,
+        )
+        return snapshot, signature
+
+    def _swap(self, snapshot: CatalogSnapshot, signature: tuple) -> None:
+        self._version = snapshot.version
+        self._signature = signature
+        self.current = snapshot
+        logger.info(
+            f"Каталог v{snapshot.version} загружен из {snapshot.source.name}. "
+            f"Объектов: {len(snapshot.data)}, хэш: {snapshot.content_hash}"
+        )
+        for callback in self._listeners:
+            try:
+                callback(snapshot)
+            except Exception:
+                logger.exception("Ошибка обработчика обновления каталога")
+
+    def load(self) -> CatalogSnapshot:
+        """Синхронная загрузка каталога (при старте)"""
+        snapshot, signature = self._build_snapshot()
+        self._swap(snapshot, signature)
+        return snapshot
+
+    async def reload_if_changed(self) -> bool:
+        """Перезагружает каталог, если файл изменился. Возвращает True при замене."""
+        try:
+            signature = file_signature(self.path)
+        except FileNotFoundError:
+            logger.warning(f"Файл каталога не найден: {self.path}")
+            return False
+        if signature == self._signature:
+            return False
+
+        try:
+            snapshot, signature = await asyncio.to_thread(self._build_snapshot)
+        except (json.JSONDecodeError, UnicodeDecodeError, CatalogError) as e:
+            logger.error(f"Новый каталог отклонен, работаем со старым: {e}")
+            # Не пытаемся снова, пока файл не изменится
+            self._signature = signature
+            return False
+        except Exception:
+            logger.exception("Не удалось собрать новый каталог, работаем со старым")
+            self._signature = signature
+            return False
+
+        self._swap(snapshot, signature)
+        return True
+
+    async def _watch(self, interval: float) -> None:
+        logger.info(f"Отслеживание каталога {self.path} каждые {interval} сек")
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reload_if_changed()
+            except Exception:
+                logger.exception("Ошибка перезагрузки каталога")
+
+    def start_watching(self, interval: float = CATALOG_WATCH_INTERVAL) -> None:
+        """Запускает фоновое отслеживание (в работающем цикле событий)"""
+        if interval > 0 and self._watch_task is None:
+            self._watch_task = asyncio.get_running_loop().create_task(
+                self._watch(interval)
+            )
+
+    async def stop_watching(self) -> None:
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+
+# Каталог объектов приложения
+catalog_store = CatalogStore()
@@ -0,0 +1,233 @@
+import logging
+import re
+
+import numpy as np
+
+from geo_index import NEARBY_RADIUS_M
+from search_index import TOKEN_RE, stem
+
+logger = logging.getLogger(__name__)
+
+DEADLINE_RE = re.compile(r"([1-4]|i{1,3}|iv)\s*(?:-?й\s*)?кв\w*\.?\s*(\d{4})")
+YEAR_RE = re.compile(r"(\d{4})")
+ROMAN_QUARTERS = {"i": 1, "ii": 2, "iii": 3, "iv": 4}
+DISTANCE_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*(км|километр\w*|м\b|метр\w*)")
+
+# Обороты запроса, задающие фильтры
+QUERY_DEADLINE_BEFORE_RE = re.compile(
+    r"(?:до|не позже|не позднее)\s+(?:конца\s+)?"
+    r"(?:([1-4])\s*(?:-?го\s*)?кв\w*\.?\s*)?(\d{4})"
+)
+QUERY_DEADLINE_AFTER_RE = re.compile(r"(?:после|позже)\s+(\d{4})")
+QUERY_DEADLINE_YEAR_RE = re.compile(r"\bв\s+(\d{4})\s*(?:год|г\.)")
+QUERY_MAX_FLOORS_RE = re.compile(r"\b(?:не выше|до|максимум|не более)\s+(\d+)\s*этаж")
+QUERY_MIN_FLOORS_RE = re.compile(
+    r"\b(?:не ниже|(?<!не )(?:от|выше|больше|более))\s+(\d+)\s*этаж"
+)
+WALKING_DISTANCE_RE = re.compile(r"в шаговой доступност\w*|в пешей доступност\w*")
+WALKING_DISTANCE_M = 500.0
+
+
+def parse_deadline(text: str) -> tuple:
+    """«3 кв. 2025» -> (2025, 3); только год - (год, 4); не распознано - (0, 0)"""
+    normalized = text.lower().replace("ё", "е")
+    match = DEADLINE_RE.search(normalized)
+    if match:
+        quarter = match.group(1)
+        quarter = ROMAN_QUARTERS.get(quarter) or int(quarter)
+        return int(match.group(2)), quarter
+    match = YEAR_RE.search(normalized)
+    if match:
+        return int(match.group(1)), 4
+    return 0, 0
+
+
+def parse_distance(text: str) -> float:
+    """«300 м» -> 300.0, «1,5 км» -> 1500.0; не распознано - nan"""
+    match = DISTANCE_RE.search(text.lower())
+    if not match:
+        return float("nan")
+    value = float(match.group(1).replace(",", "."))
+    return value * 1000 if match.group(2).startswith(("км", "кил")) else value
+
+
+def deadline_key(year: int, quarter: int) -> int:
+    """Срок сдачи как одно число для сравнений: год * 4 + квартал - 1"""
+    return year * 4 + quarter - 1
+
+
+def type_stems(place_type: str) -> tuple:
+    """Основы слов типа объекта («торговый центр» -> («торгов», «центр»))"""
+    return tuple(stem(token) for token in TOKEN_RE.findall(place_type.lower()))
+
+
+class CatalogColumns:
+    """
+    Колоночное представление каталога для фильтров.
+
+    Для объектов хранятся массивы NumPy (этажность, год и квартал сдачи),
+    для ближайших объектов - плоские массивы (индекс ЖК, код типа,
+    расстояние в метрах). Фильтр вычисляется векторно по всему каталогу.
+
+    Если передан геоиндекс, условие по окружению выполняется и для объектов
+    с координатами, не указанных у ЖК явно.
+    """
+
+    def __init__(self, db: dict, geo=None):
+        self.db = db
+        self.geo = geo
+        self.names = list(db)
+        count = len(self.names)
+        self.floors = np.zeros(count, dtype=np.int16)
+        self.deadline_year = np.zeros(count, dtype=np.int16)
+        self.deadline_quarter = np.zeros(count, dtype=np.int8)
+        self.type_codes = {}
+
+        nearby_object, nearby_type, nearby_distance = [], [], []
+        for i, data in enumerate(db.values()):
+            self.floors[i] = data.get("этажность", 0)
+            year, quarter = parse_deadline(data.get("срок_сдачи", ""))
+            self.deadline_year[i] = year
+            self.deadline_quarter[i] = quarter
+            for place in data.get("ближайшие_объекты", []):
+                code = self.type_codes.setdefault(
+                    place["тип"].lower(), len(self.type_codes)
+                )
+                nearby_object.append(i)
+                nearby_type.append(code)
+                nearby_distance.append(parse_distance(place["расстояние"]))
+
+        self.deadline = (
+            self.deadline_year.astype(np.int32) * 4 + self.deadline_quarter - 1
+        )
+        self.deadline[self.deadline_year == 0] = -1
+        self.nearby_object = np.array(nearby_object, dtype=np.int32)
+        self.nearby_type = np.array(nearby_type, dtype=np.int16)
+        self.nearby_distance = np.array(nearby_distance, dtype=np.float32)
+        self.type_stems = {name: type_stems(name) for name in self.type_codes}
+        logger.info(
+            f"Колоночный каталог: {count} объектов, {len(nearby_object)} ближайших объектов"
+        )
+
+    def filter(
+        self,
+        deadline_before: int = None,
+        deadline_after: int = None,
+        min_floors: int = None,
+        max_floors: int = None,
+        nearby: list = (),
+    ) -> list:
+        """
+        Названия ЖК, подходящих под все условия, по возрастанию срока сдачи.
+
+        Параметры:
+            deadline_before (int): Срок сдачи не позже (deadline_key)
+            deadline_after (int): Срок сдачи позже (deadline_key)
+            min_floors, max_floors (int): Границы этажности
+            nearby (list): Пары (тип, максимальное расстояние в метрах или None)
+        """
+        mask = np.ones(len(self.names), dtype=bool)
+        if deadline_before is not None:
+            mask &= (self.deadline >= 0) & (self.deadline <= deadline_before)
+        if deadline_after is not None:
+            mask &= self.deadline > deadline_after
+        if min_floors is not None:
+            mask &= self.floors >= min_floors
+        if max_floors is not None:
+            mask &= self.floors <= max_floors
+
+        for place_type, max_distance in nearby:
+            code = self.type_codes.get(place_type)
+            if code is None:
+                return []
+            selected = self.nearby_type == code
+            if max_distance is not None:
+                selected &= self.nearby_distance <= max_distance
+            has_place = np.zeros(len(self.names), dtype=bool)
+            has_place[self.nearby_object[selected]] = True
+            if self.geo is not None:
+                radius = NEARBY_RADIUS_M if max_distance is None else max_distance
+                with np.errstate(invalid="ignore"):
+                    has_place |= self.geo.distance_to_type(place_type) <= radius
+            mask &= has_place
+
+        found = np.flatnonzero(mask)
+        found = found[np.argsort(self.deadline[found], kind="stable")]
+        return [self.names[i] for i in found]
+
+    def type_positions(self, text: str) -> dict:
+        """
+        Известные типы ближайших объектов, упомянутые в тексте: тип -> позиция.
+
+        Сравниваются основы целых слов («парком» -> «парк», но не «паркинг»).
+        """
+        # Первое вхождение каждой основы слова
+        positions = {}
+        for match in TOKEN_RE.finditer(text.lower().replace("ё", "е")):
+            positions.setdefault(stem(match.group()), match.start())
+        return {
+            place_type: min(positions[s] for s in stems)
+            for place_type, stems in self.type_stems.items()
+            if stems and all(s in positions for s in stems)
+        }
+
+    def parse_query(self, text: str):
+        """
+        Условия фильтра из текста запроса или None, если их нет.
+
+        Понимает сроки («до конца 2025», «до 2 кв. 2026», «в 2025 году»,
+        «после 2025»), этажность («не выше 10 этажей») и ближайшие объекты
+        известных типов с расстоянием («с парком в 500 м», «школа в шаговой
+        доступности»).
+        """
+        normalized = text.lower().replace("ё", "е")
+        conditions = {}
+
+        match = QUERY_DEADLINE_BEFORE_RE.search(normalized)
+        if match:
+            quarter = int(match.group(1)) if match.group(1) else 4
+            conditions["deadline_before"] = deadline_key(int(match.group(2)), quarter)
+        match = QUERY_DEADLINE_YEAR_RE.search(normalized)
+        if match:
+            year = int(match.group(1))
+            conditions["deadline_after"] = deadline_key(year, 1) - 1
+            conditions["deadline_before"] = deadline_key(year, 4)
+        match = QUERY_DEADLINE_AFTER_RE.search(normalized)
+        if match:
+            conditions["deadline_after"] = deadline_key(int(match.group(1)), 4)
+
+        match = QUERY_MAX_FLOORS_RE.search(normalized)
+        if match:
+            conditions["max_floors"] = int(match.group(1))
+        match = QUERY_MIN_FLOORS_RE.search(normalized)
+        if match:
+            conditions["min_floors"] = int(match.group(1))
+
+        nearby = []
+        for place_type, position in self.type_positions(normalized).items():
+            # Расстояние ищем сразу после упоминания типа
+            tail = normalized[position : position + 40]
+            distance = parse_distance(tail)
+            if np.isnan(distance):
+                distance = (
+                    WALKING_DISTANCE_M
+                    if WALKING_DISTANCE_RE.search(normalized)
+                    else None
+                )
+            nearby.append((place_type, distance))
+
+        # Одно упоминание типа без сроков, этажности и расстояния - не фильтр
+        if not conditions and all(distance is None for _, distance in nearby):
+            return None
+        if nearby:
+            conditions["nearby"] = nearby
+        return conditions
+
+    def search(self, text: str):
+        """Результат фильтра по тексту запроса или None, если условий нет"""
+        conditions = self.parse_query(text)
+        if conditions is None:
+            return None
+        names = self.filter(**conditions)
+        logger.info(f"Фильтр каталога {conditions}: найдено {len(names)}")
+        return names
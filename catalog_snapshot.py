@@ -0,0 +1,233 @@
+import argparse
+import hashlib
+import json
+import logging
+import mmap
+import os
+import pickle
+import struct
+import sys
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"RECATSNP"
+# Версия формата файла; при несовпадении снимок игнорируется
+SNAPSHOT_FORMAT = 1
+# Выравнивание массивов в файле (байт)
+ALIGNMENT = 64
+HEADER_SIZE = struct.Struct("<I")
+
+# Модули, от кода которых зависят производные данные каталога помимо
+# модулей самих артефактов (форматирование сводок и блоков)
+EXTRA_MODULES = ("catalog", "utils")
+
+
+def source_hash(raw: bytes) -> str:
+    """Хэш исходного JSON, с которым сверяется снимок"""
+    return hashlib.sha256(raw).hexdigest()
+
+
+def code_hash(modules) -> str:
+    """
+    Хэш исходного кода модулей, строящих индексы.
+
+    Снимок, собранный старой версией кода, не подходит новой, даже если
+    каталог не менялся.
+    """
+    digest = hashlib.sha256()
+    for name in sorted(modules):
+        module = sys.modules.get(name)
+        path = getattr(module, "__file__", None)
+        digest.update(name.encode("utf-8"))
+        if path:
+            digest.update(Path(path).read_bytes())
+    return digest.hexdigest()
+
+
+def artifact_modules(derived: dict) -> list:
+    modules = {type(artifact).__module__ for artifact in derived.values()}
+    modules.discard("builtins")
+    return sorted(modules.union(EXTRA_MODULES))
+
+
+def _padding(offset: int) -> int:
+    return -offset % ALIGNMENT
+
+
+def write_snapshot(path, data: dict, derived: dict, raw_hash: str) -> int:
+    """
+    Записывает каталог и производные данные в бинарный снимок.
+
+    Объекты сериализуются pickle (протокол 5), массивы NumPy выносятся из
+    потока отдельными выровненными блоками. При загрузке без копирования
+    (через mmap) отображаются только эти массивы; словари, строки и прочие
+    объекты создаются заново разбором потока pickle, хотя и без разбора
+    JSON и построения индексов. Файл заменяется атомарно.
+    Возвращает размер файла в байтах.
+    """
+    buffers = []
+    payload = pickle.dumps(
+        (data, dict(derived)), protocol=5, buffer_callback=buffers.append
+    )
+    modules = artifact_modules(derived)
+    header = {
+        "format": SNAPSHOT_FORMAT,
+        "source_hash": raw_hash,
+        "code_hash": code_hash(modules),
+        "modules": modules,
+        "derived": list(derived),
+        "created_at": time.time(),
+    }
+
+    # Раскладка: заголовок, затем с выровненного смещения поток pickle и блоки
+    # массивов; смещения в заголовке отсчитываются от начала данных
+    raw_buffers = [buffer.raw() for buffer in buffers]
+    header["pickle"] = [0, len(payload)]
+    offset = len(payload)
+    sections = []
+    for buffer in raw_buffers:
+        offset += _padding(offset)
+        sections.append([offset, buffer.nbytes])
+        offset += buffer.nbytes
+    header["buffers"] = sections
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = len(MAGIC) + HEADER_SIZE.size + len(header_bytes)
+    data_start += _padding(data_start)
+
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(HEADER_SIZE.pack(len(header_bytes)))
+        f.write(header_bytes)
+        for (offset, _), chunk in zip(
+            [header["pickle"]] + header["buffers"], [payload] + raw_buffers
+        ):
+            f.write(b"\0" * (data_start + offset - f.tell()))
+            f.write(chunk)
+        size = f.tell()
+    os.replace(tmp_path, path)
+    return size
+
+
+def read_header(path) -> tuple:
+    """Заголовок снимка и отображение файла в память"""
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mapped[: len(MAGIC)] != MAGIC:
+        mapped.close()
+        raise ValueError("не снимок каталога")
+    start = len(MAGIC) + HEADER_SIZE.size
+    (length,) = HEADER_SIZE.unpack(mapped[len(MAGIC) : start])
+    header = json.loads(mapped[start : start + length].decode("utf-8"))
+    data_start = start + length
+    header["data_start"] = data_start + _padding(data_start)
+    return header, mapped
+
+
+def stale_reason(header: dict, raw_hash: str, derived_names):
+    """Почему снимок не подходит (None - подходит)"""
+    if header.get("format") != SNAPSHOT_FORMAT:
+        return "другая версия формата"
+    if header.get("source_hash") != raw_hash:
+        return "каталог изменился"
+    if header.get("derived") != list(derived_names):
+        return "другой набор индексов"
+    if header.get("code_hash") != code_hash(header.get("modules", [])):
+        return "изменился код индексов"
+    return None
+
+
+def _release(mapped, views) -> None:
+    """Закрывает отображение файла после неудачной загрузки снимка"""
+    try:
+        for view in views:
+            view.release()
+        mapped.close()
+    except BufferError:
+        # На блоки еще ссылаются частично восстановленные массивы - файл
+        # закроется, когда их соберет сборщик мусора
+        logger.debug("Отображение снимка каталога занято, закрытие отложено")
+
+
+def load_snapshot(path, raw_hash: str, derived_names) -> tuple:
+    """
+    Каталог и производные данные из снимка или None, если снимок не подходит.
+
+    Снимок используется, только если совпадают формат, хэш исходного JSON,
+    хэш кода индексов и набор производных артефактов. Массивы NumPy
+    ссылаются на отображенный в память файл (только чтение), остальные
+    объекты восстанавливаются из потока pickle.
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+    try:
+        header, mapped = read_header(path)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Снимок каталога {path} не прочитан: {e}")
+        return None
+
+    reason = stale_reason(header, raw_hash, derived_names)
+    if reason:
+        mapped.close()
+        logger.info(f"Снимок каталога {path} устарел ({reason}), читаем JSON")
+        return None
+
+    view = memoryview(mapped)[header["data_start"] :]
+    offset, length = header["pickle"]
+    stream = view[offset : offset + length]
+    buffers = [view[start : start + size] for start, size in header["buffers"]]
+    try:
+        data, derived = pickle.loads(stream, buffers=buffers)
+    except Exception as e:
+        logger.warning(f"Снимок каталога {path} поврежден: {e}")
+        _release(mapped, [stream, *buffers, view])
+        return None
+    return data, derived
+
+
+def main() -> None:
+    """Сборка снимка: python catalog_snapshot.py [--catalog PATH] [--output PATH]"""
+    from catalog import CATALOG_PATH, CatalogStore, derived_names, snapshot_path_for
+
+    parser = argparse.ArgumentParser(
+        description="Компиляция каталога и индексов в бинарный снимок"
+    )
+    parser.add_argument("--catalog", type=Path, default=CATALOG_PATH)
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument(
+        "--if-stale",
+        action="store_true",
+        help="собирать, только если снимка нет или он не соответствует каталогу",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(format="%(message)s", level=logging.INFO)
+
+    output = args.output or snapshot_path_for(args.catalog)
+    start = time.perf_counter()
+    raw_hash = source_hash(Path(args.catalog).read_bytes())
+    if args.if_stale and output.exists():
+        try:
+            header, mapped = read_header(output)
+            mapped.close()
+            reason = stale_reason(header, raw_hash, derived_names())
+        except (OSError, ValueError) as e:
+            reason = str(e)
+        if reason is None:
+            logger.info(f"Снимок {output} актуален")
+            return
+        logger.info(f"Снимок {output} устарел ({reason}), пересобираем")
+    store = CatalogStore(args.catalog, snapshot_path=None)
+    snapshot = store.load()
+    size = write_snapshot(output, snapshot.data, snapshot.derived, raw_hash)
+    logger.info(
+        f"Снимок {output}: {len(snapshot.data)} объектов, {size / 1024:.0f} КБ, "
+        f"{time.perf_counter() - start:.2f} сек"
+    )
+
+
+if __name__ == "__main__":
+    main()
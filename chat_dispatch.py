@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import os
+
+from telegram.ext import Application
+
+logger = logging.getLogger(__name__)
+
+# Сколько чатов обрабатывается одновременно (1 - строго по одному обновлению)
+CONCURRENT_CHATS = int(os.getenv("CONCURRENT_CHATS", "32"))
+# Сколько обновлений может ждать своей очереди (ограничение библиотеки)
+MAX_PENDING_UPDATES = int(os.getenv("MAX_PENDING_UPDATES", "1024"))
+
+
+def chat_key(update: object):
+    """Ключ очереди обновления: чат, иначе пользователь, иначе None"""
+    chat = getattr(update, "effective_chat", None)
+    if chat is not None:
+        return chat.id
+    user = getattr(update, "effective_user", None)
+    if user is not None:
+        return user.id
+    return None
+
+
+class ChatLocks:
+    """
+    Блокировки по чатам со счетчиком ссылок.
+
+    Блокировка создается при первом обновлении чата и удаляется, когда
+    его последнее обновление обработано, поэтому память не растет с числом
+    пользователей. asyncio.Lock пропускает ожидающих в порядке прихода.
+    """
+
+    def __init__(self):
+        self._locks = {}
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    async def acquire(self, key) -> None:
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            await entry[0].acquire()
+        except BaseException:
+            self._release_ref(key, entry)
+            raise
+
+    def release(self, key) -> None:
+        entry = self._locks[key]
+        entry[0].release()
+        self._release_ref(key, entry)
+
+    def _release_ref(self, key, entry) -> None:
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self._locks[key]
+
+    def waiting(self) -> int:
+        """Число обновлений, ожидающих своего чата"""
+        return sum(refs - 1 for lock, refs in self._locks.values() if lock.locked())
+
+
+class ChatOrderedApplication(Application):
+    """
+    Application, который обрабатывает разные чаты параллельно.
+
+    Библиотека запускает каждое обновление отдельной задачей
+    (concurrent_updates), а здесь обновления одного чата выстраиваются в
+    очередь на блокировке чата, поэтому флаги в context.user_data
+    (collecting_contacts, awaiting_comparison и т.п.) меняются по порядку.
+    Число одновременно обрабатываемых чатов ограничено max_concurrent_chats.
+    """
+
+    def __init__(self, *, max_concurrent_chats: int = CONCURRENT_CHATS, **kwargs):
+        super().__init__(**kwargs)
+        self.chat_locks = ChatLocks()
+        self.max_concurrent_chats = max_concurrent_chats
+        self._chat_slots = asyncio.Semaphore(max_concurrent_chats)
+
+    async def process_update(self, update: object) -> None:
+        key = chat_key(update)
+        if key is None:
+            async with self._chat_slots:
+                await super().process_update(update)
+            return
+
+        # Сначала очередь чата, потом общий слот: ожидающие обновления
+        # одного чата не занимают слоты других чатов
+        await self.chat_locks.acquire(key)
+        try:
+            async with self._chat_slots:
+                await super().process_update(update)
+        finally:
+            self.chat_locks.release(key)
+
+    def dispatch_stats(self) -> dict:
+        return {
+            "active_chats": len(self.chat_locks),
+            "waiting_updates": self.chat_locks.waiting(),
+            "max_concurrent_chats": self.max_concurrent_chats,
+        }
+
+
+def configure_builder(builder, max_concurrent_chats: int = CONCURRENT_CHATS):
+    """Включает параллельную обработку чатов в ApplicationBuilder"""
+    if max_concurrent_chats <= 1:
+        return builder
+    logger.info(f"Параллельная обработка чатов: до {max_concurrent_chats}")
+    return builder.application_class(
+        ChatOrderedApplication, {"max_concurrent_chats": max_concurrent_chats}
+    ).concurrent_updates(MAX_PENDING_UPDATES)
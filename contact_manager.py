@@ -1,38 +1,165 @@
-import os
 import json
 import logging
+import sqlite3
+import threading
 from pathlib import Path
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+CONTACT_FIELDS = ("user_id", "name", "phone", "context", "timestamp")
+
+
+def _legacy_row(contact) -> tuple:
+    """
+    Строка таблицы contacts из записи contacts.json.
+
+    В старом файле встречаются записи без user_id и с null в полях: такие
+    поля заменяются на 0 и пустую строку, чтобы перенос не упирался в
+    NOT NULL и не повторялся при каждом запуске. Записи без имени и
+    телефона пропускаются.
+    """
+    if not isinstance(contact, dict):
+        return None
+    name = str(contact.get("name") or "")
+    phone = str(contact.get("phone") or "")
+    if not name and not phone:
+        return None
+    try:
+        user_id = int(contact.get("user_id") or 0)
+    except (TypeError, ValueError):
+        user_id = 0
+    return (
+        user_id,
+        name,
+        phone,
+        str(contact.get("context") or ""),
+        str(contact.get("timestamp") or ""),
+    )
+
 
 class ContactManager:
-    def __init__(self, file_path: str = None):
+    """
+    Хранилище контактов на SQLite в режиме WAL.
+
+    Каждый контакт сохраняется одной транзакцией INSERT (атомарно, O(1)),
+    поэтому одновременные сохранения не теряют данные. При первом запуске
+    контакты переносятся из старого файла contacts.json.
+    """
+
+    def __init__(self, file_path: str = None, legacy_path: str = None):
         # Определяем абсолютный путь к файлу
+        base_dir = Path(__file__).resolve().parent
         if not file_path:
-            base_dir = Path(__file__).resolve().parent
-            self.file_path = base_dir / "data" / "contacts.json"
+            self.file_path = base_dir / "data" / "contacts.db"
         else:
             self.file_path = Path(file_path)
 
+        if not legacy_path:
+            self.legacy_path = self.file_path.with_suffix(".json")
+        else:
+            self.legacy_path = Path(legacy_path)
+
         logger.info(f"Файл контактов: {self.file_path.absolute()}")
 
-        # Гарантируем существование папки и файла
+        # Гарантируем существование папки и базы
         self.file_path.parent.mkdir(parents=True, exist_ok=True)
-        if not self.file_path.exists():
-            with open(self.file_path, "w", encoding="utf-8") as f:
-                json.dump([], f)
-            logger.info("Создан новый файл контактов")
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            str(self.file_path), timeout=5.0, check_same_thread=False
+        )
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        with self._db:
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS contacts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    name TEXT NOT NULL,
+                    phone TEXT NOT NULL,
+                    context TEXT NOT NULL DEFAULT '',
+                    timestamp TEXT NOT NULL
+                )
+                """)
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS contacts_user_id ON contacts (user_id)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS contacts_phone ON contacts (phone)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+            )
+
+        self._migrate_legacy_json()
+
+    def _migrate_legacy_json(self) -> None:
+        """
+        Однократный перенос контактов из contacts.json.
+
+        Воркеры шардированного режима создают хранилище одновременно, поэтому
+        признак переноса перепроверяется внутри транзакции BEGIN IMMEDIATE:
+        переносит только первый процесс. Ошибка переноса не мешает запуску.
+        """
+        if self._migrated() or not self.legacy_path.exists():
+            return
+
+        try:
+            with open(self.legacy_path, "r", encoding="utf-8") as f:
+                contacts = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            logger.error(f"Не удалось прочитать {self.legacy_path}: {e}")
+            return
+
+        if not isinstance(contacts, list):
+            logger.error(f"{self.legacy_path} не содержит списка контактов")
+            contacts = []
+        rows = [row for row in map(_legacy_row, contacts) if row is not None]
+        if len(rows) < len(contacts):
+            logger.warning(
+                f"Пропущено записей {self.legacy_path.name} без имени и телефона: "
+                f"{len(contacts) - len(rows)}"
+            )
+
+        try:
+            with self._lock:
+                self._db.execute("BEGIN IMMEDIATE")
+                try:
+                    if self._migrated():
+                        self._db.rollback()
+                        return
+                    self._db.executemany(
+                        "INSERT INTO contacts (user_id, name, phone, context, timestamp) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        rows,
+                    )
+                    self._db.execute(
+                        "INSERT OR IGNORE INTO meta (key, value) "
+                        "VALUES ('legacy_json_migrated', ?)",
+                        (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),),
+                    )
+                    self._db.commit()
+                except BaseException:
+                    self._db.rollback()
+                    raise
+        except sqlite3.Error as e:
+            logger.error(f"Не удалось перенести контакты из {self.legacy_path}: {e}")
+            return
+        logger.info(f"Перенесено контактов из {self.legacy_path.name}: {len(rows)}")
+
+    def _migrated(self) -> bool:
+        return (
+            self._db.execute(
+                "SELECT value FROM meta WHERE key = 'legacy_json_migrated'"
+            ).fetchone()
+            is not None
+        )
 
     def save_contact(
         self, user_id: int, name: str, phone: str, context: str = ""
     ) -> bool:
         try:
-            # Загружаем существующие контакты
-            contacts = self.load_contacts()
-            logger.info(f"Загружено контактов: {len(contacts)}")
-
             # Создаем новый контакт
             new_contact = {
                 "user_id": user_id,
@@ -42,34 +169,54 @@ class ContactManager:
                 "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             }
 
-            # Добавляем новый контакт
-            contacts.append(new_contact)
-            logger.info(f"Добавлен контакт: {name} ({phone})")
-
-            # Сохраняем обратно в файл
-            with open(self.file_path, "w", encoding="utf-8") as f:
-                json.dump(contacts, f, indent=2, ensure_ascii=False)
+            # Добавляем контакт одной транзакцией
+            with self._lock, self._db:
+                self._db.execute(
+                    "INSERT INTO contacts (user_id, name, phone, context, timestamp) "
+                    "VALUES (:user_id, :name, :phone, :context, :timestamp)",
+                    new_contact,
+                )
 
-            logger.info(f"Сохранено контактов: {len(contacts)}")
+            logger.info(f"Добавлен контакт: {name} ({phone})")
             return True
         except Exception as e:
             logger.exception(f"Ошибка сохранения контакта: {str(e)}")
             return False
 
-    def load_contacts(self) -> list:
+    def _select(self, where: str = "", params: tuple = ()) -> list:
         try:
-            if not self.file_path.exists():
-                return []
-
-            with open(self.file_path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            logger.error("Ошибка декодирования JSON. Возвращаю пустой список.")
-            return []
+            with self._lock:
+                rows = self._db.execute(
+                    f"SELECT {', '.join(CONTACT_FIELDS)} FROM contacts {where} "
+                    "ORDER BY id",
+                    params,
+                ).fetchall()
+            return [dict(row) for row in rows]
         except Exception as e:
             logger.error(f"Ошибка загрузки контактов: {str(e)}")
             return []
 
+    def load_contacts(self) -> list:
+        """Все контакты в порядке сохранения"""
+        return self._select()
+
+    def find_by_user_id(self, user_id: int) -> list:
+        """Контакты, оставленные пользователем Telegram"""
+        return self._select("WHERE user_id = ?", (user_id,))
+
+    def find_by_phone(self, phone: str) -> list:
+        """Контакты с указанным номером телефона"""
+        return self._select("WHERE phone = ?", (phone,))
+
+    def count(self) -> int:
+        """Число сохраненных контактов"""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM contacts").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
 
 # Инициализируем менеджер контактов
 contact_manager = ContactManager()
@@ -0,0 +1,101 @@
+import logging
+import os
+
+from llm_integration import is_error_response
+
+logger = logging.getLogger(__name__)
+
+# Сколько последних сообщений передается модели дословно
+MEMORY_RECENT_MESSAGES = int(os.getenv("MEMORY_RECENT_MESSAGES", "6"))
+# Через сколько новых сообщений старые сворачиваются в сводку
+MEMORY_SUMMARIZE_EVERY = int(os.getenv("MEMORY_SUMMARIZE_EVERY", "4"))
+# Максимальная длина сводки в символах
+SUMMARY_MAX_CHARS = 800
+# Максимальная длина одной реплики в локальной (черновой) сводке
+DRAFT_LINE_CHARS = 120
+
+SUMMARY_PROMPT = """
+Ты ведешь заметки консультанта по недвижимости. Обнови краткую сводку диалога с клиентом.
+Сохрани только факты, важные для подбора жилья: бюджет, состав семьи, интересующие ЖК,
+пожелания к району и инфраструктуре, сроки, договоренности. Не больше 6 коротких пунктов.
+Не придумывай факты, которых нет в диалоге. Не используй markdown.
+"""
+
+
+def remember_turn(user_data: dict, user_text: str, response_text: str) -> dict:
+    """
+    Добавляет ход диалога в историю и сворачивает старые сообщения.
+
+    Как только история достигает MEMORY_RECENT_MESSAGES + MEMORY_SUMMARIZE_EVERY,
+    все сообщения, кроме последних MEMORY_RECENT_MESSAGES, сразу дописываются
+    в черновую сводку (без вызова модели) и удаляются из истории.
+
+    Возвращает описание свертки для refine_summary или None.
+    """
+    history = user_data.setdefault("history", [])
+    history.append({"role": "user", "text": user_text})
+    history.append({"role": "assistant", "text": response_text})
+
+    if len(history) < MEMORY_RECENT_MESSAGES + MEMORY_SUMMARIZE_EVERY:
+        return None
+
+    folded = history[:-MEMORY_RECENT_MESSAGES]
+    user_data["history"] = history[-MEMORY_RECENT_MESSAGES:]
+    previous_summary = user_data.get("summary", "")
+
+    # Черновая сводка: реплики клиента, сокращенные до одной строки
+    draft_lines = [
+        f"- Клиент: {msg['text'][:DRAFT_LINE_CHARS]}"
+        for msg in folded
+        if msg["role"] == "user"
+    ]
+    summary = "\n".join(filter(None, [previous_summary, *draft_lines]))
+    user_data["summary"] = summary[-SUMMARY_MAX_CHARS:]
+    user_data["summary_version"] = user_data.get("summary_version", 0) + 1
+    logger.debug(f"В сводку свернуто сообщений: {len(folded)}")
+
+    return {
+        "previous_summary": previous_summary,
+        "messages": folded,
+        "version": user_data["summary_version"],
+    }
+
+
+async def refine_summary(user_data: dict, fold: dict, summarize) -> None:
+    """
+    Переписывает черновую сводку с помощью модели (вне обработки сообщения).
+
+    Параметры:
+        user_data (dict): Данные пользователя
+        fold (dict): Результат remember_turn
+        summarize: Асинхронная функция messages -> str (вызов LLM)
+    """
+    dialog = "\n".join(
+        f"{'Клиент' if msg['role'] == 'user' else 'Консультант'}: {msg['text']}"
+        for msg in fold["messages"]
+    )
+    previous_summary = fold["previous_summary"] or "(пусто)"
+    messages = [
+        {"role": "system", "text": SUMMARY_PROMPT},
+        {
+            "role": "user",
+            "text": f"ТЕКУЩАЯ СВОДКА:\n{previous_summary}\n\nНОВЫЕ СООБЩЕНИЯ:\n{dialog}",
+        },
+    ]
+
+    try:
+        summary = await summarize(messages)
+    except Exception as e:
+        logger.exception(f"Ошибка обновления сводки диалога: {e}")
+        return
+
+    # Сводка могла измениться, пока работала модель - тогда оставляем черновик
+    if user_data.get("summary_version", 0) != fold["version"]:
+        logger.debug("Сводка устарела, результат модели отброшен")
+        return
+    if is_error_response(summary):
+        logger.warning("Модель не вернула сводку, оставлена черновая")
+        return
+
+    user_data["summary"] = summary.strip()[:SUMMARY_MAX_CHARS]
+    logger.info("Сводка диалога обновлена")
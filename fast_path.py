@@ -0,0 +1,230 @@
+import logging
+import math
+import os
+import re
+from collections import Counter
+
+from catalog_columns import parse_distance
+from geo_index import NEARBY_RADIUS_M
+from search_index import GENERIC_NAME_TOKENS, stem, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Отвечать на фактические вопросы из каталога без YandexGPT
+FAST_PATH_ENABLED = os.getenv("FAST_PATH", "1") == "1"
+# Длинные сообщения почти всегда требуют рассуждений - их отдаем модели
+MAX_QUESTION_WORDS = 12
+# Сколько ЖК перечислять в одном быстром ответе
+MAX_OBJECTS = 3
+
+INTENT_PATTERNS = {
+    "list": re.compile(
+        r"(какие|список|перечисли\w*|все|ваши)\s+(есть\s+|у вас\s+)?"
+        r"(жк|жилые комплексы|комплекс\w*|объект\w*|новостро\w*)"
+    ),
+    # Сдача дома: «срок сдачи», «когда сдается», но не «сдаете ли квартиры»
+    "deadline": re.compile(
+        r"\bсдач\w*|\bсда(е|ю)тся\b|\bсдан\w*|ввод\w* в эксплуатац"
+        r"|когда\b.*\b(готов|засел|достро|постро)\w*"
+    ),
+    "floors": re.compile(
+        r"этажност\w*|сколько\s+(всего\s+)?этаж\w*|количеств\w* этаж\w*"
+    ),
+    "nearby": re.compile(
+        r"рядом|поблизост\w*|неподал\w*|вокруг|в шаговой|инфраструктур\w*|ближайш\w*"
+    ),
+}
+
+# Вопросы, на которые нужен развернутый ответ модели
+OPEN_ENDED = re.compile(
+    r"почему|лучше|посовет\w*|подойд\w*|подбер\w*|стоит ли|сравн\w*|цен\w*|стоим\w*"
+    r"|ипотек\w*|рассрочк\w*|расскаж\w*|опиши|подробн\w*|планировк\w*|отзыв\w*"
+    r"|аренд\w*|снять|сдаете|сдаешь"
+)
+
+# Слова вопроса об окружении, не называющие тип объекта
+NEARBY_WORDS = {
+    stem(word)
+    for word in (
+        "поблизости неподалеку вокруг шаговой пешей доступности инфраструктура "
+        "ближайшие объекты находится находятся расположены радиусе метров м км"
+    ).split()
+}
+
+
+def plural(number: int, one: str, few: str, many: str) -> str:
+    """Форма слова для числа: 1 этаж, 2 этажа, 5 этажей"""
+    if number % 10 == 1 and number % 100 != 11:
+        return one
+    if 2 <= number % 10 <= 4 and not 12 <= number % 100 <= 14:
+        return few
+    return many
+
+
+def detect_intents(text: str) -> list:
+    """Фактические намерения в вопросе или пустой список для открытых вопросов"""
+    normalized = text.lower().replace("ё", "е")
+    if len(normalized.split()) > MAX_QUESTION_WORDS or OPEN_ENDED.search(normalized):
+        return []
+    return [
+        intent
+        for intent, pattern in INTENT_PATTERNS.items()
+        if pattern.search(normalized)
+    ]
+
+
+def focus_names(focus: dict, db: dict) -> list:
+    """ЖК, о которых спрашивают: из результата поиска или прежнего контекста"""
+    if not focus:
+        return []
+    if "название" in focus:
+        names = [focus["название"]]
+    elif focus.get("special_type") == "compare":
+        names = focus["objects"]
+    else:
+        return []
+    return [name for name in names if name in db][:MAX_OBJECTS]
+
+
+def answer_deadline(name: str, obj: dict, text: str, snapshot) -> str:
+    return f"{name}: срок сдачи - {obj['срок_сдачи']}."
+
+
+def answer_floors(name: str, obj: dict, text: str, snapshot) -> str:
+    floors = obj["этажность"]
+    return f"{name}: {floors} {plural(floors, 'этаж', 'этажа', 'этажей')}."
+
+
+def asks_unknown_type(text: str, name: str) -> bool:
+    """В вопросе об окружении назван тип объекта, которого нет в каталоге"""
+    normalized = text.lower().replace("ё", "е")
+    # Слова самих намерений («рядом», «срок сдачи») типом объекта не считаются
+    for pattern in INTENT_PATTERNS.values():
+        normalized = pattern.sub(" ", normalized)
+    known = set(tokenize(name)) | set(map(stem, GENERIC_NAME_TOKENS)) | NEARBY_WORDS
+    return any(
+        not word.isdigit() and word not in known for word in tokenize(normalized)
+    )
+
+
+def answer_nearby(name: str, obj: dict, text: str, snapshot) -> str:
+    # Типы объектов, о которых спрашивают (школа, парк...), по основам слов
+    types = list(snapshot.columns.type_positions(text))
+    if not types and asks_unknown_type(text, name):
+        # «Есть ли бассейн рядом» - такого типа в каталоге нет, пусть ответит модель
+        return None
+
+    # ЖК с координатами: объекты в радиусе по геоиндексу, в том числе
+    # указанные у соседних ЖК («школы в 700 м»)
+    radius = parse_distance(text)
+    if math.isnan(radius):
+        radius = NEARBY_RADIUS_M
+    around = snapshot.geo_index.around(name, radius)
+    if around:
+        places = [(place, f"{distance:.0f} м") for place, distance in around]
+        header = f"В радиусе {radius:.0f} м от {name}:"
+    else:
+        places = [
+            (place, place["расстояние"]) for place in obj.get("ближайшие_объекты", [])
+        ]
+        header = f"Рядом с {name}:"
+    if types:
+        places = [
+            (place, distance)
+            for place, distance in places
+            if place["тип"].lower() in types
+        ]
+        if not places:
+            return (
+                f"{name}: нет данных о ближайших объектах типа «{'», «'.join(types)}»."
+            )
+    if not places:
+        return f"{name}: у меня нет данных о ближайших объектах."
+    lines = [
+        f"• {place['название']} ({place['тип']}) - {distance}"
+        for place, distance in places
+    ]
+    return header + "\n" + "\n".join(lines)
+
+
+OBJECT_ANSWERS = {
+    "deadline": answer_deadline,
+    "floors": answer_floors,
+    "nearby": answer_nearby,
+}
+
+
+class FastPath:
+    """
+    Ответы на фактические вопросы прямо из каталога.
+
+    Срок сдачи, этажность, ближайшие объекты и список ЖК есть в каталоге
+    в точном виде, поэтому такие вопросы не требуют вызова модели. Открытые
+    вопросы (советы, сравнения, цены) и вопросы без понятного ЖК уходят в LLM.
+    """
+
+    def __init__(self, enabled: bool = FAST_PATH_ENABLED):
+        self.enabled = enabled
+        self.total = 0
+        self.handled = 0
+        self.by_intent = Counter()
+
+    def answer(self, text: str, snapshot, focus: dict = None):
+        """
+        Готовый ответ или None, если вопрос нужно передать модели.
+
+        Параметры:
+            text (str): Сообщение пользователя
+            snapshot (CatalogSnapshot): Текущий снимок каталога с индексами
+            focus (dict): Результат поиска объекта или ссылка на прежний объект
+        """
+        self.total += 1
+        if not self.enabled:
+            return None
+        db = snapshot.data
+
+        intents = detect_intents(text)
+        if not intents:
+            return None
+
+        if intents == ["list"]:
+            self._count(intents)
+            return "🏠 Доступные жилые комплексы:\n" + "\n".join(
+                f"• {name}" for name in db
+            )
+
+        # «Какие объекты рядом с ...» - вопрос о ЖК, а не о списке
+        intents = [intent for intent in intents if intent in OBJECT_ANSWERS]
+        names = focus_names(focus, db)
+        if not intents or not names:
+            return None
+
+        parts = []
+        for name in names:
+            obj = db[name]
+            parts.extend(
+                OBJECT_ANSWERS[intent](name, obj, text, snapshot) for intent in intents
+            )
+        if None in parts:
+            # Часть вопроса из каталога не ответить - отдаем его модели целиком
+            return None
+        self._count(intents)
+        logger.info("Быстрый ответ из каталога: %s", ", ".join(intents))
+        return "🏠 " + "\n\n".join(parts)
+
+    def _count(self, intents: list) -> None:
+        self.handled += 1
+        self.by_intent.update(intents)
+
+    def stats(self) -> dict:
+        """Доля сообщений, на которые ответили без LLM"""
+        return {
+            "total": self.total,
+            "handled": self.handled,
+            "share": self.handled / self.total if self.total else 0.0,
+            "by_intent": dict(self.by_intent),
+        }
+
+
+# Быстрые ответы приложения
+fast_path = FastPath()
@@ -0,0 +1,221 @@
+import logging
+import math
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Размер ячейки пространственной сетки в метрах
+GEO_CELL_SIZE = float(os.getenv("GEO_CELL_SIZE", "250"))
+# Радиус «рядом» для условий без явного расстояния («рядом со школой»)
+NEARBY_RADIUS_M = float(os.getenv("GEO_NEARBY_RADIUS", "1000"))
+
+EARTH_RADIUS_M = 6371000.0
+
+
+def parse_coordinates(value):
+    """«координаты»: [широта, долгота] -> (lat, lon) или None"""
+    if (
+        isinstance(value, (list, tuple))
+        and len(value) == 2
+        and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value)
+        and -90 <= value[0] <= 90
+        and -180 <= value[1] <= 180
+    ):
+        return float(value[0]), float(value[1])
+    return None
+
+
+class GeoIndex:
+    """
+    Пространственный индекс ЖК и объектов инфраструктуры.
+
+    Координаты (необязательное поле «координаты» у ЖК и у записей
+    «ближайшие_объекты») проецируются в метры относительно центра каталога
+    - для масштабов города этого достаточно. Объекты инфраструктуры всех ЖК
+    сводятся в один набор без повторов и раскладываются по ячейкам сетки:
+    запрос по радиусу просматривает только соседние ячейки.
+
+    При построении для каждого ЖК заранее считается расстояние до ближайшего
+    объекта каждого типа, поэтому условия вида «школа в 700 м» проверяются
+    сразу по всему каталогу.
+    """
+
+    def __init__(self, db: dict, cell_size: float = GEO_CELL_SIZE):
+        self.db = db
+        self.cell_size = cell_size
+        self.names = list(db)
+        self._positions = {name: i for i, name in enumerate(self.names)}
+
+        complex_coords = [
+            parse_coordinates(obj.get("координаты")) for obj in db.values()
+        ]
+        places, place_coords, seen = [], [], {}
+        for obj in db.values():
+            for place in obj.get("ближайшие_объекты", []):
+                coords = parse_coordinates(place.get("координаты"))
+                if coords is None:
+                    continue
+                key = (place["название"], place["тип"].lower(), coords)
+                if key not in seen:
+                    seen[key] = len(places)
+                    places.append(place)
+                    place_coords.append(coords)
+
+        known = [c for c in complex_coords + place_coords if c is not None]
+        self.origin_lat = sum(lat for lat, _ in known) / len(known) if known else 0.0
+        self._lon_scale = math.cos(math.radians(self.origin_lat))
+
+        self.located = np.array([c is not None for c in complex_coords], dtype=bool)
+        self.complex_xy = self.project(
+            [c or (self.origin_lat, 0.0) for c in complex_coords]
+        )
+        self.places = places
+        self.place_xy = self.project(place_coords)
+        if len(places):
+            self._bbox = self.place_xy.min(axis=0), self.place_xy.max(axis=0)
+        self.type_codes = {}
+        self.place_type = np.array(
+            [
+                self.type_codes.setdefault(place["тип"].lower(), len(self.type_codes))
+                for place in places
+            ],
+            dtype=np.int16,
+        )
+
+        # Сетка: объекты отсортированы по ячейке, для ячейки - срез массива
+        cells = np.floor(self.place_xy / cell_size).astype(np.int64)
+        order = np.lexsort((cells[:, 1], cells[:, 0])) if len(places) else []
+        self._order = np.asarray(order, dtype=np.int64)
+        self.cells = {}
+        for position, index in enumerate(self._order):
+            key = (int(cells[index, 0]), int(cells[index, 1]))
+            start, _ = self.cells.get(key, (position, position))
+            self.cells[key] = (start, position + 1)
+
+        self.nearest_distance = self._precompute_nearest()
+        logger.info(
+            f"Геоиндекс: {int(self.located.sum())} ЖК с координатами, "
+            f"{len(places)} объектов инфраструктуры, {len(self.cells)} ячеек"
+        )
+
+    def project(self, coords: list) -> np.ndarray:
+        """Широта и долгота -> метры (x на восток, y на север)"""
+        if not len(coords):
+            return np.zeros((0, 2), dtype=np.float64)
+        points = np.radians(np.asarray(coords, dtype=np.float64))
+        return np.column_stack(
+            (
+                points[:, 1] * self._lon_scale * EARTH_RADIUS_M,
+                points[:, 0] * EARTH_RADIUS_M,
+            )
+        )
+
+    def _candidates(self, point: np.ndarray, rings: int) -> np.ndarray:
+        """Индексы объектов в квадрате ячеек вокруг точки"""
+        # Квадрат больше всей сетки - дешевле взять все объекты
+        if (2 * rings + 1) ** 2 > len(self.cells):
+            return self._order
+        cx, cy = np.floor(point / self.cell_size).astype(np.int64)
+        chunks = []
+        for x in range(cx - rings, cx + rings + 1):
+            for y in range(cy - rings, cy + rings + 1):
+                span = self.cells.get((int(x), int(y)))
+                if span:
+                    chunks.append(self._order[span[0] : span[1]])
+        if not chunks:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate(chunks)
+
+    def _select(self, point, radius, place_type=None):
+        """Индексы и расстояния объектов в радиусе от точки в метрах"""
+        code = None
+        if place_type is not None:
+            code = self.type_codes.get(place_type.lower())
+            if code is None:
+                return np.zeros(0, dtype=np.int64), np.zeros(0)
+        candidates = self._candidates(point, int(math.ceil(radius / self.cell_size)))
+        if code is not None:
+            candidates = candidates[self.place_type[candidates] == code]
+        distances = np.hypot(*(self.place_xy[candidates] - point).T)
+        inside = distances <= radius
+        candidates, distances = candidates[inside], distances[inside]
+        order = np.argsort(distances, kind="stable")
+        return candidates[order], distances[order]
+
+    def radius(self, lat: float, lon: float, radius: float, place_type=None) -> list:
+        """Объекты инфраструктуры в радиусе (метры): [(запись, расстояние), ...]"""
+        point = self.project([(lat, lon)])[0]
+        found, distances = self._select(point, radius, place_type)
+        return [(self.places[i], float(d)) for i, d in zip(found, distances)]
+
+    def nearest(self, lat: float, lon: float, k: int = 1, place_type=None) -> list:
+        """k ближайших объектов инфраструктуры: [(запись, расстояние), ...]"""
+        point = self.project([(lat, lon)])[0]
+        return [
+            (self.places[i], float(d)) for i, d in zip(*self._knn(point, k, place_type))
+        ]
+
+    def _knn(self, point: np.ndarray, k: int, place_type=None):
+        if k <= 0 or not len(self.places):
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        # Расширяем радиус, пока в круг не попадут k объектов
+        radius = self.cell_size
+        # Дальше самого дальнего угла охватывающего прямоугольника искать нечего
+        low, high = self._bbox
+        extent = np.hypot(*np.maximum(np.abs(low - point), np.abs(high - point)))
+        while True:
+            found, distances = self._select(point, radius, place_type)
+            if len(found) >= k or radius > extent:
+                return found[:k], distances[:k]
+            radius *= 2
+
+    def complex_point(self, name: str):
+        """Точка ЖК в метрах или None, если координат нет"""
+        index = self._positions.get(name)
+        if index is None or not self.located[index]:
+            return None
+        return self.complex_xy[index]
+
+    def around(self, name: str, radius: float = NEARBY_RADIUS_M, place_type=None):
+        """Объекты инфраструктуры в радиусе от ЖК или None без координат"""
+        point = self.complex_point(name)
+        if point is None:
+            return None
+        found, distances = self._select(point, radius, place_type)
+        return [(self.places[i], float(d)) for i, d in zip(found, distances)]
+
+    def nearest_to(self, name: str, k: int = 1, place_type=None):
+        """k ближайших к ЖК объектов инфраструктуры или None без координат"""
+        point = self.complex_point(name)
+        if point is None:
+            return None
+        return [
+            (self.places[i], float(d)) for i, d in zip(*self._knn(point, k, place_type))
+        ]
+
+    def within(self, place_type: str, radius: float) -> dict:
+        """Для каждого ЖК с координатами - объекты типа в радиусе (метры)"""
+        return {
+            name: self.around(name, radius, place_type)
+            for name, located in zip(self.names, self.located)
+            if located
+        }
+
+    def _precompute_nearest(self) -> np.ndarray:
+        """Матрица ЖК x тип: расстояние до ближайшего объекта типа (nan - нет)"""
+        result = np.full((len(self.names), len(self.type_codes)), np.nan)
+        for place_type, code in self.type_codes.items():
+            for i in np.flatnonzero(self.located):
+                _, distances = self._knn(self.complex_xy[i], 1, place_type)
+                if len(distances):
+                    result[i, code] = distances[0]
+        return result
+
+    def distance_to_type(self, place_type: str) -> np.ndarray:
+        """Расстояние от каждого ЖК до ближайшего объекта типа (nan - неизвестно)"""
+        code = self.type_codes.get(place_type.lower())
+        if code is None:
+            return np.full(len(self.names), np.nan)
+        return self.nearest_distance[:, code]
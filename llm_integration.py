@@ -1,17 +1,612 @@
+import asyncio
 import requests
+import httpx
 import os
 import logging
 import json
 import time
+from requests.adapters import HTTPAdapter
 from requests.exceptions import Timeout, ConnectionError
 
+from singleflight import SingleFlight, prompt_fingerprint
+from llm_scheduler import LLMScheduler, SchedulerBusy, PRIORITY_NORMAL
+from prompt_builder import count_prompt_tokens
+from log_setup import LazyJson, payload_sampled
+from metrics import metrics
+from resilience import (
+    RETRY_STATUSES,
+    CircuitBreaker,
+    LatencyTracker,
+    backoff_delay,
+    retry_after_seconds,
+)
+
 logger = logging.getLogger(__name__)
 
+# URL для запроса к API
+YANDEX_GPT_URL = os.getenv(
+    "YANDEX_GPT_URL",
+    "https://llm.api.cloud.yandex.net/foundationModels/v1/completion",
+)
+
+# Параметры пула соединений
+REQUEST_TIMEOUT = float(os.getenv("YANDEX_GPT_TIMEOUT", "15"))
+MAX_CONNECTIONS = int(os.getenv("YANDEX_GPT_MAX_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("YANDEX_GPT_KEEPALIVE_EXPIRY", "60"))
+
+# Повторы запросов при 429/5xx и обрыве соединения
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "5"))
+# Дублирующий запрос, если ответа нет дольше p95 (не раньше LLM_HEDGE_MIN_DELAY)
+LLM_HEDGE = os.getenv("LLM_HEDGE", "0") == "1"
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "1.0"))
+# Предохранитель: неудач подряд до размыкания и время до пробного запроса, сек
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+
+# Максимальная длина ответа модели в токенах
+MAX_TOKENS = int(os.getenv("YANDEX_GPT_MAX_TOKENS", "1500"))
+
+ERROR_TECHNICAL = "Извините, возникла техническая ошибка. Попробуйте позже."
+ERROR_TIMEOUT = "Извините, сервис ответил слишком долго. Попробуйте повторить вопрос."
+ERROR_CONNECTION = (
+    "Извините, не удалось подключиться к сервису. Проверьте интернет-соединение."
+)
+ERROR_UNAVAILABLE = "Извините, сервис временно недоступен. Попробуйте позже."
+ERROR_BUSY = "Извините, сейчас очень много обращений. Повторите, пожалуйста, вопрос через минуту."
+ERROR_PARSE = "Извините, возникла ошибка обработки ответа."
+
+# Начало всех сообщений об ошибках, которые возвращаются вместо ответа модели
+ERROR_PREFIXES = ("Извините, ", "Ошибка сервиса:")
+
+
+def is_error_response(text: str) -> bool:
+    """Проверяет, является ли текст сообщением об ошибке, а не ответом модели"""
+    return not text or text.startswith(ERROR_PREFIXES)
+
+
+# Вид ошибки для счетчика llm_errors_total
+ERROR_KINDS = {
+    ERROR_TIMEOUT: "timeout",
+    ERROR_CONNECTION: "connection",
+    ERROR_UNAVAILABLE: "unavailable",
+    ERROR_BUSY: "busy",
+    ERROR_TECHNICAL: "technical",
+    ERROR_PARSE: "parse",
+}
+
+
+def _count_result(text: str) -> None:
+    """Учитывает в метриках итог обращения к модели"""
+    if is_error_response(text):
+        metrics.inc("llm_errors_total", kind=ERROR_KINDS.get(text, "api"))
+    else:
+        metrics.inc("llm_responses_total")
+
+
+class CredentialsError(Exception):
+    """Не заданы учетные данные YandexGPT"""
+
+
+class StreamInterrupted(Exception):
+    """
+    Поток ответа оборвался, когда часть текста уже отдана.
+
+    error_text - сообщение об ошибке, которое было бы отдано вместо ответа.
+    """
+
+    def __init__(self, error_text: str):
+        super().__init__(error_text)
+        self.error_text = error_text
+
+
+def _build_request(messages: list, stream: bool = False) -> tuple:
+    """Формирует заголовки и полезную нагрузку запроса к YandexGPT"""
+    api_key = os.getenv("YANDEX_API_KEY")
+    folder_id = os.getenv("YANDEX_FOLDER_ID")
+
+    if not api_key:
+        logger.error("Отсутствует переменная окружения YANDEX_API_KEY!")
+        raise CredentialsError("YANDEX_API_KEY")
+
+    if not folder_id:
+        logger.error("Отсутствует переменная окружения YANDEX_FOLDER_ID!")
+        raise CredentialsError("YANDEX_FOLDER_ID")
+
+    headers = {
+        "Authorization": f"Api-Key {api_key}",
+        "x-folder-id": folder_id,
+        "Content-Type": "application/json",
+    }
+
+    # Формируем полезную нагрузку
+    payload = {
+        "modelUri": f"gpt://{folder_id}/yandexgpt-lite",
+        "completionOptions": {
+            "stream": stream,
+            "temperature": 0.6,  # Оптимальное значение для баланса креативности и точности
+            "maxTokens": MAX_TOKENS,  # Увеличим лимит для более полных ответов
+        },
+        "messages": messages,
+    }
+
+    # Полный запрос для отладки: только на уровне DEBUG и для доли запросов,
+    # сериализуется в фоновом потоке логирования
+    if payload_sampled(logger):
+        logger.debug("Отправляемый запрос к YandexGPT:\n%s", LazyJson(payload))
+    return headers, payload
+
+
+def _request_cost(messages: list) -> int:
+    """Оценка расхода токенов квоты: промпт и максимальный ответ"""
+    return count_prompt_tokens(messages) + MAX_TOKENS
+
+
+def _parse_response(status_code: int, response) -> str:
+    """Разбирает ответ API (requests.Response или httpx.Response)"""
+    # Проверка статуса ответа
+    if status_code != 200:
+        error_msg = f"Ошибка API ({status_code}): {response.text}"
+        logger.error(error_msg)
+
+        # Попытка извлечь детали ошибки
+        try:
+            error_data = response.json()
+            if "message" in error_data:
+                return f"Ошибка сервиса: {error_data['message']}"
+        except:
+            pass
+
+        return ERROR_UNAVAILABLE
+
+    # Обработка успешного ответа
+    try:
+        response_data = response.json()
+        if payload_sampled(logger):
+            logger.debug("Полный ответ API: %s", LazyJson(response_data))
+
+        # Проверяем наличие ожидаемой структуры ответа
+        if "result" in response_data and "alternatives" in response_data["result"]:
+            if response_data["result"]["alternatives"]:
+                return response_data["result"]["alternatives"][0]["message"]["text"]
+            else:
+                logger.error("Пустой ответ от модели")
+                return "Извините, не удалось сгенерировать ответ."
+        else:
+            logger.error("Неожиданный формат ответа: %s", LazyJson(response_data))
+            return "Извините, возникла техническая ошибка."
+
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        logger.exception(f"Ошибка разбора ответа API: {e}")
+        return ERROR_PARSE
+
+
+class YandexGPTClient:
+    """
+    Асинхронный клиент YandexGPT с постоянным пулом keep-alive соединений.
+
+    Пул создается лениво в текущем цикле событий и переиспользуется всеми
+    обработчиками, поэтому одновременные диалоги не ждут друг друга.
+
+    Ответы 429/5xx и обрывы соединения повторяются с экспоненциальной
+    задержкой и джиттером. Если ответа нет дольше p95 задержки, может быть
+    отправлен дублирующий запрос (хеджирование). Пока API неисправен,
+    предохранитель сразу возвращает ERROR_UNAVAILABLE.
+    """
+
+    def __init__(
+        self,
+        url: str = YANDEX_GPT_URL,
+        timeout: float = REQUEST_TIMEOUT,
+        max_connections: int = MAX_CONNECTIONS,
+        keepalive_expiry: float = KEEPALIVE_EXPIRY,
+        scheduler: LLMScheduler = None,
+        retries: int = LLM_RETRIES,
+        hedge: bool = LLM_HEDGE,
+        breaker: CircuitBreaker = None,
+    ):
+        self.url = url
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.scheduler = scheduler
+        self.retries = retries
+        self.hedge = hedge
+        self.breaker = breaker or CircuitBreaker(
+            LLM_BREAKER_FAILURES, LLM_BREAKER_RESET
+        )
+        self.latency = LatencyTracker()
+        self.retried = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._client = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=5.0),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+            )
+            logger.info(
+                f"Создан пул соединений YandexGPT (до {self.max_connections} соединений)"
+            )
+        return self._client
+
+    async def _wait_turn(self, messages: list, priority: int) -> bool:
+        """Ждет очереди в планировщике; False - планировщик перегружен"""
+        if self.scheduler is None:
+            return True
+        try:
+            await self.scheduler.acquire(priority, _request_cost(messages))
+            return True
+        except SchedulerBusy:
+            return False
+
+    def _check_throttled(self, status_code: int) -> bool:
+        """Ответ 429: сообщаем планировщику о превышении квоты"""
+        if status_code != 429:
+            return False
+        logger.warning("YandexGPT ограничил частоту запросов (429)")
+        if self.scheduler is not None:
+            self.scheduler.note_throttled()
+        return True
+
+    async def _backoff(self, attempt: int, response=None) -> None:
+        """Пауза перед повтором; Retry-After от API имеет приоритет"""
+        delay = backoff_delay(attempt, LLM_BACKOFF_BASE, LLM_BACKOFF_MAX)
+        if response is not None:
+            delay = max(delay, min(retry_after_seconds(response), LLM_BACKOFF_MAX))
+        self.retried += 1
+        logger.info(f"Повтор запроса к YandexGPT через {delay:.2f} сек")
+        await asyncio.sleep(delay)
+
+    def _hedge_delay(self):
+        """Через сколько секунд отправлять дублирующий запрос (None - не отправлять)"""
+        if not self.hedge:
+            return None
+        p95 = self.latency.percentile(0.95)
+        if p95 is None:
+            return None
+        return max(p95, LLM_HEDGE_MIN_DELAY)
+
+    async def _timed_post(self, headers: dict, payload: dict) -> httpx.Response:
+        start_time = time.monotonic()
+        response = await self._get_client().post(
+            self.url, headers=headers, json=payload
+        )
+        elapsed = time.monotonic() - start_time
+        metrics.observe("llm_http", elapsed)
+        metrics.inc("llm_http_requests_total", status=response.status_code)
+        if response.status_code == 200:
+            self.latency.record(elapsed)
+        return response
+
+    async def _post(self, headers: dict, payload: dict, cost: int) -> httpx.Response:
+        """
+        Отправляет запрос; при долгом ответе - дублирующий.
+
+        Побеждает первый успешный ответ, второй запрос отменяется. Дубль
+        отправляется, только если планировщик сразу выделяет на него квоту.
+        """
+        first = asyncio.ensure_future(self._timed_post(headers, payload))
+        tasks = {first}
+        try:
+            delay = self._hedge_delay()
+            if delay is None:
+                return await first
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done or (
+                self.scheduler is not None and not self.scheduler.try_acquire(cost)
+            ):
+                return await first
+
+            self.hedged += 1
+            logger.info(f"Нет ответа за {delay:.2f} сек, отправлен дублирующий запрос")
+            tasks.add(asyncio.ensure_future(self._timed_post(headers, payload)))
+
+            pending = set(tasks)
+            result = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is not None:
+                        continue
+                    result = task
+                    if task.result().status_code == 200:
+                        pending = set()
+                        break
+            if result is None:
+                # Оба запроса завершились исключением
+                return first.result()
+            if result is not first:
+                self.hedge_wins += 1
+            return result.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def complete(self, messages: list, priority: int = PRIORITY_NORMAL) -> str:
+        """
+        Генерирует ответ на основе истории сообщений.
+
+        Параметры:
+            messages (list): Список сообщений в формате [{"role": str, "text": str}]
+            priority (int): Приоритет в очереди планировщика
+
+        Возвращает:
+            str: Сгенерированный ответ или сообщение об ошибке
+        """
+        with metrics.timer("llm_complete"):
+            text = await self._complete(messages, priority)
+        _count_result(text)
+        return text
+
+    async def _complete(self, messages: list, priority: int) -> str:
+        try:
+            if not self.breaker.allow():
+                logger.warning("YandexGPT недоступен, быстрый отказ (предохранитель)")
+                return ERROR_UNAVAILABLE
+
+            try:
+                headers, payload = _build_request(messages)
+            except CredentialsError:
+                return ERROR_TECHNICAL
+            cost = _request_cost(messages)
+
+            for attempt in range(self.retries + 1):
+                if not await self._wait_turn(messages, priority):
+                    return ERROR_BUSY
+
+                start_time = time.time()
+                logger.info("Начало генерации ответа YandexGPT (async)")
+
+                # Отправка запроса с таймаутом через общий пул
+                try:
+                    response = await self._post(headers, payload, cost)
+                    logger.info("Статус ответа YandexGPT: %s", response.status_code)
+                    logger.debug("Время ответа: %.2f сек", time.time() - start_time)
+                except httpx.TimeoutException:
+                    logger.error("Таймаут запроса к YandexGPT API")
+                    self.breaker.record_failure()
+                    return ERROR_TIMEOUT
+                except httpx.TransportError:
+                    logger.error("Ошибка подключения к YandexGPT API")
+                    if attempt < self.retries:
+                        await self._backoff(attempt)
+                        continue
+                    self.breaker.record_failure()
+                    return ERROR_CONNECTION
+
+                throttled = self._check_throttled(response.status_code)
+                if response.status_code not in RETRY_STATUSES:
+                    self.breaker.record_success()
+                    return _parse_response(response.status_code, response)
+                if attempt < self.retries:
+                    await self._backoff(attempt, response)
+                    continue
+
+                # Квота - не признак неисправности API
+                if throttled:
+                    return ERROR_BUSY
+                self.breaker.record_failure()
+                return _parse_response(response.status_code, response)
+
+        except Exception as e:
+            logger.exception(f"Неожиданная ошибка в YandexGPT API: {str(e)}")
+            return "Извините, возникла непредвиденная ошибка."
+
+    async def stream(self, messages: list, priority: int = PRIORITY_NORMAL):
+        """
+        Потоковая генерация ответа.
+
+        Асинхронный генератор, который отдает накопленный текст ответа по мере
+        поступления частичных альтернатив от API. При ошибке до первого
+        фрагмента отдает одно сообщение об ошибке и завершается; если часть
+        ответа уже отдана, выбрасывает StreamInterrupted, чтобы вызывающий
+        сохранил показанный текст. Повторяются только запросы, по которым еще
+        ничего не получено; хеджирование не применяется.
+
+        Параметры:
+            messages (list): Список сообщений в формате [{"role": str, "text": str}]
+            priority (int): Приоритет в очереди планировщика
+        """
+        text = ""
+        with metrics.timer("llm_stream"):
+            try:
+                async for text in self._stream(messages, priority):
+                    yield text
+            except StreamInterrupted as e:
+                _count_result(e.error_text)
+                raise
+        _count_result(text)
+
+    async def _stream(self, messages: list, priority: int):
+        if not self.breaker.allow():
+            logger.warning("YandexGPT недоступен, быстрый отказ (предохранитель)")
+            yield ERROR_UNAVAILABLE
+            return
+
+        try:
+            headers, payload = _build_request(messages, stream=True)
+        except CredentialsError:
+            yield ERROR_TECHNICAL
+            return
+
+        # Часть ответа уже отдана - повтор начал бы текст заново
+        yielded = False
+        for attempt in range(self.retries + 1):
+            if not await self._wait_turn(messages, priority):
+                yield ERROR_BUSY
+                return
+
+            start_time = time.time()
+            logger.info("Начало потоковой генерации ответа YandexGPT")
+            retry_response = None
+
+            try:
+                async with self._get_client().stream(
+                    "POST", self.url, headers=headers, json=payload
+                ) as response:
+                    logger.info("Статус ответа YandexGPT: %s", response.status_code)
+                    if response.status_code != 200:
+                        await response.aread()
+                        throttled = self._check_throttled(response.status_code)
+                        if (
+                            response.status_code in RETRY_STATUSES
+                            and attempt < self.retries
+                        ):
+                            retry_response = response
+                        else:
+                            if response.status_code not in RETRY_STATUSES:
+                                self.breaker.record_success()
+                            elif not throttled:
+                                self.breaker.record_failure()
+                            if throttled:
+                                yield ERROR_BUSY
+                            else:
+                                yield _parse_response(response.status_code, response)
+                            return
+                    else:
+                        first_chunk = True
+                        async for line in response.aiter_lines():
+                            if not line.strip():
+                                continue
+                            chunk = json.loads(line)
+
+                            if "error" in chunk:
+                                logger.error(
+                                    f"Ошибка в потоке YandexGPT: {chunk['error']}"
+                                )
+                                self.breaker.record_failure()
+                                if yielded:
+                                    raise StreamInterrupted(ERROR_UNAVAILABLE)
+                                yield ERROR_UNAVAILABLE
+                                return
+
+                            alternatives = chunk.get("result", {}).get("alternatives")
+                            if not alternatives:
+                                continue
+
+                            if first_chunk:
+                                logger.debug(
+                                    "Первый фрагмент через %.2f сек",
+                                    time.time() - start_time,
+                                )
+                                first_chunk = False
+                            yielded = True
+                            yield alternatives[0]["message"]["text"]
+
+                        self.breaker.record_success()
+                        logger.debug("Время ответа: %.2f сек", time.time() - start_time)
+                        return
+
+            except httpx.TimeoutException:
+                logger.error("Таймаут запроса к YandexGPT API")
+                self.breaker.record_failure()
+                if yielded:
+                    raise StreamInterrupted(ERROR_TIMEOUT)
+                yield ERROR_TIMEOUT
+                return
+            except httpx.TransportError:
+                logger.error("Ошибка подключения к YandexGPT API")
+                if yielded:
+                    # Обрыв посреди ответа: повторять нельзя, сообщаем вызывающему
+                    self.breaker.record_failure()
+                    raise StreamInterrupted(ERROR_CONNECTION)
+                if attempt >= self.retries:
+                    self.breaker.record_failure()
+                    yield ERROR_CONNECTION
+                    return
+            except (KeyError, IndexError, TypeError, ValueError) as e:
+                logger.exception(f"Ошибка разбора потока API: {e}")
+                if yielded:
+                    raise StreamInterrupted(ERROR_PARSE)
+                yield ERROR_PARSE
+                return
+
+            await self._backoff(attempt, retry_response)
+
+    def stats(self) -> dict:
+        """Статистика повторов, хеджирования и состояние предохранителя"""
+        return {
+            "retried": self.retried,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "latency_p95": self.latency.percentile(0.95),
+            "breaker": self.breaker.stats(),
+        }
+
+    async def aclose(self) -> None:
+        """Закрывает пул соединений"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+            logger.info("Пул соединений YandexGPT закрыт")
+        self._client = None
+
+
+# Планировщик запросов с учетом квот YandexGPT
+llm_scheduler = LLMScheduler()
+
+# Общий клиент для всего приложения
+yandexgpt_client = YandexGPTClient(scheduler=llm_scheduler)
+
+# Синхронная сессия для обратной совместимости (тоже с keep-alive)
+_sync_session = None
+
+
+def _get_sync_session() -> requests.Session:
+    global _sync_session
+    if _sync_session is None:
+        _sync_session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_CONNECTIONS)
+        _sync_session.mount("https://", adapter)
+        _sync_session.mount("http://", adapter)
+    return _sync_session
+
+
+# Объединение одинаковых одновременных запросов к YandexGPT
+llm_singleflight = SingleFlight()
+
+
+async def generate_yandexgpt_response_async(
+    messages: list, priority: int = PRIORITY_NORMAL
+) -> str:
+    """
+    Асинхронная генерация ответа через общий пул соединений.
+
+    Одновременные запросы с одинаковым промптом разделяют один вызов API.
+    Запрос проходит через планировщик квот; при перегрузке возвращается ERROR_BUSY.
+    """
+    return await llm_singleflight.do(
+        prompt_fingerprint(messages),
+        lambda: yandexgpt_client.complete(messages, priority),
+    )
+
+
+def generate_yandexgpt_stream(messages: list, priority: int = PRIORITY_NORMAL):
+    """Потоковая генерация ответа: асинхронный генератор накопленного текста"""
+    return yandexgpt_client.stream(messages, priority)
+
+
+async def close_llm_client(*args) -> None:
+    """Закрывает соединения клиента (используется как post_shutdown)"""
+    await yandexgpt_client.aclose()
+
 
 def generate_yandexgpt_response(messages: list) -> str:
     """
     Генерирует ответ на основе истории сообщений с использованием YandexGPT API.
 
+    Синхронная обертка для обратной совместимости. В асинхронном коде
+    используйте generate_yandexgpt_response_async.
+
     Параметры:
         messages (list): Список сообщений в формате [{"role": str, "text": str}]
 
@@ -22,94 +617,26 @@ def generate_yandexgpt_response(messages: list) -> str:
         start_time = time.time()
         logger.info("Начало генерации ответа YandexGPT")
 
-        # Проверка учетных данных
-        api_key = os.getenv("YANDEX_API_KEY")
-        folder_id = os.getenv("YANDEX_FOLDER_ID")
-
-        if not api_key:
-            logger.error("Отсутствует переменная окружения YANDEX_API_KEY!")
-            return "Извините, возникла техническая ошибка. Попробуйте позже."
-
-        if not folder_id:
-            logger.error("Отсутствует переменная окружения YANDEX_FOLDER_ID!")
-            return "Извините, возникла техническая ошибка. Попробуйте позже."
-
-        # URL для запроса к API
-        url = "https://llm.api.cloud.yandex.net/foundationModels/v1/completion"
-        headers = {
-            "Authorization": f"Api-Key {api_key}",
-            "x-folder-id": folder_id,
-            "Content-Type": "application/json",
-        }
-
-        # Формируем полезную нагрузку
-        payload = {
-            "modelUri": f"gpt://{folder_id}/yandexgpt-lite",
-            "completionOptions": {
-                "stream": False,
-                "temperature": 0.6,  # Оптимальное значение для баланса креативности и точности
-                "maxTokens": 1500,  # Увеличим лимит для более полных ответов
-            },
-            "messages": messages,
-        }
-
-        # Логируем запрос для отладки
-        logger.debug(
-            f"Отправляемый запрос к YandexGPT:\n{json.dumps(payload, indent=2, ensure_ascii=False)}"
-        )
+        try:
+            headers, payload = _build_request(messages)
+        except CredentialsError:
+            return ERROR_TECHNICAL
 
         # Отправка запроса с таймаутом
         try:
-            response = requests.post(url, headers=headers, json=payload, timeout=15)
-            logger.info(f"Статус ответа YandexGPT: {response.status_code}")
-            logger.debug(f"Время ответа: {time.time() - start_time:.2f} сек")
+            response = _get_sync_session().post(
+                YANDEX_GPT_URL, headers=headers, json=payload, timeout=REQUEST_TIMEOUT
+            )
+            logger.info("Статус ответа YandexGPT: %s", response.status_code)
+            logger.debug("Время ответа: %.2f сек", time.time() - start_time)
         except Timeout:
             logger.error("Таймаут запроса к YandexGPT API")
-            return (
-                "Извините, сервис ответил слишком долго. Попробуйте повторить вопрос."
-            )
+            return ERROR_TIMEOUT
         except ConnectionError:
             logger.error("Ошибка подключения к YandexGPT API")
-            return "Извините, не удалось подключиться к сервису. Проверьте интернет-соединение."
-
-        # Проверка статуса ответа
-        if response.status_code != 200:
-            error_msg = f"Ошибка API ({response.status_code}): {response.text}"
-            logger.error(error_msg)
-
-            # Попытка извлечь детали ошибки
-            try:
-                error_data = response.json()
-                if "message" in error_data:
-                    return f"Ошибка сервиса: {error_data['message']}"
-            except:
-                pass
-
-            return "Извините, сервис временно недоступен. Попробуйте позже."
-
-        # Обработка успешного ответа
-        try:
-            response_data = response.json()
-            logger.debug(
-                f"Полный ответ API: {json.dumps(response_data, indent=2, ensure_ascii=False)}"
-            )
-
-            # Проверяем наличие ожидаемой структуры ответа
-            if "result" in response_data and "alternatives" in response_data["result"]:
-                if response_data["result"]["alternatives"]:
-                    return response_data["result"]["alternatives"][0]["message"]["text"]
-                else:
-                    logger.error("Пустой ответ от модели")
-                    return "Извините, не удалось сгенерировать ответ."
-            else:
-                logger.error(
-                    f"Неожиданный формат ответа: {json.dumps(response_data, indent=2)}"
-                )
-                return "Извините, возникла техническая ошибка."
+            return ERROR_CONNECTION
 
-        except (KeyError, IndexError, TypeError) as e:
-            logger.exception(f"Ошибка разбора ответа API: {e}")
-            return "Извините, возникла ошибка обработки ответа."
+        return _parse_response(response.status_code, response)
 
     except Exception as e:
         logger.exception(f"Неожиданная ошибка в YandexGPT API: {str(e)}")
@@ -0,0 +1,198 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Квота каталога YandexGPT: запросов в секунду и допустимый всплеск
+LLM_RPS = float(os.getenv("LLM_RPS", "10"))
+LLM_BURST = float(os.getenv("LLM_BURST", "0")) or LLM_RPS
+# Квота токенов в минуту (0 - не ограничивать)
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+# Сколько запросов может ждать в очереди и сколько ждать максимум, сек
+LLM_QUEUE_SIZE = int(os.getenv("LLM_QUEUE_SIZE", "100"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "20"))
+# Пауза после ответа 429 от API, сек
+THROTTLE_PAUSE = 1.0
+
+# Приоритеты: меньше - раньше
+PRIORITY_CONTACT = 0  # клиент оставляет контакты
+PRIORITY_NEW_USER = 1  # первое обращение
+PRIORITY_NORMAL = 2
+PRIORITY_BACKGROUND = 3  # фоновые задачи (сводка диалога)
+
+# Сколько последних ожиданий учитывать в статистике
+WAIT_SAMPLES = 1000
+
+
+class SchedulerBusy(Exception):
+    """Очередь к LLM переполнена или ожидание превысило лимит"""
+
+
+class TokenBucket:
+    """Маркерная корзина: rate единиц в секунду, не больше capacity в запасе"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float) -> float:
+        """Через сколько секунд в корзине будет amount единиц"""
+        self._refill()
+        # Запрос дороже всей корзины ждет только ее заполнения
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def drain(self, seconds: float) -> None:
+        """Опустошает корзину так, чтобы первый запрос прошел через seconds"""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+
+class LLMScheduler:
+    """
+    Общий планировщик запросов к YandexGPT.
+
+    Запрос сразу проходит, если очередь пуста и квоты (запросы в секунду и,
+    при необходимости, токены в минуту) позволяют. Иначе он встает в
+    ограниченную очередь с приоритетом; лишние запросы и запросы, ждавшие
+    дольше LLM_QUEUE_TIMEOUT, получают SchedulerBusy, чтобы бот быстро
+    ответил "занято" вместо таймаута.
+    """
+
+    def __init__(
+        self,
+        rps: float = LLM_RPS,
+        burst: float = LLM_BURST,
+        tokens_per_minute: float = LLM_TOKENS_PER_MINUTE,
+        max_queue: int = LLM_QUEUE_SIZE,
+        queue_timeout: float = LLM_QUEUE_TIMEOUT,
+    ):
+        self.requests = TokenBucket(rps, burst)
+        self.tokens = (
+            TokenBucket(tokens_per_minute / 60.0, tokens_per_minute)
+            if tokens_per_minute > 0
+            else None
+        )
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._queue = []
+        self._seq = itertools.count()
+        self._pump_task = None
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self.granted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.throttled = 0
+
+    def _delay(self, cost: int) -> float:
+        delay = self.requests.delay(1)
+        if self.tokens is not None:
+            delay = max(delay, self.tokens.delay(cost))
+        return delay
+
+    def _take(self, cost: int) -> None:
+        self.requests.take(1)
+        if self.tokens is not None:
+            self.tokens.take(cost)
+
+    def _grant(self, cost: int, enqueued_at: float) -> None:
+        self._take(cost)
+        self.granted += 1
+        self._waits.append(time.monotonic() - enqueued_at)
+
+    def try_acquire(self, cost: int = 0) -> bool:
+        """Выдает разрешение, только если оно доступно сразу (без очереди)"""
+        if self._queue or self._delay(cost) > 0:
+            return False
+        self._grant(cost, time.monotonic())
+        return True
+
+    async def acquire(self, priority: int = PRIORITY_NORMAL, cost: int = 0) -> None:
+        """
+        Ждет разрешения на запрос к API.
+
+        Параметры:
+            priority (int): Приоритет (PRIORITY_*), меньше - раньше
+            cost (int): Оценка числа токенов запроса (для квоты токенов)
+        """
+        enqueued_at = time.monotonic()
+        if not self._queue and self._delay(cost) == 0:
+            self._grant(cost, enqueued_at)
+            return
+
+        if len(self._queue) >= self.max_queue:
+            self.rejected += 1
+            logger.warning(f"Очередь к YandexGPT переполнена ({len(self._queue)})")
+            raise SchedulerBusy("queue full")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            self._queue, (priority, next(self._seq), future, cost, enqueued_at)
+        )
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.ensure_future(self._pump())
+
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            logger.warning(
+                f"Запрос ждал YandexGPT дольше {self.queue_timeout} сек, отклонен"
+            )
+            raise SchedulerBusy("queue timeout")
+
+    async def _pump(self) -> None:
+        """Выдает разрешения ожидающим по приоритету по мере пополнения квот"""
+        while self._queue:
+            priority, seq, future, cost, enqueued_at = self._queue[0]
+            if future.done():
+                # Ожидавший запрос отменен или вышел по таймауту
+                heapq.heappop(self._queue)
+                continue
+            delay = self._delay(cost)
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            heapq.heappop(self._queue)
+            self._grant(cost, enqueued_at)
+            future.set_result(None)
+
+    def note_throttled(self, pause: float = THROTTLE_PAUSE) -> None:
+        """API ответил 429 - приостанавливаем выдачу разрешений"""
+        self.throttled += 1
+        self.requests.drain(pause)
+
+    def queue_depth(self) -> int:
+        return sum(1 for item in self._queue if not item[2].done())
+
+    def stats(self) -> dict:
+        """Статистика: глубина очереди, выданные и отклоненные запросы, ожидание"""
+        waits = sorted(self._waits)
+        return {
+            "queue_depth": self.queue_depth(),
+            "granted": self.granted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "throttled": self.throttled,
+            "wait_avg": sum(waits) / len(waits) if waits else 0.0,
+            "wait_p95": waits[int(len(waits) * 0.95)] if waits else 0.0,
+            "wait_max": waits[-1] if waits else 0.0,
+        }
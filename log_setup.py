@@ -0,0 +1,178 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# Уровень логирования приложения (DEBUG включает дампы запросов к модели)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Файл журнала в формате JSON Lines и его ротация
+LOG_FILE = os.getenv("BOT_LOG_FILE", "bot.log")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+# Доля запросов и ответов модели, которые выводятся целиком на уровне DEBUG
+LOG_PAYLOAD_SAMPLE = float(os.getenv("LOG_PAYLOAD_SAMPLE", "0.05"))
+# Максимальная длина такого дампа в символах
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "4000"))
+
+CONSOLE_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# Библиотеки, которые пишут строку на каждый HTTP-запрос
+NOISY_LOGGERS = ("httpx", "httpcore", "aiohttp.access")
+
+# Стандартные атрибуты LogRecord; остальные (extra=...) попадают в JSON
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+# Значения, которые можно передать в фоновый поток без копирования
+_IMMUTABLE = (str, int, float, bool, type(None))
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Одна запись - одна строка JSON: время, уровень, логгер, сообщение, extra"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "pid": record.process,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def _freeze(arg):
+    """Аргумент записи, который не изменится, пока запись стоит в очереди"""
+    if isinstance(arg, LazyJson):
+        return arg
+    if isinstance(arg, lazy):
+        arg = arg.func(*arg.args)
+    return arg if isinstance(arg, _IMMUTABLE) else str(arg)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler, который откладывает форматирование в фоновый поток.
+
+    Запись не копируется: обработчик стоит только на корневом логгере, и
+    после него запись никто не читает. Если все аргументы неизменяемые
+    (строки, числа, LazyJson), запись уходит в очередь как есть и
+    форматируется потоком слушателя. Аргументы lazy и изменяемые объекты
+    фиксируются в потоке вызова: они могут измениться, пока запись ждет
+    в очереди.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if isinstance(record.msg, str) and isinstance(args, tuple):
+            if all(isinstance(arg, _DEFERRED) for arg in args):
+                return record
+            if any(isinstance(arg, LazyJson) for arg in args):
+                record.args = tuple(_freeze(arg) for arg in args)
+                return record
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class lazy:
+    """Аргумент лога, который вычисляется только при выводе записи"""
+
+    __slots__ = ("func", "args")
+
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
+    def __str__(self) -> str:
+        return str(self.func(*self.args))
+
+
+class LazyJson:
+    """Отложенный дамп объекта в JSON (с ограничением длины)"""
+
+    __slots__ = ("value", "max_chars")
+
+    def __init__(self, value, max_chars: int = LOG_PAYLOAD_MAX_CHARS):
+        self.value = value
+        self.max_chars = max_chars
+
+    def __str__(self) -> str:
+        text = json.dumps(self.value, indent=2, ensure_ascii=False, default=str)
+        if len(text) > self.max_chars:
+            return (
+                f"{text[:self.max_chars]}... (еще {len(text) - self.max_chars} симв.)"
+            )
+        return text
+
+
+# Аргументы, с которыми запись можно форматировать в фоновом потоке
+_DEFERRED = _IMMUTABLE + (LazyJson,)
+
+
+def payload_sampled(logger: logging.Logger) -> bool:
+    """Выводить ли полный дамп запроса или ответа модели в этот раз"""
+    return logger.isEnabledFor(logging.DEBUG) and random.random() < LOG_PAYLOAD_SAMPLE
+
+
+# Слушатель очереди логов (один на процесс)
+_listener = None
+
+
+def setup_logging(level: str = LOG_LEVEL, log_file: str = LOG_FILE) -> QueueListener:
+    """
+    Настраивает логирование процесса.
+
+    Все логгеры пишут в очередь без блокировки; фоновый поток выводит
+    записи в консоль (текстом) и в файл JSON Lines с ротацией по размеру.
+    Файл дописывается, а не перезаписывается при перезапуске.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+    handlers = [console]
+    if log_file:
+        file_handler = RotatingFileHandler(
+            log_file,
+            maxBytes=LOG_MAX_BYTES,
+            backupCount=LOG_BACKUP_COUNT,
+            encoding="utf-8",
+        )
+        file_handler.setFormatter(JsonLinesFormatter())
+        handlers.append(file_handler)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(DeferredQueueHandler(log_queue))
+    root.setLevel(level)
+    for name in NOISY_LOGGERS:
+        logging.getLogger(name).setLevel(max(root.level, logging.WARNING))
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging() -> None:
+    """Дописывает оставшиеся записи и останавливает фоновый поток"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
@@ -0,0 +1,275 @@
+import bisect
+import logging
+import os
+import re
+import time
+from collections import deque
+from functools import wraps
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# Адрес и порт сервера /metrics (0 - выключено). Это отдельный сервер, а не
+# публичный сервер вебхука: метрики отдаются только на METRICS_HOST
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+# Сколько последних замеров каждого этапа хранится для перцентилей
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", "1000"))
+
+PREFIX = "bot"
+# Границы корзин гистограммы, сек
+BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    20.0,
+    30.0,
+    60.0,
+)
+QUANTILES = (0.5, 0.95, 0.99)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _metric_name(*parts) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", "_".join(str(p) for p in parts if p))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _flatten(stats: dict, prefix: str = ""):
+    """Числовые значения вложенного словаря stats(): (имя, значение)"""
+    for key, value in stats.items():
+        name = _metric_name(prefix, key)
+        if isinstance(value, dict):
+            yield from _flatten(value, name)
+        elif isinstance(value, (int, float)):
+            yield name, float(value)
+
+
+class Histogram:
+    """
+    Распределение длительностей одного этапа.
+
+    Корзины (как в Prometheus) накапливаются за все время работы, а
+    перцентили для /stats считаются по окну последних METRICS_WINDOW замеров.
+    """
+
+    __slots__ = ("counts", "sum", "count", "window")
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.window = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+        self.window.append(seconds)
+
+    def quantiles(self, qs=QUANTILES) -> dict:
+        """Перцентили по окну последних замеров (пустой словарь без замеров)"""
+        if not self.window:
+            return {}
+        ordered = sorted(self.window)
+        return {q: ordered[min(len(ordered) - 1, int(len(ordered) * q))] for q in qs}
+
+
+class _Timer:
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics, stage: str):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    """
+    Метрики процесса: длительности этапов, счетчики событий и показатели
+    компонентов.
+
+    Этапы замеряются таймерами (with metrics.timer("llm"): ...), счетчики
+    увеличиваются через inc(). Компоненты, у которых уже есть stats()
+    (кэш ответов, планировщик, сессии), регистрируются как источники и
+    опрашиваются только при выдаче метрик. Все хранится в памяти процесса.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self.collectors = {}
+        self.started_at = time.time()
+        self._runner = None
+
+    def timer(self, stage: str) -> _Timer:
+        """Контекстный менеджер, замеряющий длительность этапа"""
+        return _Timer(self, stage)
+
+    def timed(self, stage: str):
+        """Декоратор асинхронного обработчика: замеряет его целиком"""
+
+        def decorator(func):
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                with self.timer(stage):
+                    return await func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def observe(self, stage: str, seconds: float) -> None:
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = Histogram()
+        histogram.observe(seconds)
+
+    def inc(self, name: str, amount: int = 1, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    def counter(self, name: str, **labels) -> int:
+        return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def register_collector(self, name: str, stats) -> None:
+        """Источник показателей: функция без аргументов, возвращающая dict"""
+        self.collectors[name] = stats
+
+    def collect(self) -> dict:
+        """Текущие показатели всех источников (ошибка источника не мешает остальным)"""
+        result = {}
+        for name, stats in self.collectors.items():
+            try:
+                result[name] = stats()
+            except Exception:
+                logger.exception(f"Ошибка сбора показателей {name}")
+        return result
+
+    def render_prometheus(self) -> str:
+        """Все метрики в текстовом формате Prometheus"""
+        lines = [
+            f"# TYPE {PREFIX}_uptime_seconds gauge",
+            f"{PREFIX}_uptime_seconds {time.time() - self.started_at:.3f}",
+        ]
+
+        name = f"{PREFIX}_stage_seconds"
+        lines.append(f"# HELP {name} Длительность этапов обработки")
+        lines.append(f"# TYPE {name} histogram")
+        for stage, histogram in sorted(self.stages.items()):
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), histogram.counts):
+                cumulative += count
+                labels = _labels((("stage", stage), ("le", bound)))
+                lines.append(f"{name}_bucket{labels} {cumulative}")
+            labels = _labels((("stage", stage),))
+            lines.append(f"{name}_sum{labels} {histogram.sum:.6f}")
+            lines.append(f"{name}_count{labels} {histogram.count}")
+
+        name = f"{PREFIX}_stage_window_seconds"
+        lines.append(f"# HELP {name} Перцентили по последним замерам этапа")
+        lines.append(f"# TYPE {name} gauge")
+        for stage, histogram in sorted(self.stages.items()):
+            for q, value in histogram.quantiles().items():
+                labels = _labels((("stage", stage), ("quantile", q)))
+                lines.append(f"{name}{labels} {value:.6f}")
+
+        typed = set()
+        for (counter, labels), value in sorted(self.counters.items()):
+            name = _metric_name(PREFIX, counter)
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{_labels(labels)} {value}")
+
+        # Показатели компонентов - мгновенные значения их stats()
+        for source, stats in self.collect().items():
+            for key, value in _flatten(stats):
+                name = _metric_name(PREFIX, source, key)
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        """Краткая сводка для команды /stats"""
+        uptime = int(time.time() - self.started_at)
+        lines = [f"Работает: {uptime // 3600} ч {uptime % 3600 // 60} мин", ""]
+        lines.append("Этапы (p50 / p95 / p99, мс; число замеров):")
+        for stage, histogram in sorted(self.stages.items()):
+            quantiles = histogram.quantiles()
+            values = " / ".join(f"{quantiles[q] * 1000:.0f}" for q in QUANTILES)
+            lines.append(f"  {stage}: {values}; {histogram.count}")
+        if not self.stages:
+            lines.append("  замеров пока нет")
+
+        if self.counters:
+            lines.append("")
+            lines.append("Счетчики:")
+            for (counter, labels), value in sorted(self.counters.items()):
+                label_text = ", ".join(f"{k}={v}" for k, v in labels)
+                lines.append(
+                    f"  {counter}{f' ({label_text})' if label_text else ''}: {value}"
+                )
+
+        for source, stats in self.collect().items():
+            lines.append("")
+            lines.append(f"{source}:")
+            for key, value in _flatten(stats):
+                lines.append(f"  {key}: {value:g}")
+        return "\n".join(lines)
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        """aiohttp-обработчик GET /metrics"""
+        return web.Response(
+            body=self.render_prometheus().encode("utf-8"),
+            headers={"Content-Type": CONTENT_TYPE},
+        )
+
+    async def start_server(
+        self, host: str = METRICS_HOST, port: int = METRICS_PORT
+    ) -> None:
+        """Отдельный HTTP-сервер /metrics (если задан порт)"""
+        if not port or self._runner is not None:
+            return
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        logger.info(f"Метрики: http://{host}:{port}/metrics")
+
+    async def stop_server(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+# Метрики процесса
+metrics = Metrics()
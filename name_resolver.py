@@ -0,0 +1,140 @@
+import logging
+
+from search_index import GENERIC_NAME_TOKENS, STOP_WORDS, TOKEN_RE, stem
+
+logger = logging.getLogger(__name__)
+
+# Минимальная уверенность, при которой название считается распознанным
+MIN_CONFIDENCE = 0.7
+
+# Слова запроса короче этого не участвуют в нечетком поиске
+MIN_TOKEN_LENGTH = 3
+
+
+def trigrams(word: str) -> set:
+    """Триграммы слова с краевыми пробелами («  л», « лу», «луг», ...)"""
+    padded = f"  {word} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def levenshtein(a: str, b: str) -> int:
+    """Расстояние Левенштейна между двумя короткими строками"""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (char_a != char_b),
+                )
+            )
+        previous = current
+    return previous[-1]
+
+
+def word_similarity(query_key: str, name_key: str) -> float:
+    """
+    Уверенность совпадения основы слова запроса с основой слова названия.
+
+    Учитывает опечатки (расстояние Левенштейна) и начало слова («луг» -> «лугов»).
+    """
+    if query_key == name_key:
+        return 1.0
+    longest = max(len(query_key), len(name_key))
+    similarity = 1.0 - levenshtein(query_key, name_key) / longest
+    if name_key.startswith(query_key):
+        similarity = max(similarity, 0.6 + 0.4 * len(query_key) / len(name_key))
+    return similarity
+
+
+class NameResolver:
+    """
+    Нечеткое распознавание названий ЖК по триграммам основ слов.
+
+    Индекс строится автоматически из ключей базы. Для каждого слова запроса
+    кандидаты берутся из списков триграмм, поэтому стоимость поиска зависит
+    от длины запроса, а не от числа объектов в каталоге.
+    """
+
+    def __init__(self, names=None):
+        self.name_words = {}
+        self.trigram_postings = {}
+        if names is not None:
+            self.build(names)
+
+    def build(self, names) -> "NameResolver":
+        """Строит триграммный индекс по названиям объектов"""
+        name_words = {}
+        trigram_postings = {}
+
+        for name in names:
+            keys = [
+                stem(token)
+                for token in TOKEN_RE.findall(name.lower())
+                if token not in GENERIC_NAME_TOKENS
+            ]
+            if not keys:
+                continue
+            name_words[name] = keys
+            for position, key in enumerate(keys):
+                for trigram in trigrams(key):
+                    trigram_postings.setdefault(trigram, set()).add((name, position))
+
+        self.name_words = name_words
+        self.trigram_postings = trigram_postings
+        logger.info(f"Индекс названий построен: {len(name_words)} объектов")
+        return self
+
+    def resolve(self, query: str, limit: int = 5) -> list:
+        """
+        Возвращает список пар (название, уверенность) по убыванию уверенности.
+        """
+        # Лучшее совпадение для каждого слова каждого названия
+        best = {}
+        for token in TOKEN_RE.findall(query.lower()):
+            if len(token) < MIN_TOKEN_LENGTH or token in STOP_WORDS:
+                continue
+            if token in GENERIC_NAME_TOKENS:
+                continue
+            query_key = stem(token)
+            candidates = set()
+            for trigram in trigrams(query_key):
+                candidates.update(self.trigram_postings.get(trigram, ()))
+            for name, position in candidates:
+                name_key = self.name_words[name][position]
+                similarity = word_similarity(query_key, name_key)
+                if similarity > best.get((name, position), 0.0):
+                    best[(name, position)] = similarity
+
+        # Уверенность для названия - среднее по всем его словам
+        totals = {}
+        for (name, _), similarity in best.items():
+            totals[name] = totals.get(name, 0.0) + similarity
+        ranked = sorted(
+            (
+                (name, round(total / len(self.name_words[name]), 3))
+                for name, total in totals.items()
+            ),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+        return ranked[:limit]
+
+    def best(self, query: str, min_confidence: float = MIN_CONFIDENCE) -> tuple:
+        """Самое вероятное название или None, если уверенность ниже порога"""
+        matches = self.resolve(query, limit=1)
+        if matches and matches[0][1] >= min_confidence:
+            return matches[0]
+        return None
+
+    def matches(self, query: str, min_confidence: float = MIN_CONFIDENCE) -> list:
+        """Все названия с уверенностью не ниже порога"""
+        return [
+            name
+            for name, confidence in self.resolve(query, limit=None)
+            if confidence >= min_confidence
+        ]
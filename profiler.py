@@ -0,0 +1,233 @@
+import asyncio
+import cProfile
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from functools import wraps
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Каталог для файлов профилей
+PROFILE_DIR = os.getenv(
+    "PROFILE_DIR", str(Path(__file__).resolve().parent / "profiles")
+)
+# Профилирование с запуска: следующие N обновлений и/или T секунд (0 - выключено)
+PROFILE_UPDATES = int(os.getenv("PROFILE_UPDATES", "0"))
+PROFILE_SECONDS = float(os.getenv("PROFILE_SECONDS", "0"))
+# cprofile (детерминированный, файл .pstats) или sampling (стеки, файл .folded)
+PROFILE_MODE = os.getenv("PROFILE_MODE", "cprofile").lower()
+# Интервал снятия стека в режиме sampling, сек
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+
+MODES = ("cprofile", "sampling")
+# Режим /profile по умолчанию: PROFILE_MODE, если такой режим есть
+DEFAULT_MODE = PROFILE_MODE if PROFILE_MODE in MODES else MODES[0]
+# Предел длительности сеанса, если задано только число обновлений
+MAX_SESSION_SECONDS = 3600
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Выборочный профилировщик: фоновый поток раз в interval снимает стек
+    потока цикла событий и считает одинаковые стеки.
+
+    Результат пишется в формате collapsed stacks («корень;...;лист число»),
+    который понимают flamegraph.pl и speedscope.
+    """
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="stack-sampler", daemon=True
+        )
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path: Path) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class ProfileSession:
+    """Один сеанс профилирования: N обновлений и/или T секунд"""
+
+    def __init__(self, mode: str, updates: int, seconds: float, on_done=None):
+        self.mode = mode
+        self.remaining = updates or None
+        self.seconds = seconds or MAX_SESSION_SECONDS
+        self.on_done = on_done
+        self.started_at = time.time()
+        self.updates = 0
+        self._timer = None
+        if mode == "sampling":
+            self._backend = StackSampler(threading.get_ident())
+        else:
+            self._backend = cProfile.Profile()
+
+    def start(self, on_timeout) -> None:
+        self._timer = asyncio.get_running_loop().call_later(self.seconds, on_timeout)
+        if self.mode == "sampling":
+            self._backend.start()
+        else:
+            self._backend.enable()
+
+    def update_done(self) -> bool:
+        """Обработано еще одно обновление; True - сеанс пора завершить"""
+        self.updates += 1
+        if self.remaining is None:
+            return False
+        self.remaining -= 1
+        return self.remaining <= 0
+
+    def finish(self, directory: Path) -> Path:
+        """Останавливает сбор и записывает профиль"""
+        if self._timer is not None:
+            self._timer.cancel()
+        if self.mode == "sampling":
+            self._backend.stop()
+        else:
+            self._backend.disable()
+
+        directory.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started_at))
+        suffix = "folded" if self.mode == "sampling" else "pstats"
+        path = directory / f"profile-{stamp}-pid{os.getpid()}.{suffix}"
+        if self.mode == "sampling":
+            self._backend.dump(path)
+        else:
+            self._backend.dump_stats(str(path))
+        return path
+
+
+class Profiler:
+    """
+    Профилирование обработчиков по требованию, без перезапуска бота.
+
+    Обработчики помечаются декоратором profiled; пока сеанс не запущен,
+    обертка только проверяет один атрибут. Сеанс (команда администратора
+    /profile или PROFILE_UPDATES / PROFILE_SECONDS при запуске) профилирует
+    поток цикла событий целиком - обработку сообщений, /start и обращения к
+    YandexGPT - пока не будут обработаны N обновлений или не истекут T секунд.
+    Профили пишутся в PROFILE_DIR: .pstats (cProfile, для pstats, snakeviz,
+    flameprof) или .folded (выборочный режим, для flamegraph.pl и speedscope).
+    """
+
+    def __init__(self, directory: str = PROFILE_DIR):
+        self.directory = Path(directory)
+        self.session = None
+        self.last_path = None
+
+    @property
+    def active(self) -> bool:
+        return self.session is not None
+
+    def profiled(self, func):
+        """Декоратор обработчика обновления: учитывает его в текущем сеансе"""
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            if self.session is None:
+                return await func(*args, **kwargs)
+            session = self.session
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                if session is self.session and session.update_done():
+                    self.stop()
+
+        return wrapper
+
+    def start(
+        self,
+        updates: int = 0,
+        seconds: float = 0,
+        mode: str = DEFAULT_MODE,
+        on_done=None,
+    ) -> None:
+        """
+        Запускает сеанс в работающем цикле событий.
+
+        on_done(path) - корутина, которую запустят с путем к профилю после
+        завершения сеанса.
+        """
+        if mode not in MODES:
+            raise ValueError(f"неизвестный режим профилирования: {mode}")
+        if self.session is not None:
+            raise RuntimeError("профилирование уже запущено")
+        self.session = ProfileSession(mode, updates, seconds, on_done)
+        self.session.start(self.stop)
+        logger.info(
+            f"Профилирование ({mode}) запущено: "
+            f"обновлений {updates or 'без ограничения'}, секунд {self.session.seconds:g}"
+        )
+
+    def start_from_env(self) -> None:
+        """
+        Сеанс с запуска, если заданы PROFILE_UPDATES или PROFILE_SECONDS.
+
+        При неизвестном PROFILE_MODE бот запускается без профилирования.
+        """
+        if PROFILE_UPDATES <= 0 and PROFILE_SECONDS <= 0:
+            return
+        if PROFILE_MODE not in MODES:
+            logger.warning(
+                f"Неизвестный PROFILE_MODE={PROFILE_MODE!r} "
+                f"(допустимо: {', '.join(MODES)}), профилирование с запуска выключено"
+            )
+            return
+        self.start(PROFILE_UPDATES, PROFILE_SECONDS, PROFILE_MODE)
+
+    def stop(self, notify: bool = True):
+        """
+        Завершает текущий сеанс; путь к профилю или None, если сеанса нет.
+
+        notify=False - не вызывать on_done (например, при остановке бота).
+        """
+        session, self.session = self.session, None
+        if session is None:
+            return None
+        try:
+            path = session.finish(self.directory)
+        except OSError:
+            logger.exception("Не удалось записать профиль")
+            return None
+        self.last_path = path
+        logger.info(
+            f"Профиль сохранен: {path} "
+            f"(обновлений: {session.updates}, {time.time() - session.started_at:.1f} сек)"
+        )
+        if notify and session.on_done is not None:
+            asyncio.get_running_loop().create_task(session.on_done(path))
+        return path
+
+
+# Профилировщик приложения
+profiler = Profiler()
@@ -0,0 +1,181 @@
+import logging
+import math
+import os
+
+logger = logging.getLogger(__name__)
+
+# Размер контекста модели и бюджет промпта (остальное - под ответ модели)
+MODEL_CONTEXT_TOKENS = int(os.getenv("MODEL_CONTEXT_TOKENS", "8000"))
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "0"))
+
+# Средняя длина токена для русского текста (оценка с запасом)
+CHARS_PER_TOKEN = 3.0
+# Служебные токены на каждое сообщение (роль, разделители)
+MESSAGE_OVERHEAD_TOKENS = 4
+# Сколько последних сообщений истории сохраняются в первую очередь
+MIN_HISTORY_MESSAGES = 4
+
+TRUNCATION_MARK = "\n…"
+
+
+def estimate_tokens(text: str) -> int:
+    """Локальная оценка числа токенов в тексте"""
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def message_tokens(message: dict) -> int:
+    """Оценка числа токенов в одном сообщении вместе со служебными"""
+    return estimate_tokens(message["text"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Обрезает текст до бюджета токенов по границе строки"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    max_chars = int(max_tokens * CHARS_PER_TOKEN) - len(TRUNCATION_MARK)
+    if max_chars <= 0:
+        return ""
+    cut = text[:max_chars]
+    line_end = cut.rfind("\n")
+    if line_end > max_chars // 2:
+        cut = cut[:line_end]
+    return cut + TRUNCATION_MARK
+
+
+class PromptBuilder:
+    """
+    Сборка списка сообщений для YandexGPT в пределах бюджета токенов.
+
+    Обязательные части (системный промпт, текущий вопрос, итоговые указания)
+    входят всегда. Остальное добавляется по приоритету: последние реплики
+    диалога, контекст объекта, сводка диалога, сводка по базе, более ранняя
+    история.
+    Не помещающиеся части обрезаются или отбрасываются.
+    """
+
+    def __init__(self, budget: int = None, max_output_tokens: int = 0):
+        if budget is None:
+            budget = PROMPT_TOKEN_BUDGET or MODEL_CONTEXT_TOKENS - max_output_tokens
+        self.budget = budget
+
+    def build(
+        self,
+        system_prompt: str,
+        user_text: str,
+        object_context: str = "",
+        conversation_summary: str = "",
+        catalog_summary: str = "",
+        catalog_title: str = "ВСЯ БАЗА ОБЪЕКТОВ (кратко):",
+        history: list = (),
+        notes: list = (),
+        final_instructions: list = (),
+    ) -> list:
+        """
+        Возвращает список сообщений [{"role": str, "text": str}].
+
+        Параметры:
+            system_prompt (str): Основные системные инструкции
+            user_text (str): Текущий запрос пользователя
+            object_context (str): Контекст найденного объекта
+            conversation_summary (str): Сводка более ранней части диалога
+            catalog_summary (str): Краткая сводка по всем объектам
+            catalog_title (str): Заголовок сводки (если в ней не вся база)
+            history (list): История диалога [{"role": str, "text": str}]
+            notes (list): Дополнительные системные указания (добавляются к промпту)
+            final_instructions (list): Указания после вопроса пользователя
+        """
+        system_message = {
+            "role": "system",
+            "text": "\n".join([system_prompt.strip(), *notes]),
+        }
+        user_message = {"role": "user", "text": user_text}
+        final_message = (
+            {"role": "system", "text": "\n".join(final_instructions)}
+            if final_instructions
+            else None
+        )
+
+        remaining = self.budget - message_tokens(system_message)
+        remaining -= message_tokens(user_message)
+        if final_message:
+            remaining -= message_tokens(final_message)
+
+        history_messages = [
+            self._history_message(msg)
+            for msg in history
+            if msg["role"] in ("user", "assistant")
+        ]
+        kept_history = []
+
+        def take_history(limit: int) -> None:
+            nonlocal remaining
+            # Идем от новых сообщений к старым
+            for message in reversed(
+                history_messages[: len(history_messages) - len(kept_history)]
+            ):
+                if len(kept_history) >= limit:
+                    break
+                cost = message_tokens(message)
+                if cost > remaining:
+                    break
+                kept_history.insert(0, message)
+                remaining -= cost
+
+        def take_section(title: str, text: str) -> dict:
+            nonlocal remaining
+            if not text or remaining <= MESSAGE_OVERHEAD_TOKENS:
+                return None
+            body = truncate_to_tokens(
+                f"{title}\n{text}", remaining - MESSAGE_OVERHEAD_TOKENS
+            )
+            if not body:
+                return None
+            message = {"role": "system", "text": body}
+            remaining -= message_tokens(message)
+            return message
+
+        # 1. Последние реплики диалога
+        take_history(MIN_HISTORY_MESSAGES)
+        # 2. Контекст объекта
+        context_message = take_section("ТЕКУЩИЙ КОНТЕКСТ ОБЪЕКТА:", object_context)
+        # 3. Сводка более ранней части диалога
+        memory_message = take_section("КРАТКО О ДИАЛОГЕ РАНЕЕ:", conversation_summary)
+        # 4. Сводка по базе (вся или релевантная часть)
+        summary_message = take_section(catalog_title, catalog_summary)
+        # 5. Более ранняя история
+        take_history(len(history_messages))
+
+        messages = [system_message]
+        if context_message:
+            messages.append(context_message)
+        if memory_message:
+            messages.append(memory_message)
+        if summary_message:
+            messages.append(summary_message)
+        messages.extend(kept_history)
+        messages.append(user_message)
+        if final_message:
+            messages.append(final_message)
+
+        dropped = len(history_messages) - len(kept_history)
+        logger.debug(
+            "Промпт: ~%d из %d токенов, отброшено сообщений истории: %d",
+            self.budget - remaining,
+            self.budget,
+            dropped,
+        )
+        return messages
+
+    @staticmethod
+    def _history_message(msg: dict) -> dict:
+        # Для ассистента добавляем с пометкой
+        if msg["role"] == "assistant":
+            return {"role": "assistant", "text": f"[Ассистент]: {msg['text']}"}
+        return {"role": msg["role"], "text": msg["text"]}
+
+
+def count_prompt_tokens(messages: list) -> int:
+    """Оценка размера готового промпта в токенах"""
+    return sum(message_tokens(message) for message in messages)
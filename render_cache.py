@@ -0,0 +1,127 @@
+import logging
+from collections import OrderedDict
+
+from utils import (
+    COMPARISON_HEADER,
+    RELEVANT_SUMMARY_HEADER,
+    compare_complexes,
+    format_auto_search_block,
+    format_compare_block,
+    format_comparison_block,
+    format_context,
+    format_object_block,
+    format_summary_block,
+    resolve_complex_name,
+)
+
+logger = logging.getLogger(__name__)
+
+# Максимум запомненных составных контекстов и сравнений
+MAX_MEMOIZED = 1024
+
+
+class RenderCache:
+    """
+    Заранее отрисованные тексты для одной версии каталога.
+
+    Блоки каждого объекта (полный контекст, фрагменты для автопоиска и
+    сравнения, блок ответа со сравнением) строятся один раз при загрузке
+    каталога. Составные тексты запоминаются по набору объектов и отдаются
+    по ссылке, без повторной сборки строк.
+    """
+
+    def __init__(self, db: dict, resolver):
+        self.db = db
+        self.resolver = resolver
+        self.object_blocks = {}
+        self.auto_search_blocks = {}
+        self.compare_blocks = {}
+        self.comparison_blocks = {}
+        self.summary_blocks = {}
+        for name, obj in db.items():
+            self.object_blocks[name] = format_object_block({"название": name, **obj})
+            self.auto_search_blocks[name] = format_auto_search_block(name, obj)
+            self.compare_blocks[name] = format_compare_block(name, obj)
+            self.comparison_blocks[name] = format_comparison_block(name, obj)
+            self.summary_blocks[name] = format_summary_block(name, obj)
+        self.all_objects_block = (
+            "===== ВСЕ ДОСТУПНЫЕ ЖК =====\n"
+            + "".join(f"- {name}\n" for name in db)
+            + "\n"
+        )
+        self._order = {name: i for i, name in enumerate(db)}
+        self._memo = OrderedDict()
+        logger.info(f"Тексты объектов подготовлены: {len(db)}")
+
+    def _remember(self, key, build):
+        text = self._memo.get(key)
+        if text is None:
+            text = build()
+            self._memo[key] = text
+            if len(self._memo) > MAX_MEMOIZED:
+                self._memo.popitem(last=False)
+        else:
+            self._memo.move_to_end(key)
+        return text
+
+    def format_context(self, object_data: dict) -> str:
+        """То же, что utils.format_context, но из готовых блоков"""
+        special_type = object_data.get("special_type")
+
+        if special_type is None:
+            block = self.object_blocks.get(object_data.get("название"))
+            if block is not None:
+                return block
+            return format_context(object_data, self.db)
+
+        objects = tuple(object_data["objects"])
+        if not objects or any(name not in self.db for name in objects):
+            return format_context(object_data, self.db)
+
+        if special_type == "all_objects" and len(objects) == len(self.db):
+            return self.all_objects_block
+        if special_type == "auto_search":
+            return self._remember(
+                ("auto_search", objects),
+                lambda: "===== НАЙДЕННЫЕ ОБЪЕКТЫ =====\n"
+                + "".join(self.auto_search_blocks[name] for name in objects),
+            )
+        if special_type == "compare":
+            return self._remember(
+                ("compare", objects),
+                lambda: "===== СРАВНЕНИЕ ОБЪЕКТОВ =====\n"
+                + "".join(self.compare_blocks[name] for name in objects),
+            )
+        return format_context(object_data, self.db)
+
+    def relevant_summary(self, names: list) -> str:
+        """То же, что utils.generate_objects_summary, но из готовых блоков"""
+        names = tuple(name for name in names if name in self.summary_blocks)
+        return self._remember(
+            ("summary", names),
+            lambda: RELEVANT_SUMMARY_HEADER
+            + "".join(self.summary_blocks[name] for name in names),
+        )
+
+    def compare(self, complex_names: list) -> str:
+        """
+        То же, что utils.compare_complexes.
+
+        Если все названия распознаны, результат запоминается по отсортированному
+        набору ЖК и выводится в порядке каталога.
+        """
+        resolved = [
+            resolve_complex_name(name, self.db, self.resolver) for name in complex_names
+        ]
+        if not complex_names or not all(resolved):
+            return compare_complexes(complex_names, self.db, self.resolver)
+
+        key = ("comparison", tuple(sorted(set(resolved))))
+        return self._remember(
+            key,
+            lambda: COMPARISON_HEADER
+            + "".join(
+                self.comparison_blocks[name]
+                for name in sorted(key[1], key=self._order.get)
+            ),
+        )
@@ -0,0 +1,112 @@
+import logging
+import random
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Коды ответа, после которых запрос имеет смысл повторить
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Сколько последних задержек хранится для оценки перцентилей
+LATENCY_SAMPLES = 200
+# Минимум замеров, после которого перцентиль считается надежным
+MIN_LATENCY_SAMPLES = 20
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Экспоненциальная задержка с полным джиттером: случайно от 0 до base * 2^attempt"""
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+def retry_after_seconds(response) -> float:
+    """Значение заголовка Retry-After в секундах (0, если его нет)"""
+    try:
+        return max(0.0, float(response.headers.get("Retry-After", 0)))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class LatencyTracker:
+    """Скользящее окно задержек успешных ответов"""
+
+    def __init__(self, size: int = LATENCY_SAMPLES):
+        self._samples = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, q: float):
+        """Перцентиль q (0..1) или None, пока замеров мало"""
+        if len(self._samples) < MIN_LATENCY_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class CircuitBreaker:
+    """
+    Предохранитель для внешнего API.
+
+    После failure_threshold неудач подряд цепь размыкается: вызовы сразу
+    получают отказ в течение reset_timeout секунд. Затем пропускается один
+    пробный вызов - при успехе цепь замыкается, при неудаче снова размыкается.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started_at = 0.0
+        self.short_circuited = 0
+
+    def allow(self) -> bool:
+        """Можно ли сейчас обращаться к API"""
+        if self.failure_threshold <= 0 or self.state == self.CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == self.OPEN and now - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self.probe_started_at = 0.0
+            logger.info("Предохранитель YandexGPT: пробный запрос")
+        if self.state == self.HALF_OPEN:
+            # Один пробный запрос; зависший пробный запрос повторяем после таймаута
+            if now - self.probe_started_at >= self.reset_timeout:
+                self.probe_started_at = now
+                return True
+        self.short_circuited += 1
+        return False
+
+    def record_success(self) -> None:
+        if self.state != self.CLOSED:
+            logger.info("Предохранитель YandexGPT замкнут, API снова отвечает")
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or (
+            self.state == self.CLOSED and self.failures >= self.failure_threshold > 0
+        ):
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            logger.warning(
+                f"Предохранитель YandexGPT разомкнут на {self.reset_timeout} сек "
+                f"после {self.failures} неудач подряд"
+            )
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "short_circuited": self.short_circuited,
+        }
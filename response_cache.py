@@ -0,0 +1,218 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Настройки кэша ответов LLM
+CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1000"))
+CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))
+# Путь к файлу дискового уровня кэша (пусто - только память)
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", "")
+# Интервал фоновой записи новых ответов на диск, секунд
+CACHE_FLUSH_INTERVAL = float(os.getenv("LLM_CACHE_FLUSH_INTERVAL", "5"))
+
+PUNCTUATION_RE = re.compile(r"[^\w\s]+")
+SPACES_RE = re.compile(r"\s+")
+
+
+def normalize_question(text: str) -> str:
+    """Приводит вопрос к каноническому виду: регистр, «ё», пунктуация, пробелы"""
+    text = text.lower().replace("ё", "е")
+    text = PUNCTUATION_RE.sub(" ", text)
+    return SPACES_RE.sub(" ", text).strip()
+
+
+class ResponseCache:
+    """
+    Ограниченный кэш ответов LLM с вытеснением LRU и сроком жизни записей.
+
+    Ключ строится из нормализованного вопроса, контекста объекта и версии
+    каталога. При указании file_path записи дублируются в SQLite, чтобы кэш
+    переживал перезапуск бота; на диск новые ответы пишутся пачками в
+    отдельном потоке (flush), а не в обработчике сообщения.
+    """
+
+    def __init__(
+        self,
+        max_size: int = CACHE_SIZE,
+        ttl: float = CACHE_TTL,
+        file_path: str = CACHE_PATH,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._db = None
+        # Ответы, еще не записанные на диск
+        self._pending = {}
+        self._flush_task = None
+
+        if file_path:
+            path = Path(file_path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                "DELETE FROM responses WHERE created_at < ?", (time.time() - ttl,)
+            )
+            self._db.commit()
+            logger.info(f"Дисковый кэш ответов: {path.absolute()}")
+
+    @staticmethod
+    def make_key(question: str, object_context: str, catalog_version: str) -> str:
+        """Ключ кэша для вопроса в заданном контексте"""
+        raw = "\x1f".join(
+            [catalog_version or "", normalize_question(question), object_context or ""]
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str:
+        """Возвращает ответ из кэша или None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if now - created_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row and now - row[1] <= self.ttl:
+                    self._store(key, row[0], row[1])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: str) -> None:
+        """Сохраняет ответ в кэш; на диск он попадет при следующем flush"""
+        created_at = time.time()
+        with self._lock:
+            self._store(key, value, created_at)
+            if self._db is not None:
+                self._pending[key] = (value, created_at)
+
+    def _write(self, rows: list) -> None:
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO responses (key, value, created_at) "
+                "VALUES (?, ?, ?)",
+                rows,
+            )
+            self._db.commit()
+
+    def _take_pending(self) -> list:
+        with self._lock:
+            rows = [(key, value, ts) for key, (value, ts) in self._pending.items()]
+            self._pending.clear()
+        return rows
+
+    async def flush(self) -> int:
+        """Записывает новые ответы на диск в отдельном потоке"""
+        rows = self._take_pending()
+        if rows:
+            try:
+                await asyncio.to_thread(self._write, rows)
+            except Exception:
+                logger.exception("Ошибка записи кэша ответов")
+                # Повторим при следующем сбросе, если ответ не обновился
+                with self._lock:
+                    for key, value, ts in rows:
+                        self._pending.setdefault(key, (value, ts))
+                return 0
+        return len(rows)
+
+    async def _flush_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush()
+
+    def start(self, interval: float = CACHE_FLUSH_INTERVAL) -> None:
+        """Запускает фоновую запись на диск (в работающем цикле событий)"""
+        if self._db is not None and self._flush_task is None:
+            self._flush_task = asyncio.get_running_loop().create_task(
+                self._flush_loop(interval)
+            )
+
+    async def stop(self) -> None:
+        """Останавливает фоновую запись и дописывает оставшиеся ответы"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        if self._db is not None:
+            await self.flush()
+
+    def _store(self, key: str, value: str, created_at: float) -> None:
+        self._entries[key] = (value, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Очищает кэш (например, после обновления каталога)"""
+        with self._lock:
+            self._entries.clear()
+            self._pending.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        """Статистика попаданий и промахов"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "size": len(self._entries),
+            "pending": len(self._pending),
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+def is_cacheable_turn(user_data: dict) -> bool:
+    """
+    Кэшируются только вопросы без предыстории и без имени клиента.
+
+    Ответ на уточняющий вопрос зависит от истории диалога и сводки, которых
+    нет в ключе, а клиенту, назвавшему имя, модель отвечает по имени;
+    такие ходы, как и сбор контактов, идут в модель.
+    """
+    return not (
+        user_data.get("user_name")
+        or user_data.get("history")
+        or user_data.get("summary")
+        or user_data.get("collecting_contacts")
+        or user_data.get("contact_saved")
+    )
+
+
+# Общий кэш ответов
+response_cache = ResponseCache()
@@ -0,0 +1,339 @@
+import logging
+import math
+import re
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"[a-zа-яё0-9№]+")
+
+# Служебные слова, которые не участвуют в поиске
+STOP_WORDS = set(
+    (
+        "а в во и к ко на над о об от по под при про с со у из за для до не ни "
+        "ли же бы что как какой какая какие какое где когда это этот эта есть "
+        "мне меня вы ваш ваши расскажи расскажите подскажи подскажите рядом "
+        "около возле недалеко"
+    ).split()
+)
+
+# Слова, которые есть в названии почти любого объекта
+GENERIC_NAME_TOKENS = {"жк", "жилой", "комплекс"}
+
+# Вес совпадения в зависимости от поля объекта
+FIELD_WEIGHTS = {
+    "название": 5.0,
+    "особенности": 2.0,
+    "ближайшие_объекты": 2.0,
+    "описание": 1.0,
+}
+
+# Минимальная длина префикса для поиска по началу названия
+MIN_PREFIX_LENGTH = 4
+
+# ---------------------------------------------------------------------------
+# Стеммер для русского языка (упрощенный алгоритм Snowball)
+# ---------------------------------------------------------------------------
+
+VOWELS = "аеиоуыэюя"
+
+PERFECTIVE_GERUND_1 = ("вшись", "вши", "в")
+PERFECTIVE_GERUND_2 = ("ившись", "ывшись", "ивши", "ывши", "ив", "ыв")
+ADJECTIVE = tuple(
+    (
+        "ими ыми его ого ему ому ее ие ые ое ей ий ый ой ем им ым ом их ых ую "
+        "юю ая яя ою ею"
+    ).split()
+)
+PARTICIPLE_1 = ("ем", "нн", "вш", "ющ", "щ")
+PARTICIPLE_2 = ("ивш", "ывш", "ующ")
+REFLEXIVE = ("ся", "сь")
+VERB_1 = tuple("ете йте ешь нно ла на ли ем ло но ет ют ны ть й л н".split())
+VERB_2 = tuple(
+    (
+        "ейте уйте ила ыла ена ите или ыли ило ыло ено ует уют ены ить ыть ишь "
+        "ей уй ил ыл им ым ен ят ит ыт ую ю"
+    ).split()
+)
+NOUN = tuple(
+    (
+        "иями ями ами ией иям ием иях ев ов ие ье еи ии ей ой ий ям ем ам ом ах "
+        "ях ию ью ия ья а е и й о у ы ь ю я"
+    ).split()
+)
+SUPERLATIVE = ("ейше", "ейш")
+DERIVATIONAL = ("ость", "ост")
+
+
+def _sorted_endings(endings: tuple) -> tuple:
+    return tuple(sorted(endings, key=len, reverse=True))
+
+
+PERFECTIVE_GERUND_1 = _sorted_endings(PERFECTIVE_GERUND_1)
+PERFECTIVE_GERUND_2 = _sorted_endings(PERFECTIVE_GERUND_2)
+ADJECTIVE = _sorted_endings(ADJECTIVE)
+PARTICIPLE_1 = _sorted_endings(PARTICIPLE_1)
+PARTICIPLE_2 = _sorted_endings(PARTICIPLE_2)
+VERB_1 = _sorted_endings(VERB_1)
+VERB_2 = _sorted_endings(VERB_2)
+NOUN = _sorted_endings(NOUN)
+
+
+def _strip_ending(word: str, endings: tuple, preceded_by: str = "") -> str:
+    """Удаляет первое подходящее окончание; возвращает None, если не найдено"""
+    for ending in endings:
+        if word.endswith(ending):
+            stem = word[: -len(ending)]
+            if preceded_by and (not stem or stem[-1] not in preceded_by):
+                continue
+            return stem
+    return None
+
+
+def _strip_any(word: str, group_1: tuple, group_2: tuple) -> str:
+    """Окончания группы 1 должны идти после «а»/«я», группы 2 - без условий"""
+    stem = _strip_ending(word, group_1, preceded_by="ая")
+    if stem is not None:
+        return stem
+    return _strip_ending(word, group_2)
+
+
+def _strip_adjectival(word: str) -> str:
+    stem = _strip_ending(word, ADJECTIVE)
+    if stem is None:
+        return None
+    participle_stem = _strip_any(stem, PARTICIPLE_1, PARTICIPLE_2)
+    return participle_stem if participle_stem is not None else stem
+
+
+@lru_cache(maxsize=65536)
+def stem(word: str) -> str:
+    """Возвращает основу русского слова"""
+    word = word.lower().replace("ё", "е")
+
+    # RV - часть слова после первой гласной
+    for i, char in enumerate(word):
+        if char in VOWELS:
+            prefix, rv = word[: i + 1], word[i + 1 :]
+            break
+    else:
+        return word
+
+    # R2 для словообразовательных окончаний
+    r1_start = next(
+        (
+            i + 1
+            for i in range(1, len(word))
+            if word[i] not in VOWELS and word[i - 1] in VOWELS
+        ),
+        len(word),
+    )
+    r2_start = next(
+        (
+            i + 1
+            for i in range(r1_start + 1, len(word))
+            if word[i] not in VOWELS and word[i - 1] in VOWELS
+        ),
+        len(word),
+    )
+
+    # Шаг 1
+    result = _strip_any(rv, PERFECTIVE_GERUND_1, PERFECTIVE_GERUND_2)
+    if result is None:
+        reflexive_stem = _strip_ending(rv, REFLEXIVE)
+        if reflexive_stem is not None:
+            rv = reflexive_stem
+        for strip in (
+            _strip_adjectival,
+            lambda w: _strip_any(w, VERB_1, VERB_2),
+            lambda w: _strip_ending(w, NOUN),
+        ):
+            result = strip(rv)
+            if result is not None:
+                break
+        else:
+            result = rv
+    rv = result
+
+    # Шаг 2
+    if rv.endswith("и"):
+        rv = rv[:-1]
+
+    # Шаг 3
+    r2_in_rv = max(0, r2_start - len(prefix))
+    for ending in DERIVATIONAL:
+        if rv.endswith(ending) and len(rv) - len(ending) >= r2_in_rv:
+            rv = rv[: -len(ending)]
+            break
+
+    # Шаг 4
+    if rv.endswith("нн"):
+        rv = rv[:-1]
+    else:
+        superlative_stem = _strip_ending(rv, SUPERLATIVE)
+        if superlative_stem is not None:
+            rv = superlative_stem
+            if rv.endswith("нн"):
+                rv = rv[:-1]
+        elif rv.endswith("ь"):
+            rv = rv[:-1]
+
+    return prefix + rv
+
+
+def tokenize(text: str) -> list:
+    """Разбивает текст на основы слов без служебных слов"""
+    return [
+        stem(token)
+        for token in TOKEN_RE.findall(text.lower())
+        if token not in STOP_WORDS
+    ]
+
+
+class SearchIndex:
+    """
+    Инвертированный индекс по базе объектов.
+
+    Строится один раз при загрузке базы: для каждой основы слова хранится
+    список объектов с весами (название, описание, особенности, ближайшие
+    объекты). Поиск по запросу стоит O(число слов запроса) и не зависит
+    от размера каталога.
+    """
+
+    def __init__(self, db: dict = None):
+        self.db = None
+        self.records = {}
+        self.postings = {}
+        self.name_postings = {}
+        self.name_prefixes = {}
+        self.name_stems = {}
+        self.name_order = {}
+        self.key_postings = {}
+        self.key_prefixes = {}
+        if db is not None:
+            self.build(db)
+
+    def build(self, db: dict) -> "SearchIndex":
+        """Строит индекс по базе данных"""
+        self.db = db
+        self.records = {}
+        # Позиция объекта в базе - для сортировки совпадений без обхода каталога
+        self.name_order = {name: i for i, name in enumerate(db)}
+        postings = {}
+        name_postings = {}
+        name_prefixes = {}
+        name_stems = {}
+
+        def add(name: str, text: str, weight: float) -> None:
+            for token in tokenize(text):
+                entry = postings.setdefault(token, {})
+                entry[name] = entry.get(name, 0.0) + weight
+
+        for name, data in db.items():
+            # Готовая запись объекта, которая отдается без копирования
+            self.records[name] = {"название": name, **data}
+
+            add(name, name, FIELD_WEIGHTS["название"])
+            add(name, data.get("описание", ""), FIELD_WEIGHTS["описание"])
+            for feature in data.get("особенности", []):
+                add(name, feature, FIELD_WEIGHTS["особенности"])
+            for nearby in data.get("ближайшие_объекты", []):
+                add(
+                    name,
+                    f"{nearby.get('название', '')} {nearby.get('тип', '')}",
+                    FIELD_WEIGHTS["ближайшие_объекты"],
+                )
+
+            # Отличительные слова названия (без «ЖК» и т.п.)
+            stems = {
+                token for token in tokenize(name) if token not in GENERIC_NAME_TOKENS
+            }
+            name_stems[name] = stems
+            for token in stems:
+                name_postings.setdefault(token, set()).add(name)
+                for length in range(MIN_PREFIX_LENGTH, len(token)):
+                    name_prefixes.setdefault(token[:length], set()).add(name)
+
+        # Переводим частоты в веса TF-IDF
+        total = len(db)
+        for token, entry in postings.items():
+            idf = math.log(total / len(entry)) if total > 1 else 1.0
+            for name in entry:
+                entry[name] *= idf
+
+        # Самое редкое слово каждого названия: без него название не совпадет,
+        # поэтому кандидаты берутся только по нему, а не по общим словам
+        key_postings = {}
+        key_prefixes = {}
+        for name, stems in name_stems.items():
+            if not stems:
+                continue
+            key = min(stems, key=lambda s: (len(name_postings[s]), s))
+            key_postings.setdefault(key, set()).add(name)
+            for length in range(MIN_PREFIX_LENGTH, len(key)):
+                key_prefixes.setdefault(key[:length], set()).add(name)
+
+        self.postings = postings
+        self.name_postings = name_postings
+        self.name_prefixes = name_prefixes
+        self.name_stems = name_stems
+        self.key_postings = key_postings
+        self.key_prefixes = key_prefixes
+        logger.info(
+            f"Поисковый индекс построен: {len(db)} объектов, {len(postings)} основ"
+        )
+        return self
+
+    def record(self, name: str) -> dict:
+        """Возвращает запись объекта вместе с полем «название»"""
+        return self.records.get(name)
+
+    def match_names(self, query: str) -> list:
+        """
+        Объекты, все отличительные слова названия которых есть в запросе.
+
+        Учитываются словоформы («в Солнечном») и начало слова («солн»).
+        Порядок совпадает с порядком объектов в базе.
+        """
+        # Слова запроса: целые слова названий и начала слов («солн»)
+        exact = set()
+        prefixes = set()
+        for token in set(tokenize(query)):
+            if token in self.name_postings:
+                exact.add(token)
+            elif token in self.name_prefixes:
+                prefixes.add(token)
+
+        candidates = set()
+        for token in exact:
+            candidates.update(self.key_postings.get(token, ()))
+        for token in prefixes:
+            candidates.update(self.key_prefixes.get(token, ()))
+
+        matched = [
+            name
+            for name in candidates
+            if all(
+                s in exact or any(s.startswith(t) for t in prefixes)
+                for s in self.name_stems[name]
+            )
+        ]
+        return sorted(matched, key=self.name_order.get)
+
+    def search(self, query: str, limit: int = None) -> list:
+        """
+        Ранжированный поиск по всем полям.
+
+        Возвращает список пар (название, релевантность) по убыванию релевантности.
+        """
+        scores = {}
+        for token in tokenize(query):
+            for name, weight in self.postings.get(token, {}).items():
+                scores[name] = scores.get(name, 0.0) + weight
+
+        ranked = sorted(
+            ((name, score) for name, score in scores.items() if score > 0),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+        return ranked[:limit] if limit else ranked
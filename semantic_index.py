@@ -0,0 +1,119 @@
+import logging
+import math
+import os
+import zlib
+from collections import Counter
+
+import numpy as np
+
+from search_index import STOP_WORDS, TOKEN_RE, stem
+
+logger = logging.getLogger(__name__)
+
+# Сколько самых релевантных объектов передавать модели (0 - всю базу)
+SEMANTIC_TOP_K = int(os.getenv("SEMANTIC_TOP_K", "5"))
+# Размерность хэшированного вектора
+EMBEDDING_DIM = 1024
+# Длины символьных n-грамм
+NGRAM_SIZES = (3, 4)
+
+
+def text_features(text: str) -> Counter:
+    """Признаки текста: основы слов и символьные n-граммы слов"""
+    features = Counter()
+    for token in TOKEN_RE.findall(text.lower().replace("ё", "е")):
+        if token in STOP_WORDS:
+            continue
+        features[f"w:{stem(token)}"] += 1
+        padded = f" {token} "
+        for size in NGRAM_SIZES:
+            for i in range(len(padded) - size + 1):
+                features[padded[i : i + size]] += 1
+    return features
+
+
+def embed(text: str, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """
+    Локальное векторное представление текста без обращения к сети.
+
+    Признаки хэшируются (crc32, стабильно между запусками) в вектор
+    фиксированной размерности со знаком, частоты сглаживаются логарифмом.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    for feature, count in text_features(text).items():
+        h = zlib.crc32(feature.encode("utf-8"))
+        sign = 1.0 if h & 0x80000000 else -1.0
+        vector[h % dim] += sign * (1.0 + math.log(count))
+    return vector
+
+
+def object_text(name: str, data: dict) -> str:
+    """Текст объекта для индексации: название, описание, особенности, окружение"""
+    parts = [name, data.get("описание", "")]
+    parts.extend(data.get("особенности", []))
+    for nearby in data.get("ближайшие_объекты", []):
+        parts.append(f"{nearby.get('название', '')} {nearby.get('тип', '')}")
+    return "\n".join(parts)
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class SemanticIndex:
+    """
+    Векторный индекс каталога для отбора релевантных объектов.
+
+    Строится один раз для снимка каталога: матрица нормированных векторов
+    объектов (с весами IDF по измерениям). Запрос - одно умножение матрицы
+    на вектор и частичная сортировка top-k.
+    """
+
+    def __init__(self, db: dict = None, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+        self.names = []
+        self.matrix = np.zeros((0, dim), dtype=np.float32)
+        self.idf = np.ones(dim, dtype=np.float32)
+        if db is not None:
+            self.build(db)
+
+    def build(self, db: dict) -> "SemanticIndex":
+        """Строит векторы объектов каталога"""
+        self.names = list(db)
+        if not self.names:
+            return self
+        matrix = np.stack(
+            [embed(object_text(name, data), self.dim) for name, data in db.items()]
+        )
+        document_frequency = np.count_nonzero(matrix, axis=0)
+        self.idf = (
+            np.log((len(self.names) + 1) / (document_frequency + 1)) + 1.0
+        ).astype(np.float32)
+        self.matrix = _normalize_rows(matrix * self.idf)
+        logger.info(
+            f"Векторный индекс построен: {len(self.names)} объектов, {self.dim} измерений"
+        )
+        return self
+
+    def query_vector(self, text: str) -> np.ndarray:
+        vector = embed(text, self.dim) * self.idf
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def search(self, text: str, k: int = SEMANTIC_TOP_K) -> list:
+        """
+        Возвращает до k пар (название, косинусная близость) по убыванию близости.
+        """
+        if not self.names or k <= 0:
+            return []
+        scores = self.matrix @ self.query_vector(text)
+        k = min(k, len(self.names))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.names[i], float(scores[i])) for i in top]
+
+
+def build_semantic_index(db: dict) -> SemanticIndex:
+    return SemanticIndex(db)
@@ -0,0 +1,421 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from pathlib import Path
+
+from telegram import Update
+from telegram.ext import CallbackContext, ContextTypes, TypeHandler
+
+logger = logging.getLogger(__name__)
+
+# Файл с состояниями диалогов (пусто - только память, как раньше)
+SESSION_DB_PATH = os.getenv(
+    "SESSION_DB_PATH", str(Path(__file__).resolve().parent / "data" / "sessions.db")
+)
+# Период фоновой записи измененных сессий, сек
+SESSION_FLUSH_INTERVAL = float(os.getenv("SESSION_FLUSH_INTERVAL", "5"))
+# Сколько сессий держать в памяти и через сколько секунд простоя выгружать
+SESSION_MAX_ACTIVE = int(os.getenv("SESSION_MAX_ACTIVE", "10000"))
+SESSION_TTL = float(os.getenv("SESSION_TTL", "1800"))
+# Сессию моложе этого не выгружаем даже при переполнении: по ней может
+# еще идти обработка сообщения или фоновое обновление сводки
+SESSION_MIN_IDLE = float(os.getenv("SESSION_MIN_IDLE", "300"))
+
+
+def _digest(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class SessionData(dict):
+    """
+    context.user_data одного пользователя.
+
+    Обычный словарь, который сообщает хранилищу об изменениях верхнего
+    уровня - так запись из фоновой задачи не теряется, даже если сессию
+    уже выгрузили из памяти.
+    """
+
+    __slots__ = ("__weakref__", "_store", "_user_id")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._store = None
+        self._user_id = None
+
+    def _changed(self) -> None:
+        if self._store is not None:
+            self._store.mark_dirty(self._user_id, self)
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._changed()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._changed()
+
+    def clear(self):
+        super().clear()
+        self._changed()
+
+    def pop(self, *args):
+        result = super().pop(*args)
+        self._changed()
+        return result
+
+    def popitem(self):
+        result = super().popitem()
+        self._changed()
+        return result
+
+    def setdefault(self, key, default=None):
+        result = super().setdefault(key, default)
+        self._changed()
+        return result
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._changed()
+
+
+class SessionContext(CallbackContext):
+    """
+    CallbackContext, у которого user_data берется из хранилища сессий.
+
+    Подключается через Application.builder().context_types(...) - см.
+    SessionStore.context_types(); store задается в подклассе.
+    """
+
+    store = None
+
+    def __init__(self, application, chat_id: int = None, user_id: int = None):
+        super().__init__(application, chat_id=chat_id, user_id=user_id)
+        self.session_user_id = user_id
+
+    @property
+    def user_data(self):
+        if self.store is None or self.session_user_id is None:
+            return super().user_data
+        return self.store[self.session_user_id]
+
+
+class SessionStore(MutableMapping):
+    """
+    Состояния диалогов (context.user_data) с ленивой загрузкой и отложенной записью.
+
+    Отдает context.user_data обработчикам через SessionContext. Сессия
+    читается из SQLite в отдельном потоке перед обработкой первого после
+    запуска или выгрузки обновления пользователя. Обращение помечает сессию
+    измененной; фоновая задача раз в SESSION_FLUSH_INTERVAL сериализует
+    помеченные сессии и одной транзакцией записывает те, что действительно
+    изменились, - сколько бы сообщений ни пришло между записями.
+
+    После записи сессии, простаивающие дольше SESSION_TTL, и самые давние
+    при превышении SESSION_MAX_ACTIVE выгружаются из памяти, так что ее
+    объем определяется активными пользователями, а не всеми.
+    """
+
+    def __init__(
+        self,
+        file_path: str = SESSION_DB_PATH,
+        max_active: int = SESSION_MAX_ACTIVE,
+        ttl: float = SESSION_TTL,
+        min_idle: float = SESSION_MIN_IDLE,
+    ):
+        self.max_active = max_active
+        self.ttl = ttl
+        self.min_idle = min_idle
+        self._active = OrderedDict()  # user_id -> SessionData, по давности обращения
+        self._last_access = {}
+        self._digests = {}  # user_id -> хэш записанного состояния
+        self._dirty = set()
+        self._deleted = set()
+        # Выгруженные сессии, на которые еще ссылается обработчик
+        self._detached = weakref.WeakValueDictionary()
+        self._flush_task = None
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.writes = 0
+        self.evictions = 0
+        self._db = None
+
+        if file_path:
+            path = Path(file_path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path), timeout=5.0, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            with self._db:
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS sessions ("
+                    "user_id INTEGER PRIMARY KEY, data TEXT NOT NULL, "
+                    "updated_at REAL NOT NULL)"
+                )
+            logger.info(f"Файл сессий: {path.absolute()}")
+
+    @property
+    def persistent(self) -> bool:
+        return self._db is not None
+
+    # --- Доступ как к словарю user_id -> user_data ---
+
+    def __getitem__(self, user_id: int) -> SessionData:
+        data = self._active.get(user_id)
+        if data is None:
+            data = self._detached.pop(user_id, None)
+            if data is None:
+                data = self._load(user_id)
+            self._active[user_id] = data
+        else:
+            self._active.move_to_end(user_id)
+        self._last_access[user_id] = time.monotonic()
+        # Вложенные изменения (history.append) не видны - считаем обращение записью
+        self._dirty.add(user_id)
+        return data
+
+    def __setitem__(self, user_id: int, data: dict) -> None:
+        self.__getitem__(user_id).update(data)
+
+    def __delitem__(self, user_id: int) -> None:
+        data = self._active.pop(user_id, None)
+        if data is None:
+            data = self._detached.pop(user_id, None)
+        if data is not None:
+            data._store = None
+        self._last_access.pop(user_id, None)
+        self._digests.pop(user_id, None)
+        self._dirty.discard(user_id)
+        self._deleted.add(user_id)
+
+    def __iter__(self):
+        return iter(list(self._active))
+
+    def __len__(self) -> int:
+        return len(self._active)
+
+    def __contains__(self, user_id) -> bool:
+        return user_id in self._active
+
+    def mark_dirty(self, user_id: int, data: SessionData) -> None:
+        """Изменение сессии: записать при следующем сбросе"""
+        if user_id not in self._active and self._detached.get(user_id) is data:
+            # Сессию уже выгрузили, а фоновая задача ее изменила - возвращаем
+            self._active[user_id] = self._detached.pop(user_id)
+            self._last_access[user_id] = time.monotonic()
+        self._dirty.add(user_id)
+
+    def _attach(self, user_id: int, data: SessionData) -> SessionData:
+        data._store = self
+        data._user_id = user_id
+        return data
+
+    def _read(self, user_id: int):
+        with self._lock:
+            return self._db.execute(
+                "SELECT data FROM sessions WHERE user_id = ?", (user_id,)
+            ).fetchone()
+
+    def _load(self, user_id: int) -> SessionData:
+        """
+        Синхронная загрузка сессии.
+
+        В цикле событий это случается, только если сессию не подгрузил
+        preload() (например, ее выгрузили между preload и обработчиком).
+        """
+        return self._from_row(
+            user_id, self._read(user_id) if self._db is not None else None
+        )
+
+    def _from_row(self, user_id: int, row) -> SessionData:
+        data = SessionData()
+        if self._db is not None:
+            if row is not None:
+                try:
+                    dict.update(data, json.loads(row[0]))
+                    self._digests[user_id] = _digest(row[0])
+                    self.loads += 1
+                except json.JSONDecodeError as e:
+                    logger.error(f"Сессия {user_id} повреждена и сброшена: {e}")
+            else:
+                # Пустую новую сессию записывать незачем
+                self._digests[user_id] = _digest("{}")
+        self._deleted.discard(user_id)
+        return self._attach(user_id, data)
+
+    # --- Отложенная запись ---
+
+    def _collect(self) -> tuple:
+        """Сериализует измененные сессии (в потоке цикла событий)"""
+        rows = []
+        now = time.time()
+        for user_id in self._dirty:
+            data = self._active.get(user_id)
+            if data is None:
+                continue
+            try:
+                text = json.dumps(data, ensure_ascii=False)
+            except (TypeError, ValueError) as e:
+                logger.error(f"Сессию {user_id} нельзя сохранить: {e}")
+                continue
+            digest = _digest(text)
+            if self._digests.get(user_id) != digest:
+                rows.append((user_id, text, now))
+                self._digests[user_id] = digest
+        deleted = list(self._deleted)
+        self._dirty.clear()
+        self._deleted.clear()
+        return rows, deleted
+
+    def _write(self, rows: list, deleted: list) -> None:
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT INTO sessions (user_id, data, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET "
+                "data = excluded.data, updated_at = excluded.updated_at",
+                rows,
+            )
+            self._db.executemany(
+                "DELETE FROM sessions WHERE user_id = ?", [(u,) for u in deleted]
+            )
+
+    async def flush(self) -> int:
+        """Записывает изменившиеся сессии и выгружает простаивающие"""
+        if self._db is None:
+            return 0
+        rows, deleted = self._collect()
+        if rows or deleted:
+            try:
+                await asyncio.to_thread(self._write, rows, deleted)
+            except Exception:
+                logger.exception("Ошибка записи сессий")
+                # Повторим при следующем сбросе
+                for user_id, _, _ in rows:
+                    self._digests.pop(user_id, None)
+                    self._dirty.add(user_id)
+                self._deleted.update(deleted)
+                return 0
+            self.writes += len(rows)
+            logger.debug(f"Записано сессий: {len(rows)}, удалено: {len(deleted)}")
+        self.evict()
+        return len(rows)
+
+    def flush_sync(self) -> int:
+        """Синхронная запись всех изменений (при остановке)"""
+        if self._db is None:
+            return 0
+        rows, deleted = self._collect()
+        if rows or deleted:
+            self._write(rows, deleted)
+            self.writes += len(rows)
+        return len(rows)
+
+    def evict(self) -> int:
+        """Выгружает записанные сессии по сроку простоя и по числу (LRU)"""
+        if self._db is None:
+            return 0
+        now = time.monotonic()
+        evicted = 0
+        for user_id in list(self._active):
+            idle = now - self._last_access.get(user_id, now)
+            overflow = len(self._active) > self.max_active
+            if idle < self.min_idle or not (idle > self.ttl or overflow):
+                # Дальше по порядку только более свежие сессии
+                break
+            if user_id in self._dirty:
+                continue
+            self._detached[user_id] = self._active.pop(user_id)
+            del self._last_access[user_id]
+            self._digests.pop(user_id, None)
+            evicted += 1
+        self.evictions += evicted
+        if evicted:
+            logger.debug(f"Выгружено сессий из памяти: {evicted}")
+        return evicted
+
+    async def _flush_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Ошибка фоновой записи сессий")
+
+    async def preload(self, user_id: int) -> None:
+        """Читает сессию из SQLite в отдельном потоке, не блокируя цикл событий"""
+        if self._db is None or user_id in self._active or user_id in self._detached:
+            return
+        row = await asyncio.to_thread(self._read, user_id)
+        # Пока шло чтение, сессию могли создать синхронно - ее не затираем
+        if user_id not in self._active and user_id not in self._detached:
+            self._active[user_id] = self._from_row(user_id, row)
+            self._last_access[user_id] = time.monotonic()
+
+    # --- Подключение к приложению ---
+
+    def context_types(self) -> ContextTypes:
+        """
+        Типы контекста для Application.builder().context_types().
+
+        Без файла сессий - стандартный контекст с user_data в памяти.
+        """
+        if self._db is None:
+            return ContextTypes()
+        context = type("SessionContext", (SessionContext,), {"store": self})
+        return ContextTypes(context=context)
+
+    def install(self, application) -> None:
+        """Подгрузка сессии до обработчиков: TypeHandler в группе -1"""
+        if self._db is None:
+            return
+
+        async def preload_session(update: Update, context) -> None:
+            if update.effective_user is not None:
+                await self.preload(update.effective_user.id)
+
+        application.add_handler(TypeHandler(Update, preload_session), group=-1)
+
+    def start(self, interval: float = SESSION_FLUSH_INTERVAL) -> None:
+        """Запускает фоновую запись (в работающем цикле событий)"""
+        if self._db is not None and self._flush_task is None:
+            self._flush_task = asyncio.get_running_loop().create_task(
+                self._flush_loop(interval)
+            )
+
+    async def stop(self) -> None:
+        """Останавливает фоновую запись и сохраняет все изменения"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        if self._db is not None:
+            written = await asyncio.to_thread(self.flush_sync)
+            logger.info(f"Сессии сохранены при остановке: {written}")
+
+    def stats(self) -> dict:
+        return {
+            "active": len(self._active),
+            "dirty": len(self._dirty),
+            "loads": self.loads,
+            "writes": self.writes,
+            "evictions": self.evictions,
+        }
+
+    def close(self) -> None:
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+            self._db = None
+
+
+# Состояния диалогов приложения
+session_store = SessionStore()
@@ -0,0 +1,457 @@
+"""
+Многопроцессный режим: фронтальный процесс принимает вебхук Telegram и
+раздает обновления N процессам-обработчикам по хэшу пользователя.
+
+Запуск:
+    python shard_router.py [--workers N]
+"""
+
+import argparse
+import asyncio
+import bisect
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import signal
+import sys
+from pathlib import Path
+
+import aiohttp
+from aiohttp import web
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from log_setup import setup_logging
+from llm_scheduler import LLM_BURST, LLM_RPS, LLM_TOKENS_PER_MINUTE
+from metrics import METRICS_PORT
+from webhook_server import (
+    MAX_UPDATE_BYTES,
+    SECRET_HEADER,
+    WEBHOOK_DRAIN_TIMEOUT,
+    WEBHOOK_HOST,
+    WEBHOOK_PATH,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET,
+    WEBHOOK_URL,
+    check_webhook_secret,
+)
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# Число процессов-обработчиков (по умолчанию - по числу ядер)
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", "0")) or os.cpu_count() or 1
+# Порты обработчиков: SHARD_BASE_PORT, SHARD_BASE_PORT + 1, ...
+SHARD_BASE_PORT = int(os.getenv("SHARD_BASE_PORT", "8100"))
+# Виртуальных узлов на обработчик в кольце консистентного хэширования
+SHARD_VNODES = int(os.getenv("SHARD_VNODES", "160"))
+# Сколько обновлений может ждать отправки в один обработчик
+SHARD_QUEUE_SIZE = int(os.getenv("SHARD_QUEUE_SIZE", "1000"))
+# Сколько ждать готовности обработчика при запуске и перезапуске, сек
+SHARD_START_TIMEOUT = float(os.getenv("SHARD_START_TIMEOUT", "120"))
+
+
+def _hash(value: str) -> int:
+    # hash() в Python случаен для каждого процесса - нужен стабильный
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """
+    Кольцо консистентного хэширования.
+
+    Каждый обработчик занимает SHARD_VNODES точек кольца; ключ достается
+    ближайшей точке по часовой стрелке. При изменении числа обработчиков
+    переезжает только примерно 1/N пользователей.
+    """
+
+    def __init__(self, nodes: int, vnodes: int = SHARD_VNODES):
+        points = sorted(
+            (_hash(f"worker-{node}#{replica}"), node)
+            for node in range(nodes)
+            for replica in range(vnodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key) -> int:
+        index = bisect.bisect(self._hashes, _hash(str(key))) % len(self._hashes)
+        return self._nodes[index]
+
+
+def update_key(data: dict):
+    """
+    Ключ шардирования необработанного обновления: автор, иначе чат.
+
+    Состояние диалога (user_data) хранится по пользователю, поэтому все его
+    обновления, в том числе из групп, должны попадать в один обработчик -
+    иначе сессия окажется в нескольких процессах и записи перетрут друг
+    друга. В личном чате автор совпадает с чатом, так что порядок сообщений
+    чата сохраняется. Обновления без автора (посты каналов) идут по чату.
+
+    Разбирает только словарь JSON, без построения объектов библиотеки.
+    """
+    for value in data.values():
+        if not isinstance(value, dict):
+            continue
+        author = value.get("from") or value.get("user") or {}
+        if "id" in author:
+            return author["id"]
+    for value in data.values():
+        if not isinstance(value, dict):
+            continue
+        # callback_query: чат сообщения с кнопкой
+        chat = (value.get("message") or {}).get("chat") or value.get("chat") or {}
+        if "id" in chat:
+            return chat["id"]
+    return None
+
+
+def worker_environment(index: int, workers: int, port: int, secret: str) -> dict:
+    """Окружение процесса-обработчика"""
+    env = dict(os.environ)
+    env.update(
+        {
+            "WEBHOOK_HOST": "127.0.0.1",
+            "WEBHOOK_PORT": str(port),
+            "WEBHOOK_PATH": WEBHOOK_PATH,
+            # Вебхук регистрирует только фронтальный процесс
+            "WEBHOOK_URL": "",
+            "WEBHOOK_SECRET": secret,
+            "SHARD_INDEX": str(index),
+            "BOT_LOG_FILE": f"bot.worker{index}.log",
+            # Метрики каждый обработчик отдает на своем порту: METRICS_PORT + номер
+            "METRICS_PORT": str(METRICS_PORT + index if METRICS_PORT else 0),
+            # Квота YandexGPT общая - делим ее между обработчиками
+            "LLM_RPS": str(LLM_RPS / workers),
+            "LLM_BURST": str(max(LLM_BURST / workers, 1.0)),
+            "LLM_TOKENS_PER_MINUTE": str(LLM_TOKENS_PER_MINUTE / workers),
+        }
+    )
+    return env
+
+
+class Worker:
+    """Процесс-обработчик: bot.py в режиме вебхука на локальном порту"""
+
+    def __init__(self, index: int, port: int, env: dict):
+        self.index = index
+        self.port = port
+        self.env = env
+        self.url = f"http://127.0.0.1:{port}"
+        self.process = None
+        self.queue = asyncio.Queue(SHARD_QUEUE_SIZE)
+        self.ready = False
+        self.forwarded = 0
+        self.restarts = 0
+
+    async def spawn(self) -> None:
+        self.ready = False
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable,
+            str(BASE_DIR / "bot.py"),
+            "--mode",
+            "webhook",
+            cwd=str(BASE_DIR),
+            env=self.env,
+            # Ctrl+C в терминале получает только фронт - он и останавливает обработчики
+            start_new_session=True,
+        )
+        logger.info(
+            f"Обработчик {self.index} запущен (pid {self.process.pid}, порт {self.port})"
+        )
+
+    async def wait_ready(self, session, timeout: float = SHARD_START_TIMEOUT) -> bool:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while loop.time() < deadline:
+            if self.process.returncode is not None:
+                return False
+            try:
+                async with session.get(f"{self.url}/readyz") as response:
+                    if response.status == 200:
+                        self.ready = True
+                        return True
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+        return False
+
+    async def terminate(self, timeout: float) -> None:
+        if self.process is None or self.process.returncode is not None:
+            return
+        # Обработчик сам дождется обработки принятых обновлений
+        self.process.send_signal(signal.SIGTERM)
+        try:
+            await asyncio.wait_for(self.process.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Обработчик {self.index} не остановился, завершаем")
+            self.process.kill()
+            await self.process.wait()
+
+
+class ShardRouter:
+    """
+    Фронтальный процесс многопроцессного режима.
+
+    Принимает вебхук Telegram (секрет, /healthz, /readyz - как WebhookServer),
+    по пользователю (update_key) выбирает обработчик через кольцо
+    консистентного хэширования и пересылает ему тело запроса как есть. В
+    каждый обработчик обновления уходят строго по одному в порядке
+    поступления, поэтому порядок сообщений пользователя сохраняется, а его
+    состояние живет в одном процессе.
+
+    Общие данные живут вне процессов: контакты и сессии - в SQLite (WAL),
+    каталог - в бинарном снимке, который фронт собирает один раз. Каждый
+    обработчик загружает из снимка собственную копию каталога и словарных
+    индексов (разбор pickle); общими страницами памяти через mmap остаются
+    только массивы NumPy (векторы семантического индекса, колонки и геоиндекс).
+    """
+
+    def __init__(
+        self,
+        workers: int = SHARD_WORKERS,
+        host: str = WEBHOOK_HOST,
+        port: int = WEBHOOK_PORT,
+        path: str = WEBHOOK_PATH,
+        secret_token: str = WEBHOOK_SECRET,
+        base_port: int = SHARD_BASE_PORT,
+    ):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.secret_token = secret_token
+        self.ring = HashRing(workers)
+        # Секрет между фронтом и обработчиками
+        self.internal_secret = secrets.token_hex(16)
+        self.workers = [
+            Worker(
+                index,
+                base_port + index,
+                worker_environment(
+                    index, workers, base_port + index, self.internal_secret
+                ),
+            )
+            for index in range(workers)
+        ]
+        self.accepting = False
+        self.stopping = False
+        self.received = 0
+        self.rejected = 0
+        self._session = None
+        self._runner = None
+        self._tasks = []
+
+        self.app = web.Application(client_max_size=MAX_UPDATE_BYTES)
+        self.app.router.add_post(path, self._handle_update)
+        self.app.router.add_get("/healthz", self._handle_health)
+        self.app.router.add_get("/readyz", self._handle_ready)
+
+    async def _handle_update(self, request: web.Request) -> web.Response:
+        if not self.accepting:
+            return web.Response(status=503, text="draining")
+
+        if self.secret_token and not hmac.compare_digest(
+            request.headers.get(SECRET_HEADER, ""), self.secret_token
+        ):
+            self.rejected += 1
+            logger.warning(f"Запрос к вебхуку с неверным секретом от {request.remote}")
+            return web.Response(status=403)
+
+        body = await request.read()
+        try:
+            data = json.loads(body)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            self.rejected += 1
+            logger.warning(f"Некорректное обновление в вебхуке: {e}")
+            return web.Response(status=400)
+        if not isinstance(data, dict) or "update_id" not in data:
+            self.rejected += 1
+            return web.Response(status=400)
+
+        key = update_key(data)
+        worker = self.workers[self.ring.node_for(key if key is not None else 0)]
+        self.received += 1
+        done = asyncio.get_running_loop().create_future()
+        await worker.queue.put((body, done))
+        # Отвечаем Telegram, когда обработчик принял обновление
+        return web.Response(status=await done)
+
+    async def _forward(self, worker: Worker) -> None:
+        """Пересылка обновлений в один обработчик строго по порядку"""
+        headers = {SECRET_HEADER: self.internal_secret}
+        while True:
+            body, done = await worker.queue.get()
+            status = 503
+            try:
+                # Пока обработчик перезапускается, ждем его - иначе нарушится порядок
+                for attempt in range(int(SHARD_START_TIMEOUT / 0.5)):
+                    try:
+                        async with self._session.post(
+                            f"{worker.url}{self.path}", data=body, headers=headers
+                        ) as response:
+                            status = response.status
+                        if status != 503:
+                            break
+                    except aiohttp.ClientError:
+                        pass
+                    await asyncio.sleep(0.5)
+                worker.forwarded += 1
+            finally:
+                if not done.done():
+                    done.set_result(status)
+                worker.queue.task_done()
+
+    async def _supervise(self, worker: Worker) -> None:
+        """Перезапускает упавший обработчик"""
+        while True:
+            code = await worker.process.wait()
+            worker.ready = False
+            if self.stopping:
+                return
+            logger.error(f"Обработчик {worker.index} завершился с кодом {code}")
+            await asyncio.sleep(1)
+            worker.restarts += 1
+            await worker.spawn()
+            await worker.wait_ready(self._session)
+
+    async def _handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok"})
+
+    async def _handle_ready(self, request: web.Request) -> web.Response:
+        ready = self.accepting and all(worker.ready for worker in self.workers)
+        return web.json_response(
+            {
+                "status": "ready" if ready else "not ready",
+                "received": self.received,
+                "rejected": self.rejected,
+                "workers": self.stats(),
+            },
+            status=200 if ready else 503,
+        )
+
+    def stats(self) -> list:
+        return [
+            {
+                "index": worker.index,
+                "pid": worker.process.pid if worker.process else None,
+                "ready": worker.ready,
+                "pending": worker.queue.qsize(),
+                "forwarded": worker.forwarded,
+                "restarts": worker.restarts,
+            }
+            for worker in self.workers
+        ]
+
+    async def prepare_catalog(self) -> None:
+        """Собирает бинарный снимок каталога, если он устарел (один раз на всех)"""
+        process = await asyncio.create_subprocess_exec(
+            sys.executable,
+            str(BASE_DIR / "catalog_snapshot.py"),
+            "--if-stale",
+            cwd=str(BASE_DIR),
+        )
+        if await process.wait() != 0:
+            logger.warning("Снимок каталога не собран, обработчики прочитают JSON")
+
+    async def start(self) -> None:
+        await self.prepare_catalog()
+        self._session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=30),
+            connector=aiohttp.TCPConnector(limit_per_host=4),
+        )
+        await asyncio.gather(*(worker.spawn() for worker in self.workers))
+        ready = await asyncio.gather(
+            *(worker.wait_ready(self._session) for worker in self.workers)
+        )
+        if not all(ready):
+            raise RuntimeError("Не все обработчики запустились")
+        for worker in self.workers:
+            self._tasks.append(asyncio.create_task(self._forward(worker)))
+            self._tasks.append(asyncio.create_task(self._supervise(worker)))
+
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self.accepting = True
+        logger.info(
+            f"Фронт слушает http://{self.host}:{self.port}{self.path}, "
+            f"обработчиков: {len(self.workers)}"
+        )
+
+    async def stop(self, timeout: float = WEBHOOK_DRAIN_TIMEOUT) -> None:
+        """Перестает принимать обновления, досылает принятые, останавливает обработчики"""
+        self.accepting = False
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(worker.queue.join() for worker in self.workers)),
+                timeout,
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Не все обновления переданы обработчикам")
+        self.stopping = True
+        await asyncio.gather(*(worker.terminate(timeout) for worker in self.workers))
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._runner is not None:
+            await self._runner.cleanup()
+        if self._session is not None:
+            await self._session.close()
+        logger.info("Фронт остановлен")
+
+
+async def register_webhook(secret_token: str) -> None:
+    """Регистрирует вебхук в Telegram от имени фронтального процесса"""
+    from telegram import Bot, Update
+
+    bot_options = {}
+    if os.getenv("TELEGRAM_API_URL"):
+        bot_options["base_url"] = os.getenv("TELEGRAM_API_URL")
+    async with Bot(os.environ["TELEGRAM_TOKEN"], **bot_options) as bot:
+        await bot.set_webhook(
+            WEBHOOK_URL,
+            secret_token=secret_token or None,
+            allowed_updates=Update.ALL_TYPES,
+        )
+    logger.info(f"Вебхук зарегистрирован: {WEBHOOK_URL}")
+
+
+async def serve(router: ShardRouter) -> None:
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass
+    try:
+        await router.start()
+        if WEBHOOK_URL:
+            await register_webhook(router.secret_token)
+        await stop_event.wait()
+    finally:
+        await router.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Многопроцессный режим вебхука")
+    parser.add_argument("--workers", type=int, default=SHARD_WORKERS)
+    args = parser.parse_args()
+    setup_logging()
+    if not os.getenv("TELEGRAM_TOKEN"):
+        logger.error("Переменная окружения TELEGRAM_TOKEN не установлена!")
+        sys.exit(1)
+    router = ShardRouter(workers=args.workers)
+    if not check_webhook_secret(router.secret_token):
+        sys.exit(1)
+    asyncio.run(serve(router))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import asyncio
+import hashlib
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def prompt_fingerprint(messages: list) -> str:
+    """Отпечаток промпта: одинаковые списки сообщений дают одинаковый ключ"""
+    raw = json.dumps(messages, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    Объединение одинаковых одновременных запросов.
+
+    Пока запрос с данным ключом выполняется, все новые вызовы с тем же ключом
+    ждут его результата вместо отдельного обращения к API. Отмена одного
+    из ожидающих не отменяет общий запрос для остальных.
+    """
+
+    def __init__(self):
+        self._in_flight = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: str, coroutine_factory):
+        """
+        Выполняет coroutine_factory() один раз для всех одновременных вызовов с ключом key.
+        """
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.shared += 1
+            logger.info(
+                f"Запрос присоединен к уже выполняющемуся ({len(self._in_flight)} в полете)"
+            )
+        else:
+            self.calls += 1
+            task = asyncio.ensure_future(coroutine_factory())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+    def stats(self) -> dict:
+        """Статистика: реальные вызовы и присоединенные запросы"""
+        return {
+            "calls": self.calls,
+            "shared": self.shared,
+            "in_flight": len(self._in_flight),
+        }
@@ -4,68 +4,104 @@ from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+# Максимум объектов в результате автоматического поиска
+AUTO_SEARCH_LIMIT = 5
+
+FILTER_NOTHING_FOUND = "По заданным условиям объектов в базе нет.\n"
+
+
+def format_auto_search_block(name: str, obj: dict) -> str:
+    """Блок объекта для результата автоматического поиска"""
+    lines = [
+        f"• {name}:\n",
+        f"  Описание: {obj['описание'][:100]}...\n",
+        f"  Срок сдачи: {obj['срок_сдачи']}\n",
+    ]
+    if "особенности" in obj:
+        lines.append(f"  Особенности: {', '.join(obj['особенности'][:3])}\n")
+    lines.append("\n")
+    return "".join(lines)
+
+
+def format_compare_block(name: str, obj: dict) -> str:
+    """Блок объекта для контекста сравнения"""
+    lines = [
+        f"• {name}:\n",
+        f"  Описание: {obj['описание'][:100]}...\n",
+        f"  Этажность: {obj['этажность']}\n",
+        f"  Срок сдачи: {obj['срок_сдачи']}\n",
+    ]
+    if "ближайшие_объекты" in obj:
+        nearby = ", ".join([n["название"] for n in obj["ближайшие_объекты"][:2]])
+        lines.append(f"  Рядом: {nearby}\n")
+    lines.append("\n")
+    return "".join(lines)
+
+
+def format_object_block(object_data: dict) -> str:
+    """Полный контекст одного объекта"""
+    lines = [
+        f"===== {object_data['название']} =====\n",
+        f"Описание: {object_data['описание']}\n",
+        f"Этажность: {object_data['этажность']}\n",
+        f"Срок сдачи: {object_data['срок_сдачи']}\n\n",
+        "Ближайшие объекты:\n",
+    ]
+    for obj in object_data["ближайшие_объекты"]:
+        lines.append(f"- {obj['название']} ({obj['тип']}, {obj['расстояние']})\n")
+    return "".join(lines)
+
 
 def format_context(object_data: dict, full_database: dict) -> str:
     try:
         """Форматирует контекст объекта с учетом типа запроса"""
         # Обработка автоматического поиска
         if object_data.get("special_type") == "auto_search":
-            text = "===== НАЙДЕННЫЕ ОБЪЕКТЫ =====\n"
-            for obj_name in object_data["objects"]:
-                obj = full_database[obj_name]
-                text += f"• {obj_name}:\n"
-                text += f"  Описание: {obj['описание'][:100]}...\n"
-                text += f"  Срок сдачи: {obj['срок_сдачи']}\n"
-                if "особенности" in obj:
-                    text += f"  Особенности: {', '.join(obj['особенности'][:3])}\n"
-                text += "\n"
-            return text
+            if not object_data["objects"]:
+                return "===== НАЙДЕННЫЕ ОБЪЕКТЫ =====\n" + FILTER_NOTHING_FOUND
+            return "===== НАЙДЕННЫЕ ОБЪЕКТЫ =====\n" + "".join(
+                format_auto_search_block(obj_name, full_database[obj_name])
+                for obj_name in object_data["objects"]
+            )
 
         # Запрос списка всех ЖК
         if object_data.get("special_type") == "all_objects":
-            text = "===== ВСЕ ДОСТУПНЫЕ ЖК =====\n"
-            for obj_name in object_data["objects"]:
-                text += f"- {obj_name}\n"
-            return text + "\n"
+            return (
+                "===== ВСЕ ДОСТУПНЫЕ ЖК =====\n"
+                + "".join(f"- {obj_name}\n" for obj_name in object_data["objects"])
+                + "\n"
+            )
 
         # Запрос сравнения объектов
         if object_data.get("special_type") == "compare":
-            text = "===== СРАВНЕНИЕ ОБЪЕКТОВ =====\n"
-            for obj_name in object_data["objects"]:
-                obj = full_database[obj_name]
-                text += f"• {obj_name}:\n"
-                text += f"  Описание: {obj['описание'][:100]}...\n"
-                text += f"  Этажность: {obj['этажность']}\n"
-                text += f"  Срок сдачи: {obj['срок_сдачи']}\n"
-                if "ближайшие_объекты" in obj:
-                    text += f"  Рядом: {', '.join([n['название'] for n in obj['ближайшие_объекты'][:2]])}\n"
-                text += "\n"
-            return text
+            return "===== СРАВНЕНИЕ ОБЪЕКТОВ =====\n" + "".join(
+                format_compare_block(obj_name, full_database[obj_name])
+                for obj_name in object_data["objects"]
+            )
 
         # Форматирование одного объекта
-        text = f"===== {object_data['название']} =====\n"
-        text += f"Описание: {object_data['описание']}\n"
-        text += f"Этажность: {object_data['этажность']}\n"
-        text += f"Срок сдачи: {object_data['срок_сдачи']}\n\n"
-        text += "Ближайшие объекты:\n"
-        for obj in object_data["ближайшие_объекты"]:
-            text += f"- {obj['название']} ({obj['тип']}, {obj['расстояние']})\n"
-        return text
+        return format_object_block(object_data)
 
     except Exception as e:
         logger.error(f"Ошибка форматирования контекста: {e}")
         return ""
 
 
-def find_object_in_db(user_query: str, db: dict) -> dict:
-    """Поиск объекта по ключевым словам"""
+def find_object_in_db(user_query: str, snapshot) -> dict:
+    """
+    Поиск объекта по запросу через инвертированный индекс
+
+    snapshot - снимок каталога: данные (data) и его индексы (search_index,
+    name_resolver, columns).
+    """
     try:
+        db = snapshot.data if snapshot is not None else None
         if not db:
             logger.warning("База данных не загружена")
             return None
 
         normalized_query = user_query.lower()
-        matches = []
+        index = snapshot.search_index
 
         # 1. Запрос списка всех ЖК
         if any(
@@ -79,77 +115,43 @@ def find_object_in_db(user_query: str, db: dict) -> dict:
         ):
             return {"special_type": "all_objects", "objects": list(db.keys())}
 
+        # Объекты, названия которых упомянуты в запросе (с учетом словоформ)
+        named_objects = index.match_names(user_query)
+
         # 2. Запрос сравнения объектов
         if "сравни" in normalized_query or "сравнение" in normalized_query:
-            objects_to_compare = []
-            for obj_name in db.keys():
-                if obj_name.lower() in normalized_query:
-                    objects_to_compare.append(obj_name)
-
-            if len(objects_to_compare) >= 2:
-                return {"special_type": "compare", "objects": objects_to_compare}
-
-        # 1. Поиск по точному совпадению
-        for obj_name, obj_data in db.items():
-            if obj_name.lower() == normalized_query:
-                return {"название": obj_name, **obj_data}
-
-        # После точного совпадения добавим:
-        for obj_name, obj_data in db.items():
-            if normalized_query in obj_name.lower():
-                return {"название": obj_name, **obj_data}
-
-        # Добавим обработку сокращений:
-        name_mapping = {"солнеч": "ЖК Солнечный", "луг": "ЖК Луговой"}
-
-        for short, full in name_mapping.items():
-            if short in normalized_query:
-                return {"название": full, **db[full]}
-
-        # 2. Поиск по частичному совпадению
-        for obj_name, obj_data in db.items():
-            if obj_name.lower() in normalized_query:
-                return {"название": obj_name, **obj_data}
-
-        # 3. Поиск по ключевым словам
-        keywords = ["солнечный", "луговой", "стройинвест", "жк"]
-        for keyword in keywords:
-            if keyword in normalized_query:
-                for obj_name, obj_data in db.items():
-                    if keyword in obj_name.lower():
-                        return {"название": obj_name, **obj_data}
-
-            # 2. Поиск по описанию
-            for obj_name, obj_data in db.items():
-                if (
-                    "описание" in obj_data
-                    and obj_data["описание"].lower() in normalized_query
-                ):
-                    if obj_name not in matches:
-                        matches.append(obj_name)
-
-            # 3. Поиск по особенностям
-            for obj_name, obj_data in db.items():
-                if "особенности" in obj_data:
-                    for feature in obj_data["особенности"]:
-                        if feature.lower() in normalized_query:
-                            if obj_name not in matches:
-                                matches.append(obj_name)
-
-            # 4. Поиск по ближайшим объектам
-            for obj_name, obj_data in db.items():
-                if "ближайшие_объекты" in obj_data:
-                    for nearby in obj_data["ближайшие_объекты"]:
-                        if nearby["название"].lower() in normalized_query:
-                            if obj_name not in matches:
-                                matches.append(obj_name)
-
-            # Обработка результатов
-            if matches:
-                return {
-                    "special_type": "auto_search",
-                    "objects": list(set(matches)),  # Уникальные результаты
-                }
+            if len(named_objects) < 2:
+                # Названия с опечатками и сокращениями
+                named_objects = snapshot.name_resolver.matches(user_query)
+            if len(named_objects) >= 2:
+                return {"special_type": "compare", "objects": named_objects}
+
+        # 3. Поиск по названию
+        if named_objects:
+            return index.record(named_objects[0])
+
+        # Нечеткое распознавание названия (опечатки, сокращения)
+        resolved = snapshot.name_resolver.best(user_query)
+        if resolved:
+            name, confidence = resolved
+            logger.info(f"Название распознано: {name} (уверенность {confidence})")
+            return index.record(name)
+
+        # 4. Фильтр по сроку сдачи, этажности и расстоянию до ближайших объектов
+        filtered = snapshot.columns.search(user_query)
+        if filtered is not None:
+            return {
+                "special_type": "auto_search",
+                "objects": filtered[:AUTO_SEARCH_LIMIT],
+            }
+
+        # 5. Ранжированный поиск по описанию, особенностям и ближайшим объектам
+        matches = index.search(user_query, limit=AUTO_SEARCH_LIMIT)
+        if matches:
+            return {
+                "special_type": "auto_search",
+                "objects": [name for name, _ in matches],
+            }
 
         logger.info(f"Объект не найден для запроса: {user_query}")
         return None
@@ -159,26 +161,101 @@ def find_object_in_db(user_query: str, db: dict) -> dict:
         return None
 
 
+def object_reference(object_data: dict) -> dict:
+    """Компактная ссылка на результат поиска (для пересборки контекста)"""
+    if "special_type" in object_data:
+        return {
+            "special_type": object_data["special_type"],
+            "objects": list(object_data["objects"]),
+        }
+    return {"название": object_data["название"]}
+
+
+def resolve_object_reference(reference: dict, snapshot) -> dict:
+    """Восстанавливает результат поиска по ссылке для другого снимка каталога"""
+    db = snapshot.data if snapshot is not None else None
+    if not reference or not db:
+        return None
+    if "special_type" in reference:
+        objects = [name for name in reference["objects"] if name in db]
+        if not objects:
+            return None
+        return {"special_type": reference["special_type"], "objects": objects}
+    name = reference["название"]
+    if name not in db:
+        return None
+    return snapshot.search_index.record(name)
+
+
+def format_summary_block(name: str, data: dict) -> str:
+    """Блок объекта для краткой сводки по всей базе"""
+    lines = [
+        f"• {name}:\n",
+        f"  - Описание: {data['описание'][:70]}...\n",
+        f"  - Срок сдачи: {data['срок_сдачи']}\n",
+    ]
+    if "особенности" in data:
+        lines.append(f"  - Особенности: {', '.join(data['особенности'][:3])}\n")
+    lines.append("\n")
+    return "".join(lines)
+
+
 def generate_all_objects_summary(db: dict) -> str:
     """Генерирует краткую сводку по всем объектам"""
-    summary = "===== КРАТКИЙ ОБЗОР ВСЕХ ОБЪЕКТОВ =====\n"
-    for name, data in db.items():
-        summary += f"• {name}:\n"
-        summary += f"  - Описание: {data['описание'][:70]}...\n"
-        summary += f"  - Срок сдачи: {data['срок_сдачи']}\n"
-        if "особенности" in data:
-            summary += f"  - Особенности: {', '.join(data['особенности'][:3])}\n"
-        summary += "\n"
-    return summary
-
-
-def compare_complexes(complex_names: list, db: dict) -> str:
+    return "===== КРАТКИЙ ОБЗОР ВСЕХ ОБЪЕКТОВ =====\n" + "".join(
+        format_summary_block(name, data) for name, data in db.items()
+    )
+
+
+RELEVANT_SUMMARY_HEADER = "===== ОБЪЕКТЫ, ПОДХОДЯЩИЕ ПОД ЗАПРОС =====\n"
+
+
+def generate_objects_summary(names: list, db: dict) -> str:
+    """Краткая сводка по выбранным объектам (в указанном порядке)"""
+    return RELEVANT_SUMMARY_HEADER + "".join(
+        format_summary_block(name, db[name]) for name in names if name in db
+    )
+
+
+def format_comparison_block(name: str, data: dict) -> str:
+    """Блок объекта для ответа пользователю со сравнением ЖК"""
+    lines = [
+        f"🏢 {name}:\n",
+        f"  • Описание: {data['описание'][:100]}...\n",
+        f"  • Этажность: {data['этажность']}\n",
+        f"  • Срок сдачи: {data['срок_сдачи']}\n",
+    ]
+    if "ближайшие_объекты" in data and data["ближайшие_объекты"]:
+        nearby = ", ".join(obj["название"] for obj in data["ближайшие_объекты"][:3])
+        lines.append(f"  • Ближайшие объекты: {nearby}\n")
+    lines.append("\n")
+    return "".join(lines)
+
+
+def resolve_complex_name(name: str, db: dict, resolver) -> str:
+    """Название ЖК из базы по введенному пользователем (с опечатками) или None"""
+    name = name.strip()
+    if name in db:
+        return name
+    # Пробуем распознать сокращение или опечатку
+    resolved = resolver.best(name)
+    return resolved[0] if resolved else None
+
+
+COMPARISON_HEADER = "🔍 Сравнение ЖК:\n\n"
+COMPARISON_NOTHING_FOUND = (
+    "Ни один из указанных ЖК не найден. Пожалуйста, проверьте названия."
+)
+
+
+def compare_complexes(complex_names: list, db: dict, resolver) -> str:
     """
     Сравнивает несколько жилых комплексов и возвращает форматированную строку сравнения
 
     Параметры:
         complex_names (list): Список названий ЖК для сравнения
         db (dict): База данных с информацией о ЖК
+        resolver (NameResolver): Индекс названий этой базы
 
     Возвращает:
         str: Форматированное сравнение объектов
@@ -187,33 +264,21 @@ def compare_complexes(complex_names: list, db: dict) -> str:
         if not complex_names:
             return "Пожалуйста, укажите названия ЖК для сравнения."
 
-        result = "🔍 Сравнение ЖК:\n\n"
+        parts = [COMPARISON_HEADER]
         found_any = False
 
-        for name in complex_names:
-            name = name.strip()
-            if name in db:
+        for raw_name in complex_names:
+            name = resolve_complex_name(raw_name, db, resolver)
+            if name:
                 found_any = True
-                data = db[name]
-                result += f"🏢 {name}:\n"
-                result += f"  • Описание: {data['описание'][:100]}...\n"
-                result += f"  • Этажность: {data['этажность']}\n"
-                result += f"  • Срок сдачи: {data['срок_сдачи']}\n"
-
-                if "ближайшие_объекты" in data and data["ближайшие_объекты"]:
-                    nearby = ", ".join(
-                        obj["название"] for obj in data["ближайшие_объекты"][:3]
-                    )
-                    result += f"  • Ближайшие объекты: {nearby}\n"
-
-                result += "\n"
+                parts.append(format_comparison_block(name, db[name]))
             else:
-                result += f"⚠️ ЖК '{name}' не найден в базе данных\n\n"
+                parts.append(f"⚠️ ЖК '{raw_name.strip()}' не найден в базе данных\n\n")
 
         if not found_any:
-            return "Ни один из указанных ЖК не найден. Пожалуйста, проверьте названия."
+            return COMPARISON_NOTHING_FOUND
 
-        return result
+        return "".join(parts)
 
     except Exception as e:
         logger.error(f"Ошибка при сравнении ЖК: {e}")
@@ -0,0 +1,218 @@
+import asyncio
+import hmac
+import json
+import logging
+import os
+import signal
+import sys
+
+from aiohttp import web
+from telegram import Update
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Адрес встроенного HTTP-сервера и путь, на который Telegram присылает обновления
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+# Публичный URL для setWebhook (пусто - вебхук не регистрируется)
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+# Секрет, который Telegram передает в заголовке каждого запроса
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+# Сколько ждать обработки принятых обновлений при остановке, сек
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "30"))
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+# Максимальный размер тела запроса с обновлением
+MAX_UPDATE_BYTES = 1024 * 1024
+
+
+class WebhookServer:
+    """
+    HTTP-сервер для приема обновлений Telegram через вебхук.
+
+    POST на WEBHOOK_PATH проверяет секрет, разбирает Update и кладет его в
+    очередь приложения. GET /healthz отвечает, пока процесс жив; GET /readyz -
+    пока сервер принимает обновления и все проверки готовности пройдены.
+    Метрики этот сервер не отдает: он публичный, а /metrics слушает
+    отдельный сервер на METRICS_HOST:METRICS_PORT.
+    """
+
+    def __init__(
+        self,
+        application,
+        host: str = WEBHOOK_HOST,
+        port: int = WEBHOOK_PORT,
+        path: str = WEBHOOK_PATH,
+        secret_token: str = WEBHOOK_SECRET,
+        is_ready=None,
+    ):
+        self.application = application
+        self.host = host
+        self.port = port
+        self.path = path
+        self.secret_token = secret_token
+        self.is_ready = is_ready or (lambda: True)
+        self.accepting = False
+        self.received = 0
+        self.rejected = 0
+        self._runner = None
+
+        self.app = web.Application(client_max_size=MAX_UPDATE_BYTES)
+        self.app.router.add_post(path, self._handle_update)
+        self.app.router.add_get("/healthz", self._handle_health)
+        self.app.router.add_get("/readyz", self._handle_ready)
+        metrics.register_collector("webhook", self.stats)
+
+    async def _handle_update(self, request: web.Request) -> web.Response:
+        if not self.accepting:
+            # Telegram повторит доставку позже (или другому экземпляру)
+            return web.Response(status=503, text="draining")
+
+        if self.secret_token and not hmac.compare_digest(
+            request.headers.get(SECRET_HEADER, ""), self.secret_token
+        ):
+            self.rejected += 1
+            logger.warning(f"Запрос к вебхуку с неверным секретом от {request.remote}")
+            return web.Response(status=403)
+
+        try:
+            data = await request.json()
+            if not isinstance(data, dict):
+                raise TypeError(f"ожидался объект JSON, получено {type(data).__name__}")
+            update = Update.de_json(data, self.application.bot)
+        except (json.JSONDecodeError, UnicodeDecodeError, TypeError, KeyError) as e:
+            self.rejected += 1
+            logger.warning(f"Некорректное обновление в вебхуке: {e}")
+            return web.Response(status=400)
+        if update is None:
+            self.rejected += 1
+            return web.Response(status=400)
+
+        self.received += 1
+        await self.application.update_queue.put(update)
+        return web.Response(status=200)
+
+    async def _handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok"})
+
+    async def _handle_ready(self, request: web.Request) -> web.Response:
+        ready = self.accepting and self.application.running and self.is_ready()
+        return web.json_response(
+            {
+                "status": "ready" if ready else "not ready",
+                "pending_updates": self.application.update_queue.qsize(),
+                "received": self.received,
+                "rejected": self.rejected,
+            },
+            status=200 if ready else 503,
+        )
+
+    def stats(self) -> dict:
+        return {
+            "received": self.received,
+            "rejected": self.rejected,
+            "pending_updates": self.application.update_queue.qsize(),
+        }
+
+    async def start(self) -> None:
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self.accepting = True
+        logger.info(f"Вебхук слушает http://{self.host}:{self.port}{self.path}")
+
+    async def drain(self, timeout: float = WEBHOOK_DRAIN_TIMEOUT) -> None:
+        """Перестает принимать обновления и ждет обработки уже принятых"""
+        self.accepting = False
+        pending = self.application.update_queue.qsize()
+        logger.info(f"Остановка вебхука, обновлений в очереди: {pending}")
+        try:
+            await asyncio.wait_for(self.application.update_queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Не все обновления обработаны за {timeout} сек, "
+                f"осталось: {self.application.update_queue.qsize()}"
+            )
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+def check_webhook_secret(secret_token: str, url: str = WEBHOOK_URL) -> bool:
+    """
+    Проверяет, что вебхук защищен секретом.
+
+    False - вебхук регистрируется на публичном URL без секрета: любой, кто
+    знает адрес, сможет присылать боту поддельные обновления.
+    """
+    if secret_token:
+        return True
+    if url:
+        logger.error(
+            "WEBHOOK_URL задан без WEBHOOK_SECRET: запросы к вебхуку не проверяются. "
+            "Задайте WEBHOOK_SECRET"
+        )
+        return False
+    logger.warning(
+        f"WEBHOOK_SECRET не задан: заголовок {SECRET_HEADER} не проверяется, "
+        "вебхук должен быть доступен только из доверенной сети"
+    )
+    return True
+
+
+async def serve_webhook(application, server: WebhookServer) -> None:
+    """
+    Жизненный цикл приложения в режиме вебхука.
+
+    Повторяет run_polling: initialize, post_init, start, затем ожидание
+    SIGINT/SIGTERM, плавная остановка, post_stop, shutdown, post_shutdown.
+    """
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            # Windows: остановка только через KeyboardInterrupt
+            pass
+
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    await application.start()
+    try:
+        await server.start()
+        if WEBHOOK_URL:
+            await application.bot.set_webhook(
+                WEBHOOK_URL,
+                secret_token=server.secret_token or None,
+                allowed_updates=Update.ALL_TYPES,
+            )
+            logger.info(f"Вебхук зарегистрирован: {WEBHOOK_URL}")
+        await stop_event.wait()
+    finally:
+        await server.drain()
+        await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        await server.stop()
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+        logger.info("Вебхук остановлен")
+
+
+def run_webhook(application, **server_options) -> None:
+    """Запускает бота в режиме вебхука (блокирует до остановки)"""
+    server = WebhookServer(application, **server_options)
+    if not check_webhook_secret(server.secret_token):
+        sys.exit(1)
+    try:
+        asyncio.run(serve_webhook(application, server))
+    except KeyboardInterrupt:
+        pass